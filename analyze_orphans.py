@@ -1,76 +1,35 @@
 
-import json
-import re
+import sys
 from collections import defaultdict
 
+from card_classifier import CATEGORIES_FILE, UNCATEGORIZED, Classifier
+from card_graph import load_graph
+
 CARDS_FILE = r'c:\PythonApplications\AI_Skillsweb\cards.json'
 RELS_FILE = r'c:\PythonApplications\AI_Skillsweb\relationships.json'
 REPORT_FILE = r'c:\PythonApplications\AI_Skillsweb\orphan_insight_report.txt'
 
-def load_json(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def analyze():
+def analyze(categories_file=CATEGORIES_FILE):
     print("Loading data...")
-    cards_data = load_json(CARDS_FILE)
-    rels_data = load_json(RELS_FILE)
-
-    cards = cards_data.get('cards', cards_data)
-    rels = rels_data.get('relationships', rels_data)
-
-    card_map = {c['id']: c for c in cards}
-    
-    # identify parents
-    has_parent = set()
-    for r in rels:
-        if r.get('type') == 'contains':
-            tgt = r.get('target') or r.get('to')
-            has_parent.add(tgt)
+    graph = load_graph(CARDS_FILE, RELS_FILE)
 
     # identify orphans
     orphans = []
-    for cid, card in card_map.items():
-        if cid not in has_parent:
+    for cid, card in graph.cards.items():
+        if not graph.has_parent(cid):
             # Filter out some known roots if needed, but for now list all
-            orphans.append(card)
+            orphans.append(card.data)
 
     print(f"Found {len(orphans)} orphans.")
 
-    # categorize
+    # categorize: every card is scored against all categories in one pass
+    # and filed under its best one
+    classifier = Classifier.load(categories_file)
     categories = defaultdict(list)
-    
-    keywords = {
-        'Cloud (AWS)': ['aws', 'amazon', 'cloud', 'ec2', 's3', 'lambda'],
-        'Cloud (Google)': ['google', 'gcp', 'firebase', 'compute engine'],
-        'Cloud (Azure)': ['azure', 'microsoft cloud', 'entra'],
-        'Data & Analytics': ['data', 'analytics', 'sql', 'etl', 'dashboard', 'report', 'kpi', 'analysis'],
-        'Management & Strategy': ['management', 'strategy', 'leadership', 'cost', 'planning', 'governance', 'compliance', 'process'],
-        'Media & Visuals': ['media', 'diagram', 'chart', 'visual', 'screenshot', 'video'],
-        'Development & Code': ['python', 'c#', 'java', 'code', 'programming', 'git', 'dev', 'api', 'sdk'],
-        'Security': ['security', 'cyber', 'auth', 'identity', 'access', 'firewall'],
-        'Healthcare': ['healthcare', 'nhs', 'medical', 'patient'],
-        'Finance': ['finance', 'payment', 'banking', 'money', 'trading'],
-        'Books': ['book', 'guide', 'reference', 'edition', 'author', 'reading'],
-    }
-
     for card in orphans:
-        matched = False
-        text = (card.get('title', '') + ' ' + card.get('description', '') + ' ' + card.get('id', '')).lower()
-        
-        # Check specific types first
-        if card.get('type') == 'media':
-            categories['Media & Visuals'].append(card)
-            continue
-
-        for cat, keys in keywords.items():
-            if any(k in text for k in keys):
-                categories[cat].append(card)
-                matched = True
-                break # Assign to first matching category for simplicity
-        
-        if not matched:
-            categories['Uncategorized'].append(card)
+        ranked = classifier.classify(card)
+        best = ranked[0][0] if ranked else UNCATEGORIZED
+        categories[best].append((card, ranked))
 
     with open(REPORT_FILE, 'w', encoding='utf-8') as f:
         f.write("ORPHAN CARD ANALYSIS REPORT\n")
@@ -87,15 +46,18 @@ def analyze():
             if not cards: continue
             f.write(f"\nCluster: {cat} ({len(cards)} items)\n")
             f.write("-" * (len(cat) + 12) + "\n")
-            for c in cards:
+            for c, ranked in cards:
                 title = c.get('title', 'No Title')
                 cid = c.get('id')
                 desc = c.get('description', '')
                 f.write(f"  * [{c.get('type','?')}] {title} ({cid})\n")
+                if ranked:
+                    f.write("    = " + ', '.join(f"{name} {conf:.0%}" for name, _, conf in ranked) + "\n")
                 if desc:
                     f.write(f"    - {desc[:100]}...\n")
     
     print(f"Report written to {REPORT_FILE}")
 
 if __name__ == "__main__":
-    analyze()
+    # Optional: a different categories file (see orphan_categories.json)
+    analyze(sys.argv[1] if len(sys.argv) > 1 else CATEGORIES_FILE)
@@ -1,23 +1,27 @@
 import json
-import os
+
+from card_graph import load_graph, save_json
 
 cards_path = 'c:/PythonApplications/AI_Skillsweb/cards.json'
 mapping_path = 'c:/PythonApplications/AI_Skillsweb/pdf_mapping.json'
 
 try:
-    with open(cards_path, 'r', encoding='utf-8') as f:
-        cards_data = json.load(f)
+    graph = load_graph(cards_path, None)
     
     with open(mapping_path, 'r', encoding='utf-8') as f:
         mapping = json.load(f)
 
-    cards = cards_data.get('cards', cards_data)
-    
     count = 0
-    for pdf_name, card_id in mapping.items():
+    for pdf_name, match in mapping.items():
+        # map_pdfs.py writes {"card_id", "score", "alternates"}; older
+        # mappings are plain pdf -> card id
+        card_id = match.get('card_id') if isinstance(match, dict) else match
+        if not card_id:
+            continue
         # Find card
-        card = next((c for c in cards if c['id'] == card_id), None)
-        if card:
+        entry = graph.get(card_id)
+        if entry:
+            card = entry.data
             # Add or update media field
             # If media exists, append if not present. If not, create list.
             if 'media' not in card:
@@ -30,8 +34,7 @@ try:
                 print(f"Linked {pdf_name} -> {card['title']} ({card_id})")
 
     if count > 0:
-        with open(cards_path, 'w', encoding='utf-8') as f:
-            json.dump(cards_data, f, indent=2)
+        save_json(cards_path, graph.cards_document())
         print(f"Successfully updated {count} cards with PDFs.")
     else:
         print("No updates needed.")
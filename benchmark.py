@@ -0,0 +1,323 @@
+
+import argparse
+import contextlib
+import http.client
+import http.server
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import analyze_orphans
+import graph_cache
+import server
+import tree_report
+from card_graph import BASE_DIR, CardGraph, load_json, save_json, unwrap
+from card_hierarchy import build, compact, top_roots
+from card_history import History
+from card_store import CardStore
+from change_feed import ChangeFeed
+from card_validation import validate, validate_ops
+from fuzzy_match import NgramMatcher
+from graph_layout import LayoutCache, graph_nodes, layout
+from graph_stats import GraphStats
+from raw_view import RawViewCache
+from search_index import SearchCache
+from synthetic_graph import generate, write
+from trails import TrailCache
+
+# Benchmarks over synthetic graphs (synthetic_graph.py).
+#
+# For each size a graph is generated into a temporary directory and every
+# benchmark is timed REPEAT times (the best run counts). Results are compared
+# with benchmark_baseline.json; a benchmark more than THRESHOLD times slower
+# than its baseline (and at least MIN_DELTA seconds slower) is a regression,
+# and the run exits with status 1.
+#
+#   python benchmark.py                          1k and 10k cards
+#   python benchmark.py --sizes 1000,100000 --only load_json,tree_report
+#   python benchmark.py --save-baseline          record these results
+#
+# The baseline is machine-specific; record it on the machine that runs the
+# comparison.
+
+BASELINE_FILE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+SIZES = (1000, 10000)
+REPEAT = 3
+THRESHOLD = 1.3
+MIN_DELTA = 0.005
+DOSSIER_CARDS = 50
+PDF_QUERIES = 200
+
+BENCHMARKS = []
+
+
+def benchmark(name, repeat=None):
+    def register(fn):
+        BENCHMARKS.append({"name": name, "run": fn, "repeat": repeat})
+        return fn
+    return register
+
+
+class Env:
+    # One generated graph and the paths the benchmarks work on
+    def __init__(self, size, directory):
+        self.size = size
+        self.dir = directory
+        cards, rels = generate(size)
+        self.cards_file, self.rels_file = write(directory, cards, rels)
+        self.cards = cards
+        self.rels = rels
+        self.graph = CardGraph(cards, rels)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+# --- Loading ---
+
+@benchmark('load_json')
+def bench_load_json(env):
+    CardGraph.load(env.cards_file, env.rels_file)
+
+
+@benchmark('load_cache_cold')
+def bench_load_cache_cold(env):
+    path = graph_cache.cache_path(env.cards_file)
+    if os.path.exists(path):
+        os.remove(path)
+    graph_cache.load(env.cards_file, env.rels_file)
+
+
+@benchmark('load_cache_warm')
+def bench_load_cache_warm(env):
+    graph_cache.load(env.cards_file, env.rels_file)
+
+
+# --- Reports and checks ---
+
+@benchmark('tree_report')
+def bench_tree_report(env):
+    tree_report.CARDS_FILE = env.cards_file
+    tree_report.RELS_FILE = env.rels_file
+    tree_report.OUTPUT_FILE = env.path('tree_view_report.txt')
+    with quiet():
+        tree_report.generate_report(['text'])
+
+
+@benchmark('analyze_orphans')
+def bench_analyze_orphans(env):
+    analyze_orphans.CARDS_FILE = env.cards_file
+    analyze_orphans.RELS_FILE = env.rels_file
+    analyze_orphans.REPORT_FILE = env.path('orphan_insight_report.txt')
+    with quiet():
+        analyze_orphans.analyze()
+
+
+@benchmark('graph_stats')
+def bench_graph_stats(env):
+    GraphStats(env.graph).summary()
+
+
+@benchmark('hierarchy')
+def bench_hierarchy(env):
+    json.dumps(compact(build(env.graph, top_roots(env.graph))))
+
+
+@benchmark('layout', repeat=1)
+def bench_layout(env):
+    nodes, edges = graph_nodes(env.graph)
+    layout(nodes, edges)
+
+
+@benchmark('validate_full')
+def bench_validate_full(env):
+    validate(env.cards, env.rels, env.dir)
+
+
+@benchmark('validate_ops')
+def bench_validate_ops(env):
+    rng = random.Random(1)
+    ids = list(env.graph.cards)
+    ops = [{"op": "add_edge", "edge": {"from": rng.choice(ids), "to": rng.choice(ids), "type": "contains"}}
+           for _ in range(100)]
+    validate_ops(env.graph, ops, env.dir)
+
+
+@benchmark('pdf_matching')
+def bench_pdf_matching(env):
+    # What map_pdfs.py does: index the titles, then top-k per PDF name
+    titles = [c['title'] for c in env.cards if c['type'] != 'stack']
+    rng = random.Random(2)
+    queries = [t[:rng.randint(8, 30)].replace(' ', '_') for t in rng.sample(titles, min(PDF_QUERIES, len(titles)))]
+    matcher = NgramMatcher(titles)
+    for q in queries:
+        matcher.top(q)
+
+
+@benchmark('dossier', repeat=1)
+def bench_dossier(env):
+    import generate_dossier
+    cards = [c for c in env.cards if c['type'] != 'stack'][:DOSSIER_CARDS]
+    with quiet():
+        generate_dossier.create_dossier(cards, env.path('dossier.docx'))
+
+
+# --- Server ---
+
+class QuietHandler(server.CardHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def running_server(env):
+    # server.py's globals pointed at the generated files, on a free port
+    store = CardStore(env.cards_file, env.rels_file, env.path('changes.journal'))
+    server.STORE = store
+    server.RAW_VIEW = RawViewCache(store)
+    server.TRAILS = TrailCache(store, os.path.join(BASE_DIR, 'pathfinder_config.json'))
+    server.SEARCH = SearchCache(store)
+    server.LAYOUT = LayoutCache(store)
+    server.HISTORY = History(env.path('history'))
+    with quiet():
+        server.HISTORY.record(store.graph, note='benchmark')
+    server.FEED = ChangeFeed(server.HISTORY)
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), QuietHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield httpd.server_address[1]
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        store.compact()
+
+
+def request(conn, method, path, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    headers = {'Content-Type': 'application/json'} if data is not None else {}
+    conn.request(method, path, body=data, headers=headers)
+    response = conn.getresponse()
+    payload = response.read()
+    if response.status >= 400:
+        raise RuntimeError(f"{method} {path}: {response.status}")
+    return payload
+
+
+@benchmark('server_roundtrip')
+def bench_server_roundtrip(env):
+    # Server start-up, both documents fetched and saved back whole, then one
+    # incremental edit
+    with quiet(), running_server(env) as port:
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        cards = json.loads(request(conn, 'GET', '/cards.json'))
+        rels = json.loads(request(conn, 'GET', '/relationships.json'))
+        request(conn, 'POST', '/save/cards', cards)
+        request(conn, 'POST', '/save/relationships', rels)
+        card_id = unwrap(cards, 'cards')[0]['id']
+        request(conn, 'PATCH', f'/api/cards/{card_id}', {"title": "Benchmarked"})
+        conn.close()
+
+
+# --- Runner ---
+
+def run(sizes, only=None, repeat=REPEAT):
+    results = {}
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix=f'bench_{size}_')
+        try:
+            print(f"\n{size} cards: generating...")
+            env = Env(size, directory)
+            print(f"{size} cards: {len(env.rels)} relationships")
+            results[str(size)] = timings = {}
+            for b in BENCHMARKS:
+                if only and b['name'] not in only:
+                    continue
+                runs = []
+                try:
+                    for _ in range(b['repeat'] or repeat):
+                        start = time.perf_counter()
+                        b['run'](env)
+                        runs.append(time.perf_counter() - start)
+                except ImportError as e:
+                    print(f"  {b['name']:<18} skipped ({e})")
+                    continue
+                timings[b['name']] = min(runs)
+                spread = f" (median {statistics.median(runs):.3f}s)" if len(runs) > 2 else ""
+                print(f"  {b['name']:<18} {min(runs):8.3f}s{spread}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # [(size, name, seconds, baseline seconds, ratio)] for every regression
+    regressions = []
+    for size, timings in results.items():
+        for name, seconds in timings.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            ratio = seconds / base
+            if ratio > threshold and seconds - base > MIN_DELTA:
+                regressions.append((size, name, seconds, base, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks over synthetic card graphs")
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma-separated card counts')
+    parser.add_argument('--only', help='comma-separated benchmark names')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='slowdown ratio that counts as a regression')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='merge these results into the baseline file')
+    parser.add_argument('--json', metavar='FILE', help='also write the results to FILE')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    only = set(args.only.split(',')) if args.only else None
+    unknown = (only or set()) - {b['name'] for b in BENCHMARKS}
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = run(sizes, only, args.repeat)
+    if args.json:
+        save_json(args.json, results)
+
+    baseline = load_json(args.baseline) if os.path.exists(args.baseline) else {}
+    if args.save_baseline:
+        for size, timings in results.items():
+            baseline.setdefault(size, {}).update({k: round(v, 6) for k, v in timings.items()})
+        save_json(args.baseline, baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if not baseline:
+        print("\nNo baseline to compare with (run with --save-baseline).")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    if not regressions:
+        print(f"\nNo regressions (threshold {args.threshold:.2f}x).")
+        return
+    print(f"\nREGRESSIONS (threshold {args.threshold:.2f}x):")
+    for size, name, seconds, base, ratio in regressions:
+        print(f"  {size} cards, {name}: {seconds:.3f}s vs {base:.3f}s ({ratio:.2f}x)")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from card_graph import BASE_DIR, file_hash
+from search_index import file_stamp
+
+# Shared plumbing of the content build stages (image_build.py, pdf_ingest.py).
+#
+# A stage turns source files into outputs in its own directory, named after
+# the source's content hash, and keeps a manifest {source: entry}: the
+# source's "sha256" and "stamp" (mtime / size) plus the stage's own fields.
+# A rebuild only re-reads sources whose stamp changed and only reprocesses
+# those whose content changed or whose outputs are gone. The work runs in a
+# process pool; outputs no manifest entry points at are deleted.
+#
+#   pending, unchanged = changed_sources(manifest, sources, path_of, outputs)
+#   failed = run_pool(worker, pending, manifest)    worker(source, sha) -> entry
+#   removed = prune(directory, manifest, outputs, keep=[manifest_file])
+#
+# outputs(entry) lists an entry's output paths (relative to BASE_DIR).
+
+
+def output_stem(source, sha):
+    # "images/Waal Bridge.png" -> "Waal_Bridge-<first 12 of the hash>"
+    stem = re.sub(r'[^A-Za-z0-9_-]+', '_', os.path.splitext(os.path.basename(source))[0])
+    return f"{stem}-{sha[:12]}"
+
+
+def output_url(directory, name):
+    # An output's path relative to BASE_DIR, as cards and pages refer to it
+    return os.path.relpath(os.path.join(directory, name), BASE_DIR).replace(os.sep, '/')
+
+
+def changed_sources(manifest, sources, path_of, outputs):
+    # ({source: (sha, stamp)} to build, number unchanged). Unchanged entries
+    # get their stamp refreshed.
+    pending = {}
+    unchanged = 0
+    for source in sources:
+        path = path_of(source)
+        stamp = file_stamp(path)
+        old = manifest.get(source)
+        sha = old['sha256'] if old and old.get('stamp') == stamp else file_hash(path)
+        if old and old['sha256'] == sha and all(os.path.exists(os.path.join(BASE_DIR, p)) for p in outputs(old)):
+            old['stamp'] = stamp
+            unchanged += 1
+            continue
+        pending[source] = (sha, stamp)
+    return pending, unchanged
+
+
+def run_pool(worker, pending, manifest, workers=None, errors=(Exception,)):
+    # Builds the pending sources and stores their entries. A source whose
+    # worker raises one of `errors` is reported and left out of the manifest
+    # (so it is retried next time). Returns the number that failed.
+    failed = 0
+    if not pending:
+        return failed
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(worker, source, sha): source for source, (sha, _) in pending.items()}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                entry = future.result()
+            except errors as e:
+                print(f"  skipped {source}: {e}")
+                manifest.pop(source, None)
+                failed += 1
+                continue
+            entry['stamp'] = pending[source][1]
+            manifest[source] = entry
+    return failed
+
+
+def prune(directory, manifest, outputs, keep=()):
+    # Deletes the files in `directory` no manifest entry points at, other
+    # than `keep`; returns how many
+    keep = {os.path.basename(p) for p in keep}
+    keep.update(os.path.basename(p) for entry in manifest.values() for p in outputs(entry))
+    removed = 0
+    for name in os.listdir(directory):
+        if name not in keep:
+            os.remove(os.path.join(directory, name))
+            removed += 1
+    return removed
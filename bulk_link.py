@@ -0,0 +1,252 @@
+
+import argparse
+import json
+import os
+import re
+import sys
+import urllib.request
+
+from card_graph import BASE_DIR, CARDS_FILE, RELS_FILE, load_graph, load_json, save_json
+from card_store import CardStore, server_running
+from card_validation import errors, print_report, validate_ops
+from search_index import SearchIndex
+
+# Bulk linking driven by rule files (link_rules/*.json).
+#
+# A rule file is:
+#   {
+#     "description": "...",
+#     "cards": [{...}, ...],               cards to create if missing
+#     "links": [
+#       {"parent": "010_stack_cloud_hosting", "children": ["1000_aws", ...]},
+#       {"parent": "1000_aws", "match": {"id": "^100(2[3-9]|3[0-4])_aws_"}},
+#       {"parent": "0112_compliance", "match": {"keywords": ["gdpr", "iso"], "orphans": true}},
+#       ...
+#     ],
+#     "trail_seeds": {"legacy_rescue": ["013_stack_executive_management"]}
+#   }
+#
+# Each link rule may also give:
+#   "type"            relationship type (default 'contains')
+#   "strength"        default '1'
+#   "requires"        [ids]; the rule is skipped unless these cards exist
+#   "replace_parents" true: drop the children's other parents of this type
+#                     (re-parenting rather than adding a second parent)
+# "match" selects existing cards by any of
+#   "id" (regex on the id), "keywords" (search index query, any keyword),
+#   "type" (card type), "orphans" (only cards with no parent of this type),
+#   "exclude" (ids).
+#
+# All rule files are resolved against one loaded graph into a single batch
+# of CardStore ops; existing and repeated edges are dropped by key lookup.
+# The batch is validated, then applied in one CardStore.apply (one journal
+# entry, all-or-nothing) and compacted, or posted as one /api/batch to a
+# running server with --server. Writing the files is refused while a server
+# is running (its compaction would overwrite them); the server records the
+# change in the history when it next starts.
+#
+#   python bulk_link.py link_rules/orphans.json --dry-run
+#   python bulk_link.py link_rules/*.json
+#   python bulk_link.py link_rules/orphan_hubs.json --server http://localhost:8002
+
+RULES_DIR = os.path.join(BASE_DIR, 'link_rules')
+CONFIG_FILE = os.path.join(BASE_DIR, 'pathfinder_config.json')
+
+
+class Plan:
+    def __init__(self, graph):
+        self.graph = graph
+        self.ops = []
+        self.notes = []
+        self.trail_seeds = {}
+        self.created = set()       # ids of cards this plan creates
+        self.added = set()         # edge keys this plan adds
+        self.removed = set()       # edge keys this plan removes
+        self._index = None
+
+    def exists(self, card_id):
+        return card_id in self.graph.cards or card_id in self.created
+
+    def has_edge(self, key):
+        if key in self.added:
+            return True
+        return key in self.graph.edge_index and key not in self.removed
+
+    @property
+    def index(self):
+        # Built on first use; only keyword rules need it
+        if self._index is None:
+            self._index = SearchIndex.build(self.graph)
+        return self._index
+
+    # --- Resolving ---
+
+    def add_card(self, card):
+        cid = card.get('id')
+        if not cid:
+            self.notes.append("Card without an id skipped")
+        elif not self.exists(cid):
+            self.ops.append({"op": "put_card", "card": card})
+            self.created.add(cid)
+
+    def select(self, match, rtype):
+        # Ids of existing cards matching every given criterion
+        graph = self.graph
+        if 'keywords' in match:
+            ids = set()
+            for keyword in match['keywords']:
+                ids.update(cid for _, cid in self.index.search(keyword, limit=len(graph.cards)))
+        else:
+            ids = set(graph.cards)
+        if 'id' in match:
+            pattern = re.compile(match['id'])
+            ids = {cid for cid in ids if pattern.search(cid)}
+        if 'type' in match:
+            ids = {cid for cid in ids if graph.cards[cid].get('type') == match['type']}
+        if match.get('orphans'):
+            ids = {cid for cid in ids if not graph.has_parent(cid, rtype)}
+        ids.difference_update(match.get('exclude', []))
+        return sorted(ids)
+
+    def add_links(self, rule):
+        parent = rule.get('parent')
+        rtype = rule.get('type', 'contains')
+        strength = str(rule.get('strength', '1'))
+        missing = [cid for cid in rule.get('requires', []) if not self.exists(cid)]
+        if missing:
+            self.notes.append(f"Skipped rule for {parent}: {', '.join(missing)} not found")
+            return
+        if not parent or not self.exists(parent):
+            self.notes.append(f"Skipped rule: parent {parent} not found")
+            return
+
+        children = []
+        for cid in rule.get('children', []):
+            if self.exists(cid):
+                children.append(cid)
+            else:
+                self.notes.append(f"Skipped {parent} -> {cid}: {cid} not found")
+        if 'match' in rule:
+            children += self.select(rule['match'], rtype)
+
+        for child in children:
+            key = (parent, child, rtype)
+            if child == parent or self.has_edge(key):
+                continue
+            if rule.get('replace_parents'):
+                for old in self.graph.parents(child, rtype):
+                    old_key = (old, child, rtype)
+                    if old != parent and old_key not in self.removed:
+                        self.ops.append({"op": "remove_edge", "edge": {"from": old, "to": child, "type": rtype}})
+                        self.removed.add(old_key)
+            self.ops.append({"op": "add_edge",
+                             "edge": {"from": parent, "to": child, "type": rtype, "strength": strength}})
+            self.added.add(key)
+
+    def add_rules(self, rules):
+        for card in rules.get('cards', []):
+            self.add_card(card)
+        for rule in rules.get('links', []):
+            self.add_links(rule)
+        for trail, seeds in rules.get('trail_seeds', {}).items():
+            wanted = self.trail_seeds.setdefault(trail, [])
+            wanted += [s for s in seeds if s not in wanted]
+
+    # --- Output ---
+
+    def describe(self):
+        lines = []
+        for op in self.ops:
+            if op['op'] == 'put_card':
+                lines.append(f"+ card {op['card']['id']}: {op['card'].get('title', '')}")
+            else:
+                edge = op['edge']
+                sign = '+' if op['op'] == 'add_edge' else '-'
+                lines.append(f"{sign} {edge['from']} -> {edge['to']} ({edge['type']})")
+        return lines
+
+
+def trail_changes(config, trail_seeds):
+    # Seeds each trail in the config is missing, {trail id: [ids]}
+    changes = {}
+    for trail in config.get('trails', []):
+        seeds = trail.get('seeds', [])
+        new = [s for s in trail_seeds.get(trail.get('id'), []) if s not in seeds]
+        if new:
+            changes[trail['id']] = new
+    return changes
+
+
+def apply_server(plan, url):
+    request = urllib.request.Request(url.rstrip('/') + '/api/batch',
+                                     data=json.dumps({"ops": plan.ops}).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply link rule files to the card graph")
+    parser.add_argument('rules', nargs='*', help='rule files (default: every link_rules/*.json)')
+    parser.add_argument('--dry-run', action='store_true', help='only print the changes')
+    parser.add_argument('--force', action='store_true', help='apply even if validation finds errors')
+    parser.add_argument('--server', metavar='URL', help='send the batch to a running server instead of the files')
+    args = parser.parse_args()
+
+    paths = args.rules or sorted(os.path.join(RULES_DIR, f) for f in os.listdir(RULES_DIR) if f.endswith('.json'))
+
+    # Only opened to write the files: a CardStore compacts the journal when
+    # it loads, which must not happen under a running server
+    offline = not args.server and not args.dry_run
+    if offline and server_running():
+        print("The server is running; send the changes to it with --server http://localhost:8002.")
+        sys.exit(1)
+
+    print("Loading graph...")
+    store = CardStore(CARDS_FILE, RELS_FILE) if offline else None
+    plan = Plan(store.graph if store else load_graph(CARDS_FILE, RELS_FILE))
+    for path in paths:
+        plan.add_rules(load_json(path))
+
+    config = load_json(CONFIG_FILE) if plan.trail_seeds else {}
+    trails = trail_changes(config, plan.trail_seeds)
+
+    for note in plan.notes:
+        print(f"Note: {note}")
+    for line in plan.describe():
+        print(line)
+    for trail, seeds in trails.items():
+        print(f"+ trail {trail}: {', '.join(seeds)}")
+    if not plan.ops and not trails:
+        print("No changes needed.")
+        return
+
+    issues = validate_ops(plan.graph, plan.ops)
+    if issues:
+        print_report(issues)
+    if errors(issues) and not args.force:
+        print("Not applying: the changes fail validation (use --force to override).")
+        sys.exit(1)
+    if args.dry_run:
+        print(f"Dry run: {len(plan.ops)} changes, {sum(map(len, trails.values()))} trail seeds not applied.")
+        return
+
+    if plan.ops:
+        if args.server:
+            result = apply_server(plan, args.server)
+            print(f"Server applied {len(result.get('results', plan.ops))} changes.")
+        else:
+            # The plan was made against this store's graph, so apply it there
+            store.apply(plan.ops)
+            store.compact()
+            print(f"Applied {len(plan.ops)} changes.")
+
+    if trails:
+        for trail in config['trails']:
+            trail.setdefault('seeds', []).extend(trails.get(trail.get('id'), []))
+        save_json(CONFIG_FILE, config)
+        print("Updated trail seeds in pathfinder_config.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+
+import os
+import sys
+from collections import deque
+
+from card_graph import BASE_DIR, load_graph, load_json
+
+# Keyword classification of cards into categories.
+#
+# Every keyword of every category is compiled into one Aho-Corasick automaton,
+# so each card field is scanned once, left to right, whatever the number of
+# keywords or categories (time is linear in the text plus the matches). Each
+# match adds its keyword's weight times the field weight to the categories
+# that list it; a keyword counts once per field. A card's categories are
+# ranked by score, with confidence = share of the card's total score.
+#
+# Categories come from a JSON file (orphan_categories.json):
+#   {
+#     "fields": {"title": 3, "id": 2, "description": 1},
+#     "categories": {
+#       "Cloud (AWS)": {"keywords": ["aws", "amazon", ...]},
+#       "Media & Visuals": {"keywords": {"diagram": 2, "media": 1}, "types": ["media"]},
+#       ...
+#     }
+#   }
+# "keywords" is a list (weight 1 each) or {keyword: weight}; "types" gives
+# card types that belong to the category outright (TYPE_WEIGHT).
+#
+#   classifier = Classifier.load()
+#   classifier.classify(card)  -> [(category, score, confidence), ...]
+
+CATEGORIES_FILE = os.path.join(BASE_DIR, 'orphan_categories.json')
+DEFAULT_FIELDS = {"title": 3.0, "id": 2.0, "description": 1.0}
+TYPE_WEIGHT = 10.0
+UNCATEGORIZED = 'Uncategorized'
+
+
+class Automaton:
+    # Aho-Corasick over lowercase keywords; patterns are numbered in the order
+    # they are added
+    def __init__(self):
+        self.goto = [{}]        # node -> {char: node}
+        self.fail = [0]
+        self.out = [[]]         # node -> pattern numbers ending here
+        self.lengths = []
+
+    def add(self, word):
+        node = 0
+        for ch in word:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append(len(self.lengths))
+        self.lengths.append(len(word))
+        return len(self.lengths) - 1
+
+    def build(self):
+        # Breadth-first failure links; each node also inherits the outputs of
+        # its failure node so matching never has to follow the chain
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        return self
+
+    def matches(self, text):
+        # (start, pattern) for every occurrence of every pattern in text
+        goto, fail, out, lengths = self.goto, self.fail, self.out, self.lengths
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for p in out[node]:
+                yield i - lengths[p] + 1, p
+
+
+def word_start(text, i):
+    # Keywords only match at the start of a word ('git' not in 'digital'),
+    # but may run on into it ('dev' in 'developer')
+    return i == 0 or not text[i - 1].isalnum()
+
+
+class Classifier:
+    def __init__(self, categories, fields=None):
+        self.fields = dict(fields or DEFAULT_FIELDS)
+        self.categories = list(categories)
+        self.order = {name: i for i, name in enumerate(self.categories)}
+        self.types = {}                  # card type -> [category]
+        self.automaton = Automaton()
+        self.targets = []                # pattern -> [(category, weight)]
+        patterns = {}
+        for name, spec in categories.items():
+            keywords = spec.get('keywords', [])
+            if isinstance(keywords, list):
+                keywords = {k: 1.0 for k in keywords}
+            for keyword, weight in keywords.items():
+                keyword = keyword.lower()
+                p = patterns.get(keyword)
+                if p is None:
+                    p = patterns[keyword] = self.automaton.add(keyword)
+                    self.targets.append([])
+                self.targets[p].append((name, float(weight)))
+            for ctype in spec.get('types', []):
+                self.types.setdefault(ctype, []).append(name)
+        self.automaton.build()
+
+    @classmethod
+    def load(cls, path=CATEGORIES_FILE):
+        config = load_json(path)
+        return cls(config['categories'], config.get('fields'))
+
+    def scores(self, card):
+        scores = {}
+        for name in self.types.get(card.get('type'), []):
+            scores[name] = scores.get(name, 0.0) + TYPE_WEIGHT
+        for field, field_weight in self.fields.items():
+            text = str(card.get(field) or '').lower()
+            seen = set()
+            for start, p in self.automaton.matches(text):
+                if p in seen or not word_start(text, start):
+                    continue
+                seen.add(p)
+                for name, weight in self.targets[p]:
+                    scores[name] = scores.get(name, 0.0) + weight * field_weight
+        return scores
+
+    def classify(self, card):
+        # [(category, score, confidence)], best first; empty if nothing matched
+        scores = self.scores(card)
+        total = sum(scores.values())
+        ranked = sorted(scores.items(), key=lambda s: (-s[1], self.order[s[0]]))
+        return [(name, score, score / total) for name, score in ranked]
+
+    def best(self, card):
+        ranked = self.classify(card)
+        return ranked[0][0] if ranked else UNCATEGORIZED
+
+
+if __name__ == "__main__":
+    classifier = Classifier.load()
+    graph = load_graph()
+    for cid in sys.argv[1:] or list(graph.cards)[:20]:
+        card = graph.get(cid)
+        if card is None:
+            print(f"{cid}: not found")
+            continue
+        ranked = classifier.classify(card.data)
+        print(f"{cid}: " + (', '.join(f"{n} {c:.0%}" for n, _, c in ranked) or UNCATEGORIZED))
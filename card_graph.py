@@ -0,0 +1,247 @@
+
+import hashlib
+import json
+import os
+
+# Shared in-memory store for cards.json + relationships.json.
+# Parse both files once, then use the id index and the per-type adjacency
+# maps instead of rebuilding card_map / adj / has_parent in every script.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CARDS_FILE = os.path.join(BASE_DIR, 'cards.json')
+RELS_FILE = os.path.join(BASE_DIR, 'relationships.json')
+
+REL_TYPES = ('contains', 'show_media', 'leads_to', 'includes')
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_atomic(path, body):
+    # Temp file, fsync, rename: readers and crashes see either the old file
+    # or the new one, never a half-written one
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    # Make the rename itself durable (not possible on Windows)
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def save_json(path, data):
+    write_atomic(path, json.dumps(data, indent=2).encode('utf-8'))
+
+
+def file_hash(path, chunk=1 << 20):
+    # SHA-256 of a file's contents, hex
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def unwrap(data, key):
+    # Files are normally {"cards": [...]} / {"relationships": [...]}, but
+    # older exports were bare lists.
+    if isinstance(data, dict):
+        return data.get(key, [])
+    return data or []
+
+
+def edge_endpoints(r):
+    # The one place that knows about both edge key styles
+    # (from/to/strength written by card_manager.html, source/target/value
+    # written by the older linking scripts).
+    return (r.get('source') or r.get('from'), r.get('target') or r.get('to'))
+
+
+class Card:
+    __slots__ = ('id', 'type', 'title', 'data')
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.type = data.get('type', '')
+        self.title = data.get('title', '')
+        self.data = data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    @property
+    def description(self):
+        return self.data.get('description', '')
+
+    def __repr__(self):
+        return f"Card({self.id!r})"
+
+
+class Edge:
+    __slots__ = ('source', 'target', 'type', 'strength', 'extra')
+
+    def __init__(self, source, target, type='contains', strength='1', extra=None):
+        self.source = source
+        self.target = target
+        self.type = type
+        self.strength = strength
+        self.extra = extra or {}
+
+    @classmethod
+    def from_dict(cls, r):
+        src, tgt = edge_endpoints(r)
+        strength = r.get('strength', r.get('value', '1'))
+        extra = {k: v for k, v in r.items()
+                 if k not in ('source', 'from', 'target', 'to', 'type', 'strength', 'value')}
+        return cls(src, tgt, r.get('type', 'contains'), strength, extra)
+
+    @property
+    def key(self):
+        return (self.source, self.target, self.type)
+
+    def to_dict(self):
+        # Canonical on-disk form is the card_manager.html style
+        d = {"from": self.source, "to": self.target, "type": self.type, "strength": self.strength}
+        d.update(self.extra)
+        return d
+
+    def __repr__(self):
+        return f"Edge({self.source!r} -[{self.type}]-> {self.target!r})"
+
+
+class CardGraph:
+    def __init__(self, cards=None, relationships=None):
+        self.cards = {}      # id -> Card, insertion order = file order
+        self.edges = []      # list of Edge, file order
+        self.edge_index = {}  # (source, target, type) -> Edge
+        self.out = {t: {} for t in REL_TYPES}  # type -> source -> [target]
+        self.inc = {t: {} for t in REL_TYPES}  # type -> target -> [source]
+        self.set_cards(cards or [])
+        self.set_relationships(relationships or [])
+
+    @classmethod
+    def load(cls, cards_file=CARDS_FILE, rels_file=RELS_FILE):
+        cards_data = load_json(cards_file)
+        rels_data = load_json(rels_file) if rels_file else []
+        return cls(unwrap(cards_data, 'cards'), unwrap(rels_data, 'relationships'))
+
+    # --- Bulk replacement ---
+
+    def set_cards(self, cards_list):
+        self.cards = {}
+        for c in cards_list:
+            self.cards[c['id']] = Card(c)
+
+    def set_relationships(self, rels_list):
+        self.edges = []
+        self.edge_index = {}
+        self.out = {t: {} for t in REL_TYPES}
+        self.inc = {t: {} for t in REL_TYPES}
+        for r in rels_list:
+            edge = r if isinstance(r, Edge) else Edge.from_dict(r)
+            if edge.source and edge.target:
+                self._index_edge(edge)
+
+    # --- Lookup ---
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, card_id):
+        return card_id in self.cards
+
+    def get(self, card_id):
+        return self.cards.get(card_id)
+
+    def children(self, card_id, rtype='contains'):
+        return self.out.get(rtype, {}).get(card_id, [])
+
+    def parents(self, card_id, rtype='contains'):
+        return self.inc.get(rtype, {}).get(card_id, [])
+
+    def has_parent(self, card_id, rtype='contains'):
+        return bool(self.inc.get(rtype, {}).get(card_id))
+
+    def has_edge(self, source, target, rtype='contains'):
+        return (source, target, rtype) in self.edge_index
+
+    def edges_of_type(self, rtype):
+        return [e for e in self.edges if e.type == rtype]
+
+    def all_ids(self, rtype='contains'):
+        # Card ids plus any ids only referenced by edges of this type
+        ids = set(self.cards)
+        ids.update(self.out.get(rtype, {}))
+        ids.update(self.inc.get(rtype, {}))
+        return ids
+
+    def missing_ids(self):
+        return {i for e in self.edges for i in (e.source, e.target) if i not in self.cards}
+
+    # --- Mutation ---
+
+    def add_card(self, data):
+        card = Card(data)
+        self.cards[card.id] = card
+        return card
+
+    def remove_card(self, card_id, cascade=True):
+        card = self.cards.pop(card_id, None)
+        if card and cascade:
+            for e in [e for e in self.edges if e.source == card_id or e.target == card_id]:
+                self.remove_edge(e.source, e.target, e.type)
+        return card
+
+    def add_edge(self, source, target, rtype='contains', strength='1', **extra):
+        # Returns the new Edge, or None if the (source, target, type) already exists
+        if (source, target, rtype) in self.edge_index:
+            return None
+        edge = Edge(source, target, rtype, strength, extra)
+        self._index_edge(edge)
+        return edge
+
+    def remove_edge(self, source, target, rtype='contains'):
+        edge = self.edge_index.pop((source, target, rtype), None)
+        if edge is None:
+            return None
+        self.edges.remove(edge)
+        self.out[rtype][source].remove(target)
+        self.inc[rtype][target].remove(source)
+        return edge
+
+    def _index_edge(self, edge):
+        self.edges.append(edge)
+        self.edge_index.setdefault(edge.key, edge)
+        self.out.setdefault(edge.type, {}).setdefault(edge.source, []).append(edge.target)
+        self.inc.setdefault(edge.type, {}).setdefault(edge.target, []).append(edge.source)
+
+    # --- Serialisation ---
+
+    def cards_document(self):
+        return {"cards": [c.data for c in self.cards.values()]}
+
+    def relationships_document(self):
+        return {"relationships": [e.to_dict() for e in self.edges]}
+
+    def save_cards(self, path=CARDS_FILE):
+        save_json(path, self.cards_document())
+
+    def save_relationships(self, path=RELS_FILE):
+        save_json(path, self.relationships_document())
+
+
+def load_graph(cards_file=CARDS_FILE, rels_file=RELS_FILE):
+    if not rels_file:
+        return CardGraph.load(cards_file, None)
+    # Served from the binary cache next to cards.json when it is up to date
+    # (graph_cache.py imports this module, hence the late import)
+    import graph_cache
+    return graph_cache.load(cards_file, rels_file)
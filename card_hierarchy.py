@@ -0,0 +1,188 @@
+
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from card_graph import CARDS_FILE, RELS_FILE, load_graph
+
+# D3-ready hierarchies from the 'contains' graph, for skills_sunburst.js /
+# skills_radar.js (d3.hierarchy) in place of hand-maintained nested JSON.
+#
+# The tree is walked breadth-first from the given roots; a node reachable
+# along several paths sits under the first parent to reach it, so each node
+# appears once. Every node carries aggregates over its whole subtree, even
+# where the tree is cut off at `depth`:
+#   size     nodes in the subtree, itself included
+#   leaves   nodes in the subtree with no children (1 for a leaf)
+#   weight   summed strength of the 'contains' links in the subtree
+# so d3.hierarchy(data).sum(d => d.children ? 0 : d.leaves) sizes pruned
+# branches correctly. Several roots hang under one unnamed node.
+#
+# Two encodings:
+#   nested    {"id", "name", "type", "size", "leaves", "weight", "children": [...]}
+#   compact   {"fields": [...], "nodes": [[id, name, type, size, leaves, weight]],
+#              "children": [[child indices], ...]}    node 0 is the root
+#
+#   tree = build(graph, ['1101_access_control'], depth=3)
+#   nested(tree) / compact(tree)
+#   python card_hierarchy.py [root ...] [--depth N]
+
+FIELDS = ('id', 'name', 'type', 'size', 'leaves', 'weight')
+MAX_ENTRIES = 64
+
+
+def _strength(edge):
+    try:
+        return float(edge.strength)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def top_roots(graph):
+    # Nodes that contain something and that nothing contains
+    out = graph.out.get('contains', {})
+    inc = graph.inc.get('contains', {})
+    return [nid for nid, children in out.items() if children and not inc.get(nid)]
+
+
+def build(graph, roots, depth=None, whitelist=None):
+    # The tree as (rows, children): rows[i] = [id, name, type, size, leaves,
+    # weight] in breadth-first order, children[i] = child indices (empty
+    # below `depth`). whitelist: if given, other nodes are left out along
+    # with everything only reachable through them.
+    out = graph.out.get('contains', {})
+    strengths = {}
+    for edge in graph.edges:
+        if edge.type == 'contains':
+            strengths[(edge.source, edge.target)] = _strength(edge)
+
+    synthetic = len(roots) != 1
+    ids = [None] if synthetic else []
+    parent = [-1] if synthetic else []
+    index = {}
+    for root in roots:
+        if root not in index and (whitelist is None or root in whitelist):
+            index[root] = len(ids)
+            ids.append(root)
+            parent.append(0 if synthetic else -1)
+    queue = deque(range(1 if synthetic else 0, len(ids)))
+    while queue:
+        pos = queue.popleft()
+        for child in out.get(ids[pos], ()):
+            if child in index or (whitelist is not None and child not in whitelist):
+                continue
+            index[child] = len(ids)
+            ids.append(child)
+            parent.append(pos)
+            queue.append(len(ids) - 1)
+
+    n = len(ids)
+    level = [0] * n
+    for pos in range(n):
+        if parent[pos] >= 0:
+            level[pos] = level[parent[pos]] + 1
+    size = [1] * n
+    leaves = [0] * n
+    weight = [0.0] * n
+    has_children = [False] * n
+    for pos in range(n):
+        if parent[pos] >= 0:
+            has_children[parent[pos]] = True
+    # Children come after their parent, so one backwards pass sums them up
+    for pos in range(n - 1, -1, -1):
+        if not has_children[pos]:
+            leaves[pos] = 1
+        p = parent[pos]
+        if p >= 0:
+            size[p] += size[pos]
+            leaves[p] += leaves[pos]
+            weight[p] += weight[pos] + (strengths.get((ids[p], ids[pos]), 1.0) if ids[p] is not None else 0.0)
+
+    # Rows for the nodes within `depth`, renumbered
+    keep = [pos for pos in range(n) if depth is None or level[pos] <= depth]
+    renumber = {pos: i for i, pos in enumerate(keep)}
+    rows = []
+    children = [[] for _ in keep]
+    for pos in keep:
+        cid = ids[pos]
+        card = graph.cards.get(cid) if cid is not None else None
+        name = card.data.get('title', cid) if card is not None else cid
+        rows.append([cid, name, card.type if card is not None else None,
+                     size[pos], leaves[pos], round(weight[pos], 6)])
+        if parent[pos] >= 0:
+            children[renumber[parent[pos]]].append(renumber[pos])
+    return rows, children
+
+
+def compact(tree):
+    rows, children = tree
+    return {"fields": list(FIELDS), "nodes": rows, "children": children}
+
+
+def nested(tree):
+    rows, children = tree
+    if not rows:
+        return None
+    nodes = [dict(zip(FIELDS, row)) for row in rows]
+    for i, kids in enumerate(children):
+        if kids:
+            nodes[i]['children'] = [nodes[k] for k in kids]
+    return nodes[0]
+
+
+class HierarchyCache:
+    # Encoded hierarchies for a CardStore, kept until the cards or
+    # relationships change (names come from the cards, structure from the
+    # relationships). Least recently used requests are dropped past
+    # max_entries.
+    def __init__(self, store, max_entries=MAX_ENTRIES):
+        self.store = store
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.versions = None
+
+    def get(self, roots, depth=None, whitelist=None, encoding='nested'):
+        # (JSON body, (cards version, relationships version)); roots None:
+        # every top-level node
+        key = (tuple(roots) if roots is not None else None, depth,
+               tuple(sorted(whitelist)) if whitelist is not None else None, encoding)
+        store = self.store
+        with self.lock:
+            with store.lock:
+                versions = (store.versions['cards'], store.versions['relationships'])
+                if versions != self.versions:
+                    self.entries.clear()
+                    self.versions = versions
+                body = self.entries.get(key)
+                if body is None:
+                    tree = build(store.graph, roots if roots is not None else top_roots(store.graph), depth, whitelist)
+            if body is None:
+                body = json.dumps(compact(tree) if encoding == 'compact' else nested(tree),
+                                  separators=(',', ':')).encode('utf-8')
+                self.entries[key] = body
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            else:
+                self.entries.move_to_end(key)
+            return body, versions
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    depth = None
+    if '--depth' in args:
+        i = args.index('--depth')
+        depth = int(args[i + 1])
+        del args[i:i + 2]
+    graph = load_graph(CARDS_FILE, RELS_FILE)
+    roots = args or top_roots(graph)
+    start = time.perf_counter()
+    tree = build(graph, roots, depth)
+    elapsed = time.perf_counter() - start
+    rows, children = tree
+    print(f"{len(rows)} nodes under {len(roots)} root(s), {rows[0][3] if rows else 0} in the full tree; "
+          f"built in {elapsed * 1000:.1f} ms")
+    print(f"nested {len(json.dumps(nested(tree)))} bytes, compact {len(json.dumps(compact(tree)))} bytes")
@@ -0,0 +1,357 @@
+
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+
+from card_graph import BASE_DIR, CardGraph, edge_endpoints, load_json, save_json, unwrap
+
+# Version history of cards.json / relationships.json as deltas.
+#
+# history/log.jsonl holds one line per version:
+#   {"version", "ts", "note", "delta"}
+# where delta only lists what changed since the previous version:
+#   "put"    {id: card}                            new cards (whole card)
+#   "patch"  {id: {"set": {...}, "unset": [...]}}   changed fields only
+#   "remove" [id, ...]
+#   "edges_add"    [edge, ...]                     from/to/type/strength form
+#   "edges_remove" [[from, to, type], ...]
+#   "order"  [id, ...]   only if the card order changed other than by
+#                        appending new cards / dropping removed ones
+# Every CHECKPOINT_EVERY versions (and for version 1) the full state is also
+# written to history/checkpoint_<version>.json.gz, so checking out a version
+# replays at most CHECKPOINT_EVERY - 1 deltas.
+#
+#   history = History()
+#   history.record(graph, note='...')               -> new version (or None)
+#   history.record(graph, touched={'id1', 'id2'})   only compares those ids
+#   cards, relationships = history.checkout(12)
+#   history.diff(10, 12)
+
+HISTORY_DIR = os.path.join(BASE_DIR, 'history')
+CHECKPOINT_EVERY = 50
+
+
+def edge_key(edge):
+    return (edge['from'], edge['to'], edge.get('type', 'contains'))
+
+
+def ops_touched(ops):
+    # Card ids a batch of CardStore ops can have changed (cards or edges)
+    touched = set()
+    for op in ops:
+        if op.get('op') == 'put_card':
+            touched.add(op['card']['id'])
+        elif op.get('op') in ('patch_card', 'delete_card'):
+            touched.add(op['id'])
+        elif 'edge' in op:
+            touched.update(e for e in edge_endpoints(op['edge']) if e)
+    return touched
+
+
+def _copy(obj):
+    return json.loads(json.dumps(obj))
+
+
+class State:
+    # Cards and edges at one version, indexed for cheap comparison
+    def __init__(self, cards=None, edges=None):
+        self.cards = {}     # id -> card dict
+        self.edges = {}     # (from, to, type) -> edge dict
+        self.by_card = {}   # id -> set of edge keys touching it
+        for card in cards or []:
+            self.cards[card['id']] = card
+        for edge in edges or []:
+            self.add_edge(edge)
+
+    def add_edge(self, edge):
+        key = edge_key(edge)
+        self.edges[key] = edge
+        for end in key[:2]:
+            self.by_card.setdefault(end, set()).add(key)
+
+    def remove_edge(self, key):
+        self.edges.pop(key, None)
+        for end in key[:2]:
+            keys = self.by_card.get(end)
+            if keys is not None:
+                keys.discard(key)
+
+    def apply(self, delta):
+        for cid in delta.get('remove', []):
+            self.cards.pop(cid, None)
+        for cid, card in delta.get('put', {}).items():
+            self.cards[cid] = card
+        for cid, change in delta.get('patch', {}).items():
+            card = dict(self.cards[cid])
+            card.update(change.get('set', {}))
+            for field in change.get('unset', []):
+                card.pop(field, None)
+            self.cards[cid] = card
+        for key in delta.get('edges_remove', []):
+            self.remove_edge(tuple(key))
+        for edge in delta.get('edges_add', []):
+            self.add_edge(edge)
+        if 'order' in delta:
+            self.cards = {cid: self.cards[cid] for cid in delta['order']}
+
+    def documents(self):
+        return list(self.cards.values()), list(self.edges.values())
+
+
+def card_delta(old, new):
+    # {"set", "unset"} for one card, or None if unchanged
+    changed = {k: v for k, v in new.items() if old.get(k, object()) != v}
+    unset = [k for k in old if k not in new]
+    if not changed and not unset:
+        return None
+    change = {}
+    if changed:
+        change['set'] = changed
+    if unset:
+        change['unset'] = unset
+    return change
+
+
+def compute_delta(state, cards, edges, card_ids=None, edge_keys=None):
+    # cards: id -> card dict, edges: key -> edge dict (the new version).
+    # card_ids / edge_keys limit what is compared; None compares everything.
+    if card_ids is None:
+        card_ids = set(state.cards) | set(cards)
+    if edge_keys is None:
+        edge_keys = set(state.edges) | set(edges)
+
+    # Walk the new cards in their order, so 'put' replays in the same order
+    ordered = [cid for cid in cards if cid in card_ids]
+    ordered += [cid for cid in card_ids if cid not in cards]
+
+    delta = {}
+    for cid in ordered:
+        old, new = state.cards.get(cid), cards.get(cid)
+        if old is None and new is not None:
+            delta.setdefault('put', {})[cid] = new
+        elif old is not None and new is None:
+            delta.setdefault('remove', []).append(cid)
+        elif old is not None:
+            change = card_delta(old, new)
+            if change:
+                delta.setdefault('patch', {})[cid] = change
+    for key in edge_keys:
+        old, new = state.edges.get(key), edges.get(key)
+        if old != new:
+            if old is not None:
+                delta.setdefault('edges_remove', []).append(list(key))
+            if new is not None:
+                delta.setdefault('edges_add', []).append(new)
+    return delta
+
+
+class History:
+    def __init__(self, directory=HISTORY_DIR, checkpoint_every=CHECKPOINT_EVERY):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.log_file = os.path.join(directory, 'log.jsonl')
+        self.lock = threading.RLock()
+        self.entries = []   # [{"version", "ts", "note", "offset"}], in order
+        self.head_state = None
+        self.head_delta = None
+        self._scan()
+
+    def _scan(self):
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, 'rb') as f:
+            offset = 0
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line from a crash mid-append
+                    break
+                self.entries.append({"version": entry['version'], "ts": entry['ts'],
+                                     "note": entry.get('note', ''), "offset": offset})
+                offset += len(line)
+
+    @property
+    def head(self):
+        return self.entries[-1]['version'] if self.entries else 0
+
+    def _checkpoint_file(self, version):
+        return os.path.join(self.directory, f'checkpoint_{version:06d}.json.gz')
+
+    def _write_checkpoint(self, version, state):
+        cards, edges = state.documents()
+        tmp = self._checkpoint_file(version) + '.tmp'
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump({"version": version, "cards": cards, "relationships": edges}, f, separators=(',', ':'))
+        os.replace(tmp, self._checkpoint_file(version))
+
+    def _read_delta(self, entry):
+        with open(self.log_file, 'rb') as f:
+            f.seek(entry['offset'])
+            return json.loads(f.readline()).get('delta') or {}
+
+    # --- Reads ---
+
+    def state_at(self, version):
+        with self.lock:
+            if not 1 <= version <= self.head:
+                raise KeyError(f"No version {version}")
+            if version == self.head and self.head_state is not None:
+                return self.head_state
+            # Nearest checkpoint at or before the version, then replay forward
+            base = version - (version - 1) % self.checkpoint_every
+            with gzip.open(self._checkpoint_file(base), 'rt', encoding='utf-8') as f:
+                snap = json.load(f)
+            state = State(snap['cards'], snap['relationships'])
+            for entry in self.entries[base:version]:
+                state.apply(self._read_delta(entry))
+            return state
+
+    def delta(self, version):
+        # The delta recorded for `version` (None for a full record)
+        with self.lock:
+            if not 1 <= version <= self.head:
+                raise KeyError(f"No version {version}")
+            if version == self.head and self.head_delta is not None:
+                return self.head_delta
+            return self._read_delta(self.entries[version - 1]) or None
+
+    def checkout(self, version):
+        # (cards, relationships) lists as they were at `version`
+        cards, edges = self.state_at(version).documents()
+        return _copy(cards), _copy(edges)
+
+    def log(self):
+        return [{"version": e['version'], "ts": e['ts'], "note": e['note']} for e in self.entries]
+
+    def diff(self, a, b):
+        # Structural diff from version a to version b
+        old, new = self.state_at(a), self.state_at(b)
+        delta = compute_delta(old, new.cards, new.edges)
+        added = {edge_key(e) for e in delta.get('edges_add', [])}
+        removed = {tuple(k) for k in delta.get('edges_remove', [])}
+        return {
+            "from": a,
+            "to": b,
+            "cards": {
+                "added": sorted(delta.get('put', {})),
+                "removed": sorted(delta.get('remove', [])),
+                "changed": {cid: {"fields": sorted(set(c.get('set', {})) | set(c.get('unset', []))), **c}
+                            for cid, c in sorted(delta.get('patch', {}).items())},
+            },
+            "edges": {
+                "added": sorted(added - removed),
+                "removed": sorted(removed - added),
+                "changed": sorted(added & removed),
+            },
+        }
+
+    # --- Writes ---
+
+    def record(self, graph, touched=None, note=''):
+        # Record the graph as a new version if it differs from head. With
+        # `touched` (card ids whose cards or edges may have changed) only
+        # those are compared; otherwise everything is.
+        with self.lock:
+            if not self.entries:
+                touched = None
+            cards = {}
+            edges = {}
+            if touched is None:
+                cards = {cid: c.data for cid, c in graph.cards.items()}
+                edges = {e.key: e.to_dict() for e in graph.edge_index.values()}
+                card_ids = edge_keys = None
+            else:
+                state = self._head()
+                card_ids = set(touched)
+                edge_keys = set()
+                for cid in card_ids:
+                    if cid in graph.cards:
+                        cards[cid] = graph.cards[cid].data
+                    edge_keys |= state.by_card.get(cid, set())
+                    for rtype in graph.out:
+                        for target in graph.out[rtype].get(cid, []):
+                            edge_keys.add((cid, target, rtype))
+                        for source in graph.inc[rtype].get(cid, []):
+                            edge_keys.add((source, cid, rtype))
+                for key in edge_keys:
+                    edge = graph.edge_index.get(key)
+                    if edge is not None:
+                        edges[key] = edge.to_dict()
+
+            if not self.entries:
+                return self._append(State(_copy(list(cards.values())), _copy(list(edges.values()))), None, note)
+            state = self._head()
+            delta = compute_delta(state, cards, edges, card_ids, edge_keys)
+            if touched is None:
+                # New cards are appended on replay; only keep the full order
+                # if that wouldn't reproduce it
+                removed = set(delta.get('remove', []))
+                replayed = [cid for cid in state.cards if cid not in removed]
+                replayed += [cid for cid in delta.get('put', {})]
+                if replayed != list(cards):
+                    delta['order'] = list(cards)
+            if not delta:
+                return None
+            delta = _copy(delta)
+            state.apply(delta)
+            return self._append(state, delta, note)
+
+    def record_documents(self, cards, relationships, note=''):
+        # Record plain document lists (e.g. importing old file copies)
+        return self.record(CardGraph(cards, relationships), note=note)
+
+    def _head(self):
+        if self.head_state is None:
+            self.head_state = self.state_at(self.head) if self.entries else State()
+        return self.head_state
+
+    def _append(self, state, delta, note):
+        os.makedirs(self.directory, exist_ok=True)
+        version = self.head + 1
+        ts = time.time()
+        line = json.dumps({"version": version, "ts": ts, "note": note, "delta": delta},
+                          separators=(',', ':')) + '\n'
+        offset = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        if (version - 1) % self.checkpoint_every == 0:
+            self._write_checkpoint(version, state)
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+        self.entries.append({"version": version, "ts": ts, "note": note, "offset": offset})
+        self.head_state = state
+        self.head_delta = delta
+        return version
+
+
+def _usage():
+    print("Usage: python card_history.py log")
+    print("       python card_history.py diff <version> <version>")
+    print("       python card_history.py checkout <version> <cards.json> <relationships.json>")
+    print("       python card_history.py import <cards.json> <relationships.json> [note]")
+
+
+if __name__ == "__main__":
+    history = History()
+    args = sys.argv[1:]
+    if not args:
+        _usage()
+    elif args[0] == 'log':
+        for e in history.log():
+            print(f"{e['version']:>5}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(e['ts']))}  {e['note']}")
+    elif args[0] == 'diff' and len(args) == 3:
+        print(json.dumps(history.diff(int(args[1]), int(args[2])), indent=2))
+    elif args[0] == 'checkout' and len(args) == 4:
+        cards, rels = history.checkout(int(args[1]))
+        save_json(args[2], {"cards": cards})
+        save_json(args[3], {"relationships": rels})
+        print(f"Wrote version {args[1]}: {len(cards)} cards, {len(rels)} relationships.")
+    elif args[0] == 'import' and len(args) >= 3:
+        cards = unwrap(load_json(args[1]), 'cards')
+        rels = unwrap(load_json(args[2]), 'relationships')
+        version = history.record_documents(cards, rels, args[3] if len(args) > 3 else f"import {args[1]}")
+        print(f"Recorded version {version}." if version else "No changes since the last version.")
+    else:
+        _usage()
@@ -0,0 +1,158 @@
+
+from card_graph import Edge
+from card_history import edge_key
+from card_store import StoreError
+
+# Three-way merge of concurrent edits, keyed by card id / edge key.
+#
+# A client saves against the revision (history version) its copy was loaded
+# at. The server merges its edit ("yours") with everything committed since
+# ("theirs"), using that revision as the common base:
+#   - an item only one side changed takes that side's version
+#   - an item both sides changed is merged field by field, and only a field
+#     both sides changed to different values is a conflict
+#   - delete on one side against a change on the other is a conflict
+# Conflicts are reported all at once (MergeConflict) and nothing is applied.
+#
+#   cards = merge_documents(base_cards, current_cards, saved_cards, card_key)
+#   ops = rebase_ops(ops, graph, state_at)    ops carrying "base": revision
+
+ABSENT = object()
+CARD_OPS = ('put_card', 'patch_card', 'delete_card')
+
+
+class MergeConflict(StoreError):
+    def __init__(self, conflicts):
+        super().__init__(f"{len(conflicts)} conflicting edits")
+        self.conflicts = conflicts
+
+
+def card_key(card):
+    return card['id']
+
+
+def _json(value):
+    return None if value is ABSENT else value
+
+
+def _conflict(key, field, base, theirs, ours):
+    return {"key": list(key) if isinstance(key, tuple) else key, "field": field,
+            "base": _json(base), "theirs": _json(theirs), "yours": _json(ours)}
+
+
+def merge_item(key, base, theirs, ours, conflicts):
+    # base / theirs / ours: one item's dict, or None where it doesn't exist.
+    # Returns the merged dict (None: deleted) and appends any conflicts.
+    if ours == base:
+        return theirs
+    if theirs == base or theirs == ours:
+        return ours
+    if base is None or theirs is None or ours is None:
+        conflicts.append(_conflict(key, None, base, theirs, ours))
+        return theirs
+
+    merged = {}
+    fields = list(ours) + [f for f in theirs if f not in ours] + [f for f in base if f not in ours and f not in theirs]
+    for field in fields:
+        b, t, o = base.get(field, ABSENT), theirs.get(field, ABSENT), ours.get(field, ABSENT)
+        if o == b:
+            value = t
+        elif t == b or t == o:
+            value = o
+        else:
+            conflicts.append(_conflict(key, field, b, t, o))
+            value = t
+        if value is not ABSENT:
+            merged[field] = value
+    return merged
+
+
+def merge_documents(base, theirs, ours, key):
+    # Lists of items -> the merged list, in the saved order with items only
+    # the other side added at the end. Raises MergeConflict.
+    base = {key(item): item for item in base}
+    theirs_by_key = {key(item): item for item in theirs}
+    ours_by_key = {key(item): item for item in ours}
+    order = list(ours_by_key) + [k for k in theirs_by_key if k not in ours_by_key]
+
+    conflicts = []
+    merged = []
+    for k in order:
+        item = merge_item(k, base.get(k), theirs_by_key.get(k), ours_by_key.get(k), conflicts)
+        if item is not None:
+            merged.append(item)
+    if conflicts:
+        raise MergeConflict(conflicts)
+    return merged
+
+
+def normalize_edges(relationships):
+    # Both edge key styles to the canonical from/to/strength form
+    return [Edge.from_dict(r).to_dict() for r in relationships]
+
+
+def merge_cards(base_state, graph, cards):
+    return merge_documents(base_state.cards.values(), [c.data for c in graph.cards.values()], cards, card_key)
+
+
+def merge_relationships(base_state, graph, relationships):
+    return merge_documents(base_state.edges.values(), [e.to_dict() for e in graph.edges],
+                           normalize_edges(relationships), edge_key)
+
+
+def patched(card, fields):
+    # A card dict with a patch_card op's fields applied (None deletes)
+    card = dict(card)
+    for field, value in fields.items():
+        if value is None:
+            card.pop(field, None)
+        else:
+            card[field] = value
+    return card
+
+
+def rebase_ops(ops, graph, state_at):
+    # put_card / patch_card / delete_card ops carrying "base" (the revision
+    # the client's copy of that card came from) are merged with what changed
+    # since: put_card gets the merged card, patch_card the fields that take
+    # the current card to the merged one, and ops with nothing left to do are
+    # dropped. Other ops pass through. state_at(revision) -> history State.
+    states = {}
+    conflicts = []
+    rebased = []
+    for op in ops:
+        if not isinstance(op, dict) or op.get('base') is None or op.get('op') not in CARD_OPS:
+            rebased.append(op)
+            continue
+        op = dict(op)
+        revision = op.pop('base')
+        if revision not in states:
+            states[revision] = state_at(revision)
+        card_id = op['card'].get('id') if op['op'] == 'put_card' else op.get('id')
+        base = states[revision].cards.get(card_id)
+        current = graph.cards.get(card_id)
+        current = current.data if current is not None else None
+        if op['op'] == 'patch_card':
+            if base is None or not isinstance(op.get('fields'), dict):
+                # Nothing to merge against; CardStore checks it as it is
+                rebased.append(op)
+                continue
+            ours = patched(base, op['fields'])
+        else:
+            ours = op['card'] if op['op'] == 'put_card' else None
+        merged = merge_item(card_id, base, current, ours, conflicts)
+        if merged is None:
+            if current is not None:
+                rebased.append(op)
+        elif op['op'] == 'put_card':
+            op['card'] = merged
+            rebased.append(op)
+        elif current is not None:
+            fields = {f: v for f, v in merged.items() if current.get(f, ABSENT) != v}
+            fields.update((f, None) for f in current if f not in merged)
+            if fields:
+                op['fields'] = fields
+                rebased.append(op)
+    if conflicts:
+        raise MergeConflict(conflicts)
+    return rebased
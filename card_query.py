@@ -0,0 +1,143 @@
+
+import bisect
+
+# Read-side indexes for /api/cards.
+#
+# Built once per data version (see CardStore.derived) so each query only
+# touches the cards it returns:
+#   by_type  normalised type -> ids (sorted)
+#   ids      all card ids (sorted), for id-prefix ranges and the cursor
+#   stacks   parent id -> its 'contains' children (sorted)
+#   deep     parent id -> everything under it (sorted)
+# A query starts from the shortest of the lists its filters select.
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def norm_type(t):
+    return (t or '').lower().strip()
+
+
+class CardIndex:
+    def __init__(self, graph):
+        self.graph = graph
+        self.ids = sorted(graph.cards)
+        self.by_type = {}
+        for cid in self.ids:
+            self.by_type.setdefault(norm_type(graph.cards[cid].type), []).append(cid)
+
+        connected = set()
+        for e in graph.edges:
+            connected.add(e.source)
+            connected.add(e.target)
+        self.unconnected = [cid for cid in self.ids if cid not in connected]
+
+        children = graph.out.get('contains', {})
+        self.stacks = {parent: sorted(kids) for parent, kids in children.items() if kids}
+        self.deep = {}
+        for parent in self.stacks:
+            seen = set()
+            todo = list(children[parent])
+            while todo:
+                cid = todo.pop()
+                if cid not in seen:
+                    seen.add(cid)
+                    # Subtrees already walked are reused
+                    if cid in self.deep:
+                        seen.update(self.deep[cid])
+                    else:
+                        todo.extend(children.get(cid, []))
+            self.deep[parent] = sorted(seen)
+
+    def prefix_range(self, prefix):
+        lo = bisect.bisect_left(self.ids, prefix)
+        hi = bisect.bisect_left(self.ids, prefix + '\uffff')
+        return self.ids[lo:hi]
+
+    def stack_members(self, stack_id, deep=False):
+        return (self.deep if deep else self.stacks).get(stack_id, [])
+
+    def query(self, types=None, stack=None, deep=False, prefix=None, q=None,
+              unconnected=False, fields=None, limit=DEFAULT_LIMIT, cursor=None):
+        # Start from the most selective index, then filter the rest
+        options = []
+        if prefix:
+            options.append(self.prefix_range(prefix))
+        if stack:
+            options.append(self.stack_members(stack, deep))
+        if types:
+            options.append(sorted(cid for t in types for cid in self.by_type.get(norm_type(t), [])))
+        if unconnected:
+            options.append(self.unconnected)
+        candidates = min(options, key=len) if options else self.ids
+
+        wanted_types = {norm_type(t) for t in types} if types else None
+        members = set(self.stack_members(stack, deep)) if stack else None
+        loose = set(self.unconnected) if unconnected else None
+        needle = q.lower() if q else None
+
+        if cursor:
+            # Key-set pagination: the cursor is the last id of the previous page
+            candidates = candidates[bisect.bisect_right(candidates, cursor):]
+
+        cards = self.graph.cards
+        page = []
+        more = False
+        for cid in candidates:
+            card = cards.get(cid)
+            if card is None:
+                # Deleted since this index was built
+                continue
+            if wanted_types is not None and norm_type(card.type) not in wanted_types:
+                continue
+            if members is not None and cid not in members:
+                continue
+            if loose is not None and cid not in loose:
+                continue
+            if needle and needle not in cid.lower() and needle not in (card.title or '').lower():
+                continue
+            if len(page) == limit:
+                # One match past the page is enough to know there is more
+                more = True
+                break
+            page.append(card)
+
+        return {
+            "cards": [project(c, fields) for c in page],
+            "count": len(page),
+            "next_cursor": page[-1].id if more else None,
+        }
+
+
+def project(card, fields):
+    if not fields:
+        return card.data
+    out = {"id": card.id}
+    for f in fields:
+        if f in card.data:
+            out[f] = card.data[f]
+    return out
+
+
+def parse_query(params):
+    # params: dict of lists, as returned by urllib.parse.parse_qs
+    def one(name):
+        return params.get(name, [None])[0]
+
+    def as_list(name):
+        value = one(name)
+        return [v.strip() for v in value.split(',') if v.strip()] if value else None
+
+    limit = int(one('limit') or DEFAULT_LIMIT)
+    return {
+        "types": as_list('type'),
+        "stack": one('stack'),
+        "deep": one('deep') in ('1', 'true'),
+        "prefix": one('prefix'),
+        "q": one('q'),
+        "unconnected": one('unconnected') in ('1', 'true'),
+        "fields": as_list('fields'),
+        "limit": max(1, min(limit, MAX_LIMIT)),
+        "cursor": one('cursor'),
+    }
@@ -0,0 +1,399 @@
+
+import json
+import os
+import shutil
+import threading
+import time
+
+from card_graph import BASE_DIR, CARDS_FILE, RELS_FILE, Edge, load_graph, write_atomic
+import graph_cache
+
+# Incremental persistence for the card graph.
+#
+# Every change is applied to the in-memory CardGraph and appended (fsynced)
+# as one line to an append-only journal; once that returns the change is
+# durable. Whole-document saves are journalled the same way, as one
+# {"replace": kind, "items": [...]} line.
+#
+# The full cards.json / relationships.json files are rewritten in the
+# background (compaction): WRITE_DELAY seconds after the first change, so a
+# burst of saves costs one write. Each file goes through a temp file, fsync
+# and rename. Before writing, the journal is moved aside to
+# changes.journal.writing and only deleted once the files are on disk; a
+# crash at any point leaves the ops in one of the two journals, and they are
+# replayed at startup, older one first. The files may already hold some of
+# them (a crash after the write but before the delete), so replay tolerates
+# ops that no longer fit: a patch of a card deleted later in the same journal
+# is skipped, and any other op that fails is reported and skipped rather
+# than stopping the server from starting.
+# compact() writes synchronously, e.g. at the end of a script.
+#
+# Ops (one dict each, applied in order):
+#   {"op": "put_card",    "card": {...}}                  create or replace
+#   {"op": "patch_card",  "id": "...", "fields": {...}}   merge; null deletes a field
+#   {"op": "delete_card", "id": "..."}                    also drops its edges
+#   {"op": "add_edge",    "edge": {"from", "to", "type", ...}}
+#   {"op": "remove_edge", "edge": {"from", "to", "type"}}
+
+JOURNAL_FILE = os.path.join(BASE_DIR, 'changes.journal')
+# Written by server.py while it has the store open. Scripts that would write
+# the files (or the journal) themselves check server_running() first: the
+# server's own compaction would overwrite their changes.
+SERVER_PID_FILE = os.path.join(BASE_DIR, 'server.pid')
+WRITE_DELAY = 1.0
+EDGE_LOG_SIZE = 10000
+
+OPS = ('put_card', 'patch_card', 'delete_card', 'add_edge', 'remove_edge')
+
+
+class StoreError(ValueError):
+    pass
+
+
+def server_running(pid_file=SERVER_PID_FILE):
+    # A pid file left by a server that died is ignored where processes can
+    # be probed; on Windows the file alone counts
+    try:
+        with open(pid_file, 'r', encoding='utf-8') as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return False
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class CardStore:
+    def __init__(self, cards_file=CARDS_FILE, rels_file=RELS_FILE,
+                 journal_file=JOURNAL_FILE, write_delay=WRITE_DELAY):
+        self.cards_file = cards_file
+        self.rels_file = rels_file
+        self.journal_file = journal_file
+        self.writing_file = journal_file + '.writing'
+        self.write_delay = write_delay
+        self.lock = threading.RLock()
+        # Held for a whole compaction, so only one writes at a time
+        self.write_lock = threading.Lock()
+        self.write_scheduled = False
+        self.graph = load_graph(cards_file, rels_file)
+
+        # Bumped on every change; the server uses these for ETags
+        self.versions = {'cards': 0, 'relationships': 0}
+        self.modified = {'cards': time.time(), 'relationships': time.time()}
+        self.dirty = set()
+        self.pending = 0
+        self._documents = {}
+        self._derived = {}
+        # observer(operation, kind, seconds), if set, is told how long each
+        # compaction ('compact') and document serialisation ('serialize') took
+        self.observer = None
+
+        # (relationships version, source id) for each edge change, so derived
+        # data can tell which adjacency lists changed since it was computed.
+        # Whole-document saves reset it (everything may have changed).
+        self.edge_log = []
+        self.edge_log_start = 0
+        # Same for card ids, keyed by cards version
+        self.card_log = []
+        self.card_log_start = 0
+
+        self.replay()
+
+    # --- Journal ---
+
+    def replay(self):
+        replayed = 0
+        for path in (self.writing_file, self.journal_file):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line from a crash mid-append
+                        break
+                    changes = [entry] if 'replace' in entry else entry.get('ops', [])
+                    for change in changes:
+                        try:
+                            if 'replace' in change:
+                                self._replace(change['replace'], change['items'])
+                            else:
+                                self._apply_op(change)
+                        except (AttributeError, KeyError, TypeError, ValueError) as e:
+                            print(f"Warning: skipped a journalled change that no longer applies "
+                                  f"({os.path.basename(path)}: {e!r})")
+                            continue
+                        replayed += 1
+        if replayed:
+            print(f"Replayed {replayed} journalled changes.")
+        self.compact()
+        return replayed
+
+    def _append_journal(self, entry):
+        entry = dict(entry, ts=time.time())
+        line = json.dumps(entry, separators=(',', ':'))
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rotate_journal(self):
+        # Moves the journal aside before a write (with self.lock held).
+        # Returns the file to delete once the write is done, if any.
+        if os.path.exists(self.journal_file):
+            if os.path.exists(self.writing_file):
+                # Left by a failed write: keep both, oldest first
+                with open(self.journal_file, 'rb') as src, open(self.writing_file, 'ab') as dst:
+                    shutil.copyfileobj(src, dst)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.journal_file)
+            else:
+                os.replace(self.journal_file, self.writing_file)
+        return self.writing_file if os.path.exists(self.writing_file) else None
+
+    def _schedule_write(self):
+        # With self.lock held, after a change: write the files WRITE_DELAY
+        # seconds from now, together with whatever else changes until then
+        if self.write_scheduled:
+            return
+        self.write_scheduled = True
+        timer = threading.Timer(self.write_delay, self._background_write)
+        timer.daemon = True
+        timer.start()
+
+    def _background_write(self):
+        try:
+            self.compact()
+        except OSError as e:
+            print(f"Could not write the data files ({e}); retrying.")
+            with self.lock:
+                self._schedule_write()
+
+    def compact(self):
+        # Writes the changed files now. The documents are snapshotted under
+        # the lock but serialised and written outside it, so requests carry
+        # on meanwhile.
+        with self.write_lock:
+            with self.lock:
+                self.write_scheduled = False
+                kinds = sorted(self.dirty)
+                versions = dict(self.versions)
+                documents = {kind: self._documents.get(kind) or (self.graph.cards_document() if kind == 'cards'
+                                                                 else self.graph.relationships_document())
+                             for kind in kinds}
+                self.dirty.clear()
+                self.pending = 0
+                done = self._rotate_journal()
+
+            start = time.perf_counter()
+            try:
+                for kind in kinds:
+                    body = documents[kind]
+                    if not isinstance(body, bytes):
+                        body = self._serialize(kind, body, versions[kind])
+                    write_atomic(self.cards_file if kind == 'cards' else self.rels_file, body)
+            except OSError:
+                with self.lock:
+                    self.dirty.update(kinds)
+                raise
+
+            with self.lock:
+                # The cache must describe exactly the files just written
+                if kinds and self.versions == versions:
+                    graph_cache.refresh(self.graph, self.cards_file, self.rels_file)
+            if kinds:
+                self._observe('compact', '+'.join(kinds), start)
+            if done:
+                os.remove(done)
+
+    # --- Changes ---
+
+    def apply(self, ops, check=None):
+        # A batch is validated as a whole first, so it is applied all-or-nothing.
+        # check(graph, ops), if given, runs after the structural checks and
+        # can veto the batch by raising StoreError.
+        with self.lock:
+            self._check(ops)
+            if check is not None:
+                check(self.graph, ops)
+            results = [self._apply_op(op) for op in ops]
+            self._append_journal({"ops": ops})
+            self.pending += len(ops)
+            self._schedule_write()
+        return results
+
+    def replace(self, kind, items):
+        # Whole-document save (the old /save/cards and /save/relationships)
+        with self.lock:
+            self._replace(kind, items)
+            self._append_journal({"replace": kind, "items": items})
+            self.pending += 1
+            self._schedule_write()
+
+    def _replace(self, kind, items):
+        with self.lock:
+            if kind == 'cards':
+                self.graph.set_cards(items)
+                self._touch(kind)
+                self.card_log = []
+                self.card_log_start = self.versions['cards']
+            else:
+                self.graph.set_relationships(items)
+                self._touch(kind)
+                self.edge_log = []
+                self.edge_log_start = self.versions['relationships']
+
+    def _check(self, ops):
+        if not isinstance(ops, list):
+            raise StoreError("Expected a list of ops")
+        known = set(self.graph.cards)
+        for op in ops:
+            kind = op.get('op') if isinstance(op, dict) else None
+            if kind not in OPS:
+                raise StoreError(f"Unknown op: {kind}")
+            if kind == 'put_card':
+                card = op.get('card')
+                if not isinstance(card, dict) or not card.get('id'):
+                    raise StoreError("put_card needs a card with an 'id'")
+                known.add(card['id'])
+            elif kind == 'patch_card':
+                if op.get('id') not in known:
+                    raise StoreError(f"Card not found: {op.get('id')}")
+                if not isinstance(op.get('fields'), dict) or 'id' in op['fields']:
+                    raise StoreError("patch_card needs a 'fields' object (ids cannot be changed)")
+            elif kind == 'delete_card':
+                known.discard(op.get('id'))
+            else:
+                edge = op.get('edge')
+                if not isinstance(edge, dict):
+                    raise StoreError(f"{kind} needs an 'edge' object")
+                e = Edge.from_dict(edge)
+                if not e.source or not e.target:
+                    raise StoreError(f"{kind} needs both endpoints")
+
+    def _apply_op(self, op):
+        kind = op['op']
+        graph = self.graph
+        if kind == 'put_card':
+            graph.add_card(op['card'])
+            self._touch('cards', [op['card']['id']])
+            return op['card']
+        if kind == 'patch_card':
+            card = graph.get(op['id'])
+            if card is None:
+                # Only possible on replay: apply() checks the card exists
+                return None
+            data = dict(card.data)
+            for key, value in op['fields'].items():
+                if value is None:
+                    data.pop(key, None)
+                else:
+                    data[key] = value
+            graph.add_card(data)
+            self._touch('cards', [op['id']])
+            return data
+        if kind == 'delete_card':
+            # Its parents lose a child as well as the card itself losing edges
+            sources = {p for t in graph.inc for p in graph.parents(op['id'], t)}
+            if any(graph.children(op['id'], t) for t in graph.out):
+                sources.add(op['id'])
+            removed = graph.remove_card(op['id'])
+            if removed:
+                self._touch('cards', [op['id']])
+                if sources:
+                    self._touch('relationships', sources)
+            return removed is not None
+        e = Edge.from_dict(op['edge'])
+        if kind == 'add_edge':
+            edge = graph.add_edge(e.source, e.target, e.type, e.strength, **e.extra)
+            if edge:
+                self._touch('relationships', [e.source])
+            return edge is not None
+        removed = graph.remove_edge(e.source, e.target, e.type)
+        if removed:
+            self._touch('relationships', [e.source])
+        return removed is not None
+
+    def _touch(self, kind, sources=()):
+        self.versions[kind] += 1
+        self.modified[kind] = time.time()
+        self.dirty.add(kind)
+        self._documents.pop(kind, None)
+        if not sources:
+            return
+        if kind == 'cards':
+            self.card_log.extend((self.versions[kind], cid) for cid in sources)
+            if len(self.card_log) > EDGE_LOG_SIZE:
+                drop = len(self.card_log) - EDGE_LOG_SIZE
+                self.card_log_start = self.card_log[drop - 1][0]
+                del self.card_log[:drop]
+            return
+        for source in sources:
+            self.edge_log.append((self.versions[kind], source))
+        if len(self.edge_log) > EDGE_LOG_SIZE:
+            drop = len(self.edge_log) - EDGE_LOG_SIZE
+            self.edge_log_start = self.edge_log[drop - 1][0]
+            del self.edge_log[:drop]
+
+    def changed_sources(self, since):
+        # Ids whose outgoing edges changed after relationships version
+        # `since`, or None if that is no longer known
+        with self.lock:
+            if since < self.edge_log_start:
+                return None
+            return {source for version, source in self.edge_log if version > since}
+
+    def changed_cards(self, since):
+        # Ids of cards created, edited or deleted after cards version
+        # `since`, or None if that is no longer known
+        with self.lock:
+            if since < self.card_log_start:
+                return None
+            return {cid for version, cid in self.card_log if version > since}
+
+    # --- Reads ---
+
+    def derived(self, name, build, kinds=('cards', 'relationships')):
+        # Value computed from the graph by build(graph), rebuilt only when
+        # the versions of the given kinds change
+        key = tuple(self.versions[k] for k in kinds)
+        with self.lock:
+            hit = self._derived.get(name)
+            if hit is not None and hit[0] == key:
+                return hit[1]
+            value = build(self.graph)
+            self._derived[name] = (key, value)
+            return value
+
+    def document(self, kind):
+        # Serialised file body for the current version, built at most once
+        # per version. Returns (body, version, modified).
+        with self.lock:
+            cached = self._documents.get(kind)
+            if cached is None:
+                doc = self.graph.cards_document() if kind == 'cards' else self.graph.relationships_document()
+                cached = self._serialize(kind, doc, self.versions[kind])
+            return cached, self.versions[kind], self.modified[kind]
+
+    def _serialize(self, kind, doc, version):
+        # The file body (same bytes as save_json), kept for document() if
+        # nothing changed meanwhile
+        start = time.perf_counter()
+        body = json.dumps(doc, indent=2).encode('utf-8')
+        self._observe('serialize', kind, start)
+        with self.lock:
+            if self.versions[kind] == version:
+                self._documents[kind] = body
+        return body
+
+    def _observe(self, operation, kind, start):
+        if self.observer is not None:
+            self.observer(operation, kind, time.perf_counter() - start)
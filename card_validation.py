@@ -0,0 +1,322 @@
+
+import os
+import sys
+from collections import defaultdict
+
+from card_graph import BASE_DIR, CARDS_FILE, RELS_FILE, edge_endpoints, load_json, unwrap
+from card_store import StoreError
+
+# Validation engine for cards.json / relationships.json.
+#
+# Rules register themselves with @rule(name, scope, severity):
+#   scope 'card'   fn(card, ctx)  -> messages, called once per card
+#   scope 'edge'   fn(edge, ctx)  -> messages, called once per relationship
+#   scope 'graph'  fn(ctx)        -> (target, message) pairs, after the pass
+# validate() streams the raw documents once (cards, then edges) and runs
+# every rule on each item; validate_ops() runs the same rules on just the
+# cards/edges touched by a batch of CardStore ops, against the live graph.
+#
+# An issue is {"rule", "severity", "target", "message"}.
+
+RULES = []
+
+ERROR = 'error'
+WARNING = 'warning'
+
+REQUIRED_FIELDS = ('id', 'title', 'type')
+LINK_FIELDS = ('web', 'video')
+
+
+class ValidationFailed(StoreError):
+    def __init__(self, issues):
+        super().__init__(f"{len(errors(issues))} validation errors")
+        self.issues = issues
+
+
+def rule(name, scope, severity=ERROR, full_only=False):
+    # full_only: only meaningful for whole documents (e.g. duplicates, which
+    # the store itself collapses), so skipped by validate_ops()
+    def register(fn):
+        RULES.append({"name": name, "scope": scope, "severity": severity,
+                      "full_only": full_only, "check": fn})
+        return fn
+    return register
+
+
+def edge_label(edge):
+    source, target = edge_endpoints(edge)
+    return f"{source} -> {target} ({edge.get('type', 'contains')})"
+
+
+def is_local_path(value):
+    return bool(value) and not str(value).startswith(('http://', 'https://', 'data:', '//', '#'))
+
+
+class Context:
+    # State shared by the rules during one validation run
+    def __init__(self, card_ids=(), children=None, base_dir=BASE_DIR):
+        self.card_ids = set(card_ids)     # ids that exist
+        self.seen_cards = set()           # ids already checked in this run
+        self.seen_edges = set()           # (source, target, type) already checked
+        self.children = children if children is not None else defaultdict(list)
+        self.new_contains = None          # edges to cycle-check; None = whole graph
+        self.base_dir = base_dir
+        self._exists = {}
+
+    def path_exists(self, path):
+        # Paths are relative to the site root ('/images/x.png' == 'images/x.png')
+        path = str(path).replace('\\', '/').lstrip('/')
+        hit = self._exists.get(path)
+        if hit is None:
+            hit = self._exists[path] = os.path.exists(os.path.join(self.base_dir, path))
+        return hit
+
+
+# --- Card rules ---
+
+@rule('duplicate_card_id', 'card', full_only=True)
+def check_duplicate_card(card, ctx):
+    cid = card.get('id')
+    if cid in ctx.seen_cards:
+        yield f"Duplicate card id '{cid}'"
+    ctx.seen_cards.add(cid)
+
+
+@rule('required_fields', 'card')
+def check_required(card, ctx):
+    for field in REQUIRED_FIELDS:
+        if field not in card:
+            yield f"missing '{field}'"
+
+
+@rule('link_fields', 'card', WARNING)
+def check_link_fields(card, ctx):
+    for field in LINK_FIELDS:
+        if field not in card:
+            yield f"missing '{field}'"
+
+
+@rule('media_paths', 'card', WARNING)
+def check_media_paths(card, ctx):
+    media = card.get('media') or []
+    if isinstance(media, str):
+        media = [media]
+    paths = list(media) + [card.get('video')]
+    images = card.get('displayImages')
+    if isinstance(images, dict):
+        paths += [slot.get('url') for slot in images.values() if isinstance(slot, dict)]
+    for path in paths:
+        if is_local_path(path) and not ctx.path_exists(path):
+            yield f"Media file not found: {path}"
+
+
+# --- Edge rules ---
+
+@rule('edge_keys', 'edge')
+def check_edge_keys(edge, ctx):
+    # Either from/to (current) or source/target (legacy); both is fine only
+    # if they agree
+    source, target = edge_endpoints(edge)
+    if not source or not target:
+        yield "Relationship has no from/to (or source/target) endpoints"
+    for new, old in (('from', 'source'), ('to', 'target')):
+        if edge.get(new) and edge.get(old) and edge[new] != edge[old]:
+            yield f"Conflicting '{new}' ({edge[new]}) and '{old}' ({edge[old]})"
+
+
+@rule('duplicate_edge', 'edge', WARNING, full_only=True)
+def check_duplicate_edge(edge, ctx):
+    source, target = edge_endpoints(edge)
+    key = (source, target, edge.get('type', 'contains'))
+    if key in ctx.seen_edges:
+        yield "Duplicate relationship"
+    ctx.seen_edges.add(key)
+
+
+@rule('dangling_reference', 'edge')
+def check_dangling(edge, ctx):
+    for end in edge_endpoints(edge):
+        if end and end not in ctx.card_ids:
+            yield f"Card '{end}' does not exist"
+
+
+# --- Graph rules ---
+
+@rule('contains_cycle', 'graph')
+def check_cycles(ctx):
+    children = ctx.children
+    if ctx.new_contains is not None:
+        # Only the new edges: s -> t closes a cycle if s is reachable from t
+        for source, target in ctx.new_contains:
+            if source == target or source in descendants(children, target):
+                yield f"{source} -> {target} (contains)", f"'contains' cycle through {source} and {target}"
+        return
+
+    # Iterative three-colour DFS over the whole 'contains' graph
+    WHITE, GREY, BLACK = 0, 1, 2
+    colour = defaultdict(int)
+    for start in list(children):
+        if colour[start] != WHITE:
+            continue
+        colour[start] = GREY
+        stack = [(start, iter(children.get(start, [])))]
+        while stack:
+            node, kids = stack[-1]
+            for kid in kids:
+                if colour[kid] == GREY:
+                    yield f"{node} -> {kid} (contains)", f"'contains' cycle back to {kid}"
+                elif colour[kid] == WHITE:
+                    colour[kid] = GREY
+                    stack.append((kid, iter(children.get(kid, []))))
+                    break
+            else:
+                colour[node] = BLACK
+                stack.pop()
+
+
+def descendants(children, start):
+    seen = set()
+    todo = [start]
+    while todo:
+        node = todo.pop()
+        for kid in children.get(node, []):
+            if kid not in seen:
+                seen.add(kid)
+                todo.append(kid)
+    return seen
+
+
+# --- Runners ---
+
+def _select(names, incremental=False):
+    rules = RULES if names is None else [r for r in RULES if r['name'] in names]
+    by_scope = defaultdict(list)
+    for r in rules:
+        if not (incremental and r['full_only']):
+            by_scope[r['scope']].append(r)
+    return by_scope
+
+
+def _run(rules, item, ctx, target, issues):
+    for r in rules:
+        for message in r['check'](item, ctx):
+            issues.append({"rule": r['name'], "severity": r['severity'], "target": target, "message": message})
+
+
+def validate(cards, relationships, base_dir=BASE_DIR, rules=None):
+    # Full check of the raw documents in one pass over each list
+    by_scope = _select(rules)
+    ctx = Context(base_dir=base_dir)
+    issues = []
+
+    ctx.card_ids = {c.get('id') for c in cards if isinstance(c, dict)}
+    for i, card in enumerate(cards):
+        _run(by_scope['card'], card, ctx, card.get('id', f'index {i}'), issues)
+
+    for edge in relationships:
+        _run(by_scope['edge'], edge, ctx, edge_label(edge), issues)
+        if edge.get('type', 'contains') == 'contains':
+            source, target = edge_endpoints(edge)
+            if source and target:
+                ctx.children[source].append(target)
+
+    for r in by_scope['graph']:
+        for target, message in r['check'](ctx):
+            issues.append({"rule": r['name'], "severity": r['severity'], "target": target, "message": message})
+    return issues
+
+
+class _Overlay:
+    # Card ids as they will be after a batch, without copying the graph's
+    def __init__(self, base, added, removed):
+        self.base, self.added, self.removed = base, added, removed
+
+    def __contains__(self, cid):
+        return cid in self.added or (cid in self.base and cid not in self.removed)
+
+
+class _MergedChildren:
+    # 'contains' adjacency of the graph plus the batch's new edges
+    def __init__(self, base, extra):
+        self.base, self.extra = base, extra
+
+    def get(self, node, default=()):
+        return list(self.base.get(node, default)) + self.extra.get(node, [])
+
+
+def validate_ops(graph, ops, base_dir=BASE_DIR, rules=None):
+    # Incremental check of a CardStore batch: only the cards and edges it
+    # writes are examined, against the graph as it will be after the batch
+    by_scope = _select(rules, incremental=True)
+    added, removed, new_children = set(), set(), defaultdict(list)
+    ctx = Context(base_dir=base_dir)
+    ctx.card_ids = _Overlay(graph.cards, added, removed)
+    ctx.children = _MergedChildren(graph.out.get('contains', {}), new_children)
+    ctx.new_contains = []
+    issues = []
+
+    cards, edges = [], []
+    for op in ops:
+        kind = op.get('op')
+        if kind == 'put_card':
+            cards.append(op['card'])
+            added.add(op['card'].get('id'))
+            removed.discard(op['card'].get('id'))
+        elif kind == 'patch_card':
+            existing = graph.get(op.get('id'))
+            data = dict(existing.data) if existing else {"id": op.get('id')}
+            for key, value in op.get('fields', {}).items():
+                if value is None:
+                    data.pop(key, None)
+                else:
+                    data[key] = value
+            cards.append(data)
+        elif kind == 'delete_card':
+            added.discard(op.get('id'))
+            removed.add(op.get('id'))
+        elif kind == 'add_edge':
+            edges.append(op['edge'])
+
+    for card in cards:
+        _run(by_scope['card'], card, ctx, card.get('id'), issues)
+    for edge in edges:
+        source, target = edge_endpoints(edge)
+        # Re-adding an existing edge is a no-op in the store, not a duplicate
+        if graph.has_edge(source, target, edge.get('type', 'contains')):
+            continue
+        _run(by_scope['edge'], edge, ctx, edge_label(edge), issues)
+        if edge.get('type', 'contains') == 'contains' and source and target:
+            ctx.new_contains.append((source, target))
+            new_children[source].append(target)
+
+    for r in by_scope['graph']:
+        for target, message in r['check'](ctx):
+            issues.append({"rule": r['name'], "severity": r['severity'], "target": target, "message": message})
+    return issues
+
+
+def errors(issues):
+    return [i for i in issues if i['severity'] == ERROR]
+
+
+def print_report(issues):
+    by_rule = defaultdict(list)
+    for issue in issues:
+        by_rule[(issue['severity'], issue['rule'])].append(issue)
+    for (severity, name), found in sorted(by_rule.items()):
+        print(f"{severity.upper()}: {name} ({len(found)})")
+        for issue in found:
+            print(f" - {issue['target']}: {issue['message']}")
+
+
+if __name__ == "__main__":
+    cards_file = sys.argv[1] if len(sys.argv) > 1 else CARDS_FILE
+    rels_file = sys.argv[2] if len(sys.argv) > 2 else RELS_FILE
+    cards = unwrap(load_json(cards_file), 'cards')
+    rels = unwrap(load_json(rels_file), 'relationships')
+    print(f"Validating {len(cards)} cards and {len(rels)} relationships with {len(RULES)} rules...")
+    found = validate(cards, rels, os.path.dirname(os.path.abspath(cards_file)))
+    if found:
+        print_report(found)
+    print(f"{len(errors(found))} errors, {len(found) - len(errors(found))} warnings.")
+    sys.exit(1 if errors(found) else 0)
@@ -0,0 +1,63 @@
+
+import threading
+from collections import OrderedDict
+
+# Live change feed for server.py (/api/changes).
+#
+# Every history version (card_history.py) is one event: its number is the
+# cursor and its delta (put / patch / remove / edges_add / edges_remove /
+# order) is the payload, so clients can patch their copy of cards.json and
+# relationships.json instead of downloading them again. The last KEEP deltas
+# are held in memory for the many clients asking for the same few versions;
+# older ones are read back from the history log.
+#
+#   feed = ChangeFeed(history)
+#   feed.publish(history.record(...))     after every recorded version
+#   feed.since(12)    -> [(13, delta), ...], or None: too far behind, reload
+#   feed.wait(12, 15) -> head version once it passes 12 (or after 15s)
+
+KEEP = 256
+MAX_BACKLOG = 1000
+
+
+class ChangeFeed:
+    def __init__(self, history, keep=KEEP, max_backlog=MAX_BACKLOG):
+        self.history = history
+        self.keep = keep
+        self.max_backlog = max_backlog
+        self.recent = OrderedDict()     # version -> delta
+        self.cond = threading.Condition()
+        self.head = history.head
+
+    def publish(self, version):
+        if version is None:
+            return
+        delta = self.history.delta(version)
+        with self.cond:
+            self.recent[version] = delta
+            while len(self.recent) > self.keep:
+                self.recent.popitem(last=False)
+            self.head = max(self.head, version)
+            self.cond.notify_all()
+
+    def since(self, version):
+        # Events after `version` in order; None if the client has to reload
+        # (cursor unknown or too old, or a full record in between)
+        head = self.head
+        if version < 0 or version > head or head - version > self.max_backlog:
+            return None
+        events = []
+        for v in range(version + 1, head + 1):
+            with self.cond:
+                delta = self.recent.get(v)
+            if delta is None:
+                delta = self.history.delta(v)
+            if delta is None:
+                return None
+            events.append((v, delta))
+        return events
+
+    def wait(self, version, timeout):
+        with self.cond:
+            self.cond.wait_for(lambda: self.head > version, timeout)
+            return self.head
@@ -0,0 +1,145 @@
+
+import argparse
+import copy
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from docx import Document
+
+# Parallel dossier rendering, shared by the generate_*dossier.py scripts.
+#
+# Each script provides setup(doc) (styles) and render(doc, card) (one card's
+# pages). Cards are split into chunks that are rendered into separate
+# documents in a process pool, then either merged in order into one .docx
+# or written as one .docx per card.
+#
+#   build(cards, setup, render, "EXECUTIVE_DOSSIER.docx")
+#   build(cards, setup, render, "EXECUTIVE_DOSSIER.docx", per_card_dir="dossiers")
+
+CHUNKS_PER_WORKER = 4
+
+
+def mapped_card_ids(pdf_mapping):
+    # pdf_mapping.json is {pdf: {"card_id": ...}} (map_pdfs.py) or the older
+    # {pdf: card_id}
+    ids = set()
+    for match in pdf_mapping.values():
+        card_id = match.get('card_id') if isinstance(match, dict) else match
+        if card_id:
+            ids.add(card_id)
+    return ids
+
+
+def has_pdf(card, mapped_ids):
+    if card['id'] in mapped_ids:
+        return True
+    return any(str(item).endswith('.pdf') for item in card.get('media') or [])
+
+
+def safe_name(card_id):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', card_id)
+
+
+def _render_chunk(setup, render, cards):
+    # Worker: one document for a run of consecutive cards, returned as bytes
+    doc = Document()
+    setup(doc)
+    for i, card in enumerate(cards):
+        if i > 0:
+            doc.add_page_break()
+        render(doc, card)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _render_files(setup, render, cards, out_dir):
+    # Worker: one file per card
+    for card in cards:
+        doc = Document()
+        setup(doc)
+        render(doc, card)
+        doc.save(os.path.join(out_dir, safe_name(card['id']) + '.docx'))
+    return len(cards)
+
+
+def _merge(setup, parts, output_file):
+    doc = Document()
+    setup(doc)
+    body = doc.element.body
+    sect_pr = body.sectPr
+    first = True
+    for data in parts:
+        part = Document(io.BytesIO(data))
+        if not first:
+            doc.add_page_break()
+        first = False
+        for element in part.element.body:
+            if element.tag.endswith('}sectPr'):
+                continue
+            # Keep the section properties as the last child of the body
+            if sect_pr is not None:
+                sect_pr.addprevious(copy.deepcopy(element))
+            else:
+                body.append(copy.deepcopy(element))
+    doc.save(output_file)
+
+
+class Progress:
+    def __init__(self, total, label):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.start = time.time()
+
+    def add(self, n):
+        self.done += n
+        elapsed = time.time() - self.start
+        rate = self.done / elapsed if elapsed else 0
+        sys.stdout.write(f"\r{self.label}: {self.done}/{self.total} cards ({rate:.1f}/s)")
+        sys.stdout.flush()
+        if self.done >= self.total:
+            sys.stdout.write('\n')
+
+
+def build(cards, setup, render, output_file, per_card_dir=None, workers=None):
+    workers = workers or os.cpu_count() or 1
+    size = max(1, -(-len(cards) // (workers * CHUNKS_PER_WORKER)))
+    chunks = [cards[i:i + size] for i in range(0, len(cards), size)]
+    progress = Progress(len(cards), per_card_dir or output_file)
+
+    if per_card_dir:
+        os.makedirs(per_card_dir, exist_ok=True)
+
+    parts = [None] * len(chunks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if per_card_dir:
+            futures = {pool.submit(_render_files, setup, render, chunk, per_card_dir): i
+                       for i, chunk in enumerate(chunks)}
+        else:
+            futures = {pool.submit(_render_chunk, setup, render, chunk): i
+                       for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            if not per_card_dir:
+                parts[i] = future.result()
+            else:
+                future.result()
+            progress.add(len(chunks[i]))
+
+    if not per_card_dir:
+        _merge(setup, parts, output_file)
+
+
+def parse_args(output_file):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--limit', type=int, default=None, help='only the first N eligible cards')
+    parser.add_argument('--per-card', metavar='DIR', default=None,
+                        help='write one .docx per card into DIR instead of one merged dossier')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--output', default=output_file)
+    return parser.parse_args()
@@ -1,23 +1,28 @@
 
 import json
+import sys
+
+from card_graph import load_graph
+from search_index import SearchIndex
+
+CARDS_FILE = 'c:/PythonApplications/AI_Skillsweb/cards.json'
+
+# Usage: python find_card.py [query ...]
+# Each argument is a separate search (words, "phrases", prefix*); ids, titles,
+# descriptions and media file names are all indexed.
+QUERIES = sys.argv[1:] or ['10072', 'Waal']
 
 try:
-    with open('c:/PythonApplications/AI_Skillsweb/cards.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        cards = data.get('cards', [])
-        found = False
-        for card in cards:
-            if '10072' in str(card.get('id', '')):
-                print(f"Found card by ID 10072: {json.dumps(card, indent=2)}")
-                found = True
-            
-            video = card.get('video', '')
-            if 'Waal' in video:
-                print(f"Found card by video path content 'Waal': {json.dumps(card, indent=2)}")
-                found = True
+    graph = load_graph(CARDS_FILE, None)
+    index = SearchIndex.load_or_build(graph, CARDS_FILE)
+    found = False
+    for query in QUERIES:
+        for score, card_id in index.search(query, limit=10):
+            print(f"Found card for '{query}' (score {score:.2f}): {json.dumps(graph.cards[card_id].data, indent=2)}")
+            found = True
 
-        if not found:
-            print("Card not found.")
+    if not found:
+        print("Card not found.")
 
 except Exception as e:
     print(f"Error: {e}")
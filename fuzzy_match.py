@@ -0,0 +1,98 @@
+
+import difflib
+import math
+import re
+
+import numpy as np
+
+# Top-k fuzzy title matching.
+#
+# Candidate texts are split into character n-grams once and stored as an
+# inverted TF-IDF index (n-gram -> arrays of text positions and weights).
+# A query is scored against every candidate at once by accumulating the
+# postings of its n-grams with NumPy (cosine similarity of the L2-normalised
+# vectors), and only the best `k` are re-ranked with an exact
+# difflib.SequenceMatcher ratio.
+#
+#   matcher = NgramMatcher(titles)
+#   matcher.top(query, k=5)  -> [(exact score, position, cosine), ...]
+
+NGRAM = 3
+CANDIDATES = 10
+
+
+def normalise(text):
+    return re.sub(r'[^a-z0-9]+', ' ', (text or '').lower()).strip()
+
+
+def ngrams(text, n=NGRAM):
+    padded = f" {normalise(text)} "
+    if len(padded) <= n:
+        return [padded]
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+def similarity(query, text):
+    # Exact score. PDF names are often cut short, so a match against the
+    # same-length start of the title counts too.
+    q, t = normalise(query), normalise(text)
+    full = difflib.SequenceMatcher(None, q, t).ratio()
+    head = difflib.SequenceMatcher(None, q, t[:len(q)]).ratio() if len(t) > len(q) else full
+    return max(full, head)
+
+
+class NgramMatcher:
+    def __init__(self, texts, n=NGRAM):
+        self.texts = list(texts)
+        self.n = n
+
+        counts = []
+        df = {}
+        for text in self.texts:
+            c = {}
+            for g in ngrams(text, n):
+                c[g] = c.get(g, 0) + 1
+            counts.append(c)
+            for g in c:
+                df[g] = df.get(g, 0) + 1
+
+        total = len(self.texts)
+        self.idf = {g: math.log((1 + total) / (1 + d)) + 1 for g, d in df.items()}
+
+        # Per n-gram postings as arrays, weights already divided by the
+        # text's vector norm so a dot product is the cosine
+        postings = {}
+        for pos, c in enumerate(counts):
+            weights = {g: tf * self.idf[g] for g, tf in c.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for g, w in weights.items():
+                postings.setdefault(g, ([], []))
+                postings[g][0].append(pos)
+                postings[g][1].append(w / norm)
+        self.postings = {g: (np.array(p, dtype=np.int32), np.array(w, dtype=np.float32))
+                         for g, (p, w) in postings.items()}
+
+    def cosine(self, query):
+        # Cosine similarity of the query against every text
+        c = {}
+        for g in ngrams(query, self.n):
+            if g in self.postings:
+                c[g] = c.get(g, 0) + 1
+        if not c:
+            return np.zeros(len(self.texts))
+        weights = {g: tf * self.idf[g] for g, tf in c.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        positions = np.concatenate([self.postings[g][0] for g in weights])
+        values = np.concatenate([self.postings[g][1] * (w / norm) for g, w in weights.items()])
+        return np.bincount(positions, weights=values, minlength=len(self.texts))
+
+    def top(self, query, k=CANDIDATES):
+        if not self.texts:
+            return []
+        scores = self.cosine(query)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        ranked = [(similarity(query, self.texts[i]), int(i), float(scores[i]))
+                  for i in best if scores[i] > 0]
+        ranked.sort(key=lambda r: (-r[0], -r[2], r[1]))
+        return ranked
@@ -1,10 +1,11 @@
 import json
 import os
 import sys
-from docx import Document
-from docx.shared import Pt, Inches, RGBColor
+from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
+from dossier_build import build, parse_args
+
 def get_lens(card):
     # Determine which lens A, B, or C to apply
     card_type = card.get('type', '').lower()
@@ -127,76 +128,73 @@ def generate_lens_content(card, lens):
 
     return content
 
-def create_diverse_dossier(target_cards, output_file="POLYMORPHIC_DOSSIER.docx"):
-    doc = Document()
-    
+def setup_document(doc):
     # Configure styles
     style = doc.styles['Normal']
     font = style.font
     font.name = 'Arial'
     font.size = Pt(10.5)
 
-    for i, card in enumerate(target_cards):
-        if i > 0:
-            doc.add_page_break()
-        
-        lens = get_lens(card)
-        
-        # Metadata / Trigger
-        p_trigger = doc.add_paragraph()
-        run_t = p_trigger.add_run(f"NEW CARD: [{card['id']}]")
-        run_t.font.size = Pt(8)
-        run_t.font.italic = True
-        run_t.font.color.rgb = RGBColor(150, 150, 150)
-        
-        # Main Header
-        heading = doc.add_heading(card['title'], level=1)
-        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Subtitle with Lens info
-        p_subtitle = doc.add_paragraph()
-        run_s = p_subtitle.add_run(f"Architectural Perspective: {lens} (Production Order: Polymorphic)")
-        run_s.font.bold = True
-        p_subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
+def render_card(doc, card):
+    lens = get_lens(card)
+    
+    # Metadata / Trigger
+    p_trigger = doc.add_paragraph()
+    run_t = p_trigger.add_run(f"NEW CARD: [{card['id']}]")
+    run_t.font.size = Pt(8)
+    run_t.font.italic = True
+    run_t.font.color.rgb = RGBColor(150, 150, 150)
+    
+    # Main Header
+    heading = doc.add_heading(card['title'], level=1)
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    # Subtitle with Lens info
+    p_subtitle = doc.add_paragraph()
+    run_s = p_subtitle.add_run(f"Architectural Perspective: {lens} (Production Order: Polymorphic)")
+    run_s.font.bold = True
+    p_subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
-        sections_content = generate_lens_content(card, lens)
-        
-        for sec_title, paragraphs in sections_content.items():
-            doc.add_heading(sec_title, level=2)
-            for para in paragraphs:
-                doc.add_paragraph(para)
-                
-        # Padding for 2-page target
-        # Calculate roughly if we need more break
-        # Since we use 10.5pt and many headings, 4-5 paragraphs per section + headings
-        # usually hits 1.5 - 2 pages.
-        # We add some professional architectural spacing
-        for _ in range(5):
-            doc.add_paragraph("")
+    sections_content = generate_lens_content(card, lens)
+    
+    for sec_title, paragraphs in sections_content.items():
+        doc.add_heading(sec_title, level=2)
+        for para in paragraphs:
+            doc.add_paragraph(para)
             
-        # Ensure hard break for 2nd page if first page is short? 
-        # Actually a page break between CARDS is required, but the prompt says "2-page strategic reports".
-        # We will add a hard break mid-report or just ensure content is long enough.
-        # Let's add a "Systems Architecture Board Memo" at the end of each card report to fill space.
-        doc.add_heading("Board Memo: Strategic Alignment", level=2)
-        memo = (
-            "This document serves as a formal recommendation from the Office of the Chief Systems Architect. "
-            "The initialisation of this asset is deemed high-priority for the 2026-2027 fiscal modernisation programme. "
-            "We have conducted a thorough interrogation of the underlying data structures and operational risk profiles, "
-            "concluding that the '{title}' asset is fully aligned with our commitment to enterprise integrity and "
-            "risk mitigation. We advise the Board to proceed with full-scale initialisation as per the roadmap."
-        ).format(title=card['title'])
-        doc.add_paragraph(memo)
+    # Padding for 2-page target
+    # Calculate roughly if we need more break
+    # Since we use 10.5pt and many headings, 4-5 paragraphs per section + headings
+    # usually hits 1.5 - 2 pages.
+    # We add some professional architectural spacing
+    for _ in range(5):
+        doc.add_paragraph("")
+        
+    # Ensure hard break for 2nd page if first page is short? 
+    # Actually a page break between CARDS is required, but the prompt says "2-page strategic reports".
+    # We will add a hard break mid-report or just ensure content is long enough.
+    # Let's add a "Systems Architecture Board Memo" at the end of each card report to fill space.
+    doc.add_heading("Board Memo: Strategic Alignment", level=2)
+    memo = (
+        "This document serves as a formal recommendation from the Office of the Chief Systems Architect. "
+        "The initialisation of this asset is deemed high-priority for the 2026-2027 fiscal modernisation programme. "
+        "We have conducted a thorough interrogation of the underlying data structures and operational risk profiles, "
+        "concluding that the '{title}' asset is fully aligned with our commitment to enterprise integrity and "
+        "risk mitigation. We advise the Board to proceed with full-scale initialisation as per the roadmap."
+    ).format(title=card['title'])
+    doc.add_paragraph(memo)
 
-    doc.save(output_file)
-    print(f"Polymorphic Dossier generated: {output_file}")
+def create_diverse_dossier(target_cards, output_file="POLYMORPHIC_DOSSIER.docx", per_card_dir=None, workers=None):
+    build(target_cards, setup_document, render_card, output_file, per_card_dir, workers)
+    print(f"Polymorphic Dossier generated: {per_card_dir or output_file}")
 
 if __name__ == "__main__":
     cards_path = "cards.json"
     with open(cards_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
-    # Target first 10 cards as requested
-    targets = data['cards'][:10]
+    # Every card, unless --limit is given
+    args = parse_args("POLYMORPHIC_DOSSIER.docx")
+    targets = data['cards'][:args.limit] if args.limit else data['cards']
     
-    create_diverse_dossier(targets)
+    create_diverse_dossier(targets, args.output, args.per_card, args.workers)
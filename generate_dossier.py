@@ -1,41 +1,22 @@
 import json
 import os
 import sys
-from docx import Document
-from docx.shared import Pt, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.section import WD_SECTION
+from docx.shared import Pt
 
-def get_cards_without_pdfs(cards_file, pdf_mapping_file, limit=10):
+from dossier_build import build, has_pdf, mapped_card_ids, parse_args
+
+def get_cards_without_pdfs(cards_file, pdf_mapping_file, limit=None):
     with open(cards_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
     with open(pdf_mapping_file, 'r', encoding='utf-8') as f:
         pdf_mapping = json.load(f)
     
-    mapped_ids = set(pdf_mapping.values())
+    mapped_ids = mapped_card_ids(pdf_mapping)
     
-    target_cards = []
-    for card in data['cards']:
-        card_id = card['id']
-        
-        # Check if PDF exists in 'media' or 'pdf_mapping'
-        has_pdf = False
-        if card_id in mapped_ids:
-            has_pdf = True
-        
-        if 'media' in card:
-            for item in card['media']:
-                if item.endswith('.pdf'):
-                    has_pdf = True
-                    break
-        
-        if not has_pdf:
-            target_cards.append(card)
-            if len(target_cards) >= limit:
-                break
-                
-    return target_cards
+    # Cards with no PDF in 'media' or 'pdf_mapping'
+    target_cards = [card for card in data['cards'] if not has_pdf(card, mapped_ids)]
+    return target_cards[:limit] if limit else target_cards
 
 def generate_strategic_content(card, section):
     title = card.get('title', 'Unknown Asset')
@@ -73,50 +54,46 @@ def generate_strategic_content(card, section):
     }
     return templates.get(section, "")
 
-def create_dossier(target_cards, output_file="EXECUTIVE_DOSSIER.docx"):
-    doc = Document()
-    
+def setup_document(doc):
     # Configure styles
     style = doc.styles['Normal']
     font = style.font
     font.name = 'Arial'
     font.size = Pt(11)
 
-    for i, card in enumerate(target_cards):
-        if i > 0:
-            doc.add_page_break()
-        
-        # Hidden/Footer-like text at start of page (as per prompt order, though usually footer is better)
-        # We will put it at the very top as small light gray text as "hidden" metadata
-        p_metadata = doc.add_paragraph()
-        run_m = p_metadata.add_run(f"NEW CARD: [{card['id']}]")
-        run_m.font.size = Pt(8)
-        run_m.font.color.rgb = None # or light gray
-        
-        # Main Header
-        doc.add_heading(card['title'], level=1)
-        
-        sections = [
-            "Executive Summary",
-            "Operational Continuity",
-            "Governance & Compliance",
-            "Strategic ROI",
-            "Integration Roadmap"
-        ]
+def render_card(doc, card):
+    # Hidden/Footer-like text at start of page (as per prompt order, though usually footer is better)
+    # We will put it at the very top as small light gray text as "hidden" metadata
+    p_metadata = doc.add_paragraph()
+    run_m = p_metadata.add_run(f"NEW CARD: [{card['id']}]")
+    run_m.font.size = Pt(8)
+    run_m.font.color.rgb = None # or light gray
+    
+    # Main Header
+    doc.add_heading(card['title'], level=1)
+    
+    sections = [
+        "Executive Summary",
+        "Operational Continuity",
+        "Governance & Compliance",
+        "Strategic ROI",
+        "Integration Roadmap"
+    ]
+    
+    for sec in sections:
+        doc.add_heading(sec, level=2)
+        content = generate_strategic_content(card, sec)
+        doc.add_paragraph(content)
         
-        for sec in sections:
-            doc.add_heading(sec, level=2)
-            content = generate_strategic_content(card, sec)
-            doc.add_paragraph(content)
-            
-        # Add some spacing to encourage 2-page length if needed, 
-        # but for now we follow the structure.
-        # Professional padding
-        for _ in range(3):
-            doc.add_paragraph("")
+    # Add some spacing to encourage 2-page length if needed, 
+    # but for now we follow the structure.
+    # Professional padding
+    for _ in range(3):
+        doc.add_paragraph("")
 
-    doc.save(output_file)
-    print(f"Dossier generated: {output_file}")
+def create_dossier(target_cards, output_file="EXECUTIVE_DOSSIER.docx", per_card_dir=None, workers=None):
+    build(target_cards, setup_document, render_card, output_file, per_card_dir, workers)
+    print(f"Dossier generated: {per_card_dir or output_file}")
 
 if __name__ == "__main__":
     cards_path = "cards.json"
@@ -126,8 +103,9 @@ if __name__ == "__main__":
         print("Required files missing.")
         sys.exit(1)
         
-    targets = get_cards_without_pdfs(cards_path, mapping_path, limit=10)
+    args = parse_args("EXECUTIVE_DOSSIER.docx")
+    targets = get_cards_without_pdfs(cards_path, mapping_path, limit=args.limit)
     if not targets:
         print("No cards without PDFs found.")
     else:
-        create_dossier(targets)
+        create_dossier(targets, args.output, args.per_card, args.workers)
@@ -1,31 +1,19 @@
 import json
 import os
 import sys
-from docx import Document
-from docx.shared import Pt, Inches, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt, RGBColor
 
-def get_missing_cards(cards_file, pdf_mapping_file, limit=10):
+from dossier_build import build, has_pdf, mapped_card_ids, parse_args
+
+def get_missing_cards(cards_file, pdf_mapping_file, limit=None):
     with open(cards_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
     with open(pdf_mapping_file, 'r', encoding='utf-8') as f:
         pdf_mapping = json.load(f)
     
-    mapped_ids = set(pdf_mapping.values())
-    target_cards = []
-    for card in data['cards']:
-        card_id = card['id']
-        has_pdf = card_id in mapped_ids
-        if 'media' in card:
-            for item in card['media']:
-                if item.endswith('.pdf'):
-                    has_pdf = True
-                    break
-        if not has_pdf:
-            target_cards.append(card)
-            if len(target_cards) >= limit:
-                break
-    return target_cards
+    mapped_ids = mapped_card_ids(pdf_mapping)
+    target_cards = [card for card in data['cards'] if not has_pdf(card, mapped_ids)]
+    return target_cards[:limit] if limit else target_cards
 
 def generate_engineering_content(card):
     title = card.get('title', 'System Asset')
@@ -65,46 +53,39 @@ def generate_engineering_content(card):
         
     return sections
 
-def create_engineering_dossier(target_cards, output_file="ENGINEERING_DOSSIER.docx"):
-    doc = Document()
-    
+def setup_document(doc):
     # Styles
     style = doc.styles['Normal']
     font = style.font
     font.name = 'Courier New' # More technical feel
     font.size = Pt(10)
 
-    for i, card in enumerate(target_cards):
-        if i > 0:
-            doc.add_page_break()
-        
-        # Delimiter - MUST start every page
-        p_delim = doc.add_paragraph()
-        run_d = p_delim.add_run(f"NEW CARD: [{card['id']}]")
-        run_d.font.bold = True
-        run_d.font.color.rgb = RGBColor(0, 0, 0)
-        
-        # Header
-        doc.add_heading(card['title'], level=1)
-        
-        sections = generate_engineering_content(card)
-        
-        for sec_name, paragraphs in sections.items():
-            doc.add_heading(sec_name, level=2)
-            for para in paragraphs:
-                doc.add_paragraph(para)
-                
-        # Padding to push toward 2-page length
-        # Standard Technical Briefing Footer
-        doc.add_paragraph("")
-        doc.add_paragraph("-" * 20)
-        doc.add_paragraph("END OF TECHNICAL BRIEFING: ARCHITECTURAL INTEGRITY VERIFIED.")
-        
-        # Add a manual page break halfway to ensure 2nd page if content is tight?
-        # Actually, let's just make the paragraphs long and add a few spacers.
+def render_card(doc, card):
+    # Delimiter - MUST start every page
+    p_delim = doc.add_paragraph()
+    run_d = p_delim.add_run(f"NEW CARD: [{card['id']}]")
+    run_d.font.bold = True
+    run_d.font.color.rgb = RGBColor(0, 0, 0)
+    
+    # Header
+    doc.add_heading(card['title'], level=1)
+    
+    sections = generate_engineering_content(card)
+    
+    for sec_name, paragraphs in sections.items():
+        doc.add_heading(sec_name, level=2)
+        for para in paragraphs:
+            doc.add_paragraph(para)
+            
+    # Padding to push toward 2-page length
+    # Standard Technical Briefing Footer
+    doc.add_paragraph("")
+    doc.add_paragraph("-" * 20)
+    doc.add_paragraph("END OF TECHNICAL BRIEFING: ARCHITECTURAL INTEGRITY VERIFIED.")
 
-    doc.save(output_file)
-    print(f"Engineering Dossier generated: {output_file}")
+def create_engineering_dossier(target_cards, output_file="ENGINEERING_DOSSIER.docx", per_card_dir=None, workers=None):
+    build(target_cards, setup_document, render_card, output_file, per_card_dir, workers)
+    print(f"Engineering Dossier generated: {per_card_dir or output_file}")
 
 if __name__ == "__main__":
     cards_path = "cards.json"
@@ -114,8 +95,9 @@ if __name__ == "__main__":
         print("Required files missing.")
         sys.exit(1)
         
-    targets = get_missing_cards(cards_path, mapping_path, limit=10)
+    args = parse_args("ENGINEERING_DOSSIER.docx")
+    targets = get_missing_cards(cards_path, mapping_path, limit=args.limit)
     if not targets:
         print("No missing cards found.")
     else:
-        create_engineering_dossier(targets)
+        create_engineering_dossier(targets, args.output, args.per_card, args.workers)
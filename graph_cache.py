@@ -0,0 +1,225 @@
+
+import array
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+import time
+
+from card_graph import CARDS_FILE, RELS_FILE, Card, CardGraph, Edge, unwrap
+
+# Binary cache of the parsed card graph, next to cards.json (cards.graphcache).
+#
+# Layout: a fixed-size header, then
+#   strings   marshal list of every distinct id / type / title / edge type
+#   cards     int32 array, (id, type, title) string numbers per card
+#   edges     int32 array, (source, target, type) string numbers per edge
+#   edge_rest marshal [strengths, {edge number: extra fields}]
+#   data      marshal list of the card dicts (strings interned)
+# The header holds the size, mtime and SHA-1 of both source files. Loading
+# reads the header, maps the file and copies the sections out; ids, types,
+# titles and edges are ready straight away, while the card dicts are only
+# unmarshalled the first time any card's .data is used.
+#
+# load_graph() in card_graph.py goes through load(); a stale or unreadable
+# cache is rebuilt from the JSON files. If only the mtimes changed (files
+# copied, checked out again) but the contents hash the same, the cache is
+# kept and its header re-stamped.
+
+FORMAT = 1
+MAGIC = b'CGC' + (b'L' if sys.byteorder == 'little' else b'B')
+HEADER = struct.Struct('<4sHH qqqq 20s20s IIIII')
+
+
+def cache_path(cards_file):
+    return os.path.splitext(cards_file)[0] + '.graphcache'
+
+
+def file_stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def read_source(path):
+    # (parsed JSON, (size, mtime_ns), sha1) with the stamp taken before the
+    # read, so a change during the read shows up as stale next time
+    stat = file_stat(path)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return json.loads(raw), stat, hashlib.sha1(raw).digest()
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+class CardData:
+    # The cached card dicts, unmarshalled on first use
+    def __init__(self, blob):
+        self.blob = blob
+        self.cards = None
+
+    def get(self, pos):
+        if self.cards is None:
+            self.cards = marshal.loads(self.blob)
+            self.blob = None
+        return self.cards[pos]
+
+
+class CachedCard(Card):
+    __slots__ = ('_source', '_pos')
+
+    def __init__(self, card_id, ctype, title, source, pos):
+        self.id = card_id
+        self.type = ctype
+        self.title = title
+        self._source = source
+        self._pos = pos
+
+    @property
+    def data(self):
+        return self._source.get(self._pos)
+
+
+def _intern(value, table):
+    if isinstance(value, str):
+        return table.setdefault(value, value)
+    if isinstance(value, list):
+        return [_intern(v, table) for v in value]
+    if isinstance(value, dict):
+        return {_intern(k, table): _intern(v, table) for k, v in value.items()}
+    return value
+
+
+def save(graph, stamp, path):
+    # stamp: ((cards size, mtime_ns), (rels size, mtime_ns), cards sha1, rels sha1)
+    strings = {}
+
+    def num(s):
+        n = strings.get(s)
+        if n is None:
+            n = strings[s] = len(strings)
+        return n
+
+    cards = array.array('i')
+    for card in graph.cards.values():
+        cards.extend((num(card.id), num(card.type), num(card.title)))
+    edges = array.array('i')
+    strengths = []
+    extras = {}
+    for i, e in enumerate(graph.edges):
+        edges.extend((num(e.source), num(e.target), num(e.type)))
+        strengths.append(e.strength)
+        if e.extra:
+            extras[i] = e.extra
+
+    table = {s: s for s in strings}
+    sections = [
+        marshal.dumps(list(strings)),
+        cards.tobytes(),
+        edges.tobytes(),
+        marshal.dumps([_intern(strengths, table), _intern(extras, table)]),
+        marshal.dumps([_intern(c.data, table) for c in graph.cards.values()]),
+    ]
+    (cards_size, cards_mtime), (rels_size, rels_mtime), cards_sha, rels_sha = stamp
+    header = HEADER.pack(MAGIC, FORMAT, marshal.version,
+                         cards_size, cards_mtime, rels_size, rels_mtime, cards_sha, rels_sha,
+                         len(graph.cards), len(graph.edges), len(sections[0]), len(sections[3]), len(sections[4]))
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(header)
+            for section in sections:
+                f.write(section)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not write graph cache: {e}")
+
+
+def _restamp(path, header, stats):
+    # Same contents, new mtimes: rewrite just the header
+    values = list(header)
+    values[3], values[4] = stats[0]
+    values[5], values[6] = stats[1]
+    try:
+        with open(path, 'r+b') as f:
+            f.write(HEADER.pack(*values))
+    except OSError:
+        pass
+
+
+def read(path, cards_file, rels_file):
+    # The cached graph, or None if missing, stale or from another format
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                if len(m) < HEADER.size:
+                    return None
+                header = HEADER.unpack_from(m, 0)
+                (magic, fmt, mversion, cards_size, cards_mtime, rels_size, rels_mtime, cards_sha, rels_sha,
+                 n_cards, n_edges, strings_len, rest_len, data_len) = header
+                if (magic, fmt, mversion) != (MAGIC, FORMAT, marshal.version):
+                    return None
+                stats = (file_stat(cards_file), file_stat(rels_file))
+                if stats != ((cards_size, cards_mtime), (rels_size, rels_mtime)):
+                    if (file_hash(cards_file), file_hash(rels_file)) != (cards_sha, rels_sha):
+                        return None
+                    restamp = True
+                else:
+                    restamp = False
+
+                pos = HEADER.size
+                strings = marshal.loads(m[pos:pos + strings_len])
+                pos += strings_len
+                cards = array.array('i')
+                cards.frombytes(m[pos:pos + 12 * n_cards])
+                pos += 12 * n_cards
+                edges = array.array('i')
+                edges.frombytes(m[pos:pos + 12 * n_edges])
+                pos += 12 * n_edges
+                strengths, extras = marshal.loads(m[pos:pos + rest_len])
+                pos += rest_len
+                data = CardData(m[pos:pos + data_len])
+    except (OSError, ValueError, EOFError, TypeError, struct.error):
+        return None
+    if restamp:
+        _restamp(path, header, stats)
+
+    graph = CardGraph()
+    for i in range(n_cards):
+        card = CachedCard(strings[cards[3 * i]], strings[cards[3 * i + 1]], strings[cards[3 * i + 2]], data, i)
+        graph.cards[card.id] = card
+    for i in range(n_edges):
+        graph._index_edge(Edge(strings[edges[3 * i]], strings[edges[3 * i + 1]], strings[edges[3 * i + 2]],
+                               strengths[i], extras.get(i)))
+    return graph
+
+
+def load(cards_file, rels_file, path=None):
+    path = path or cache_path(cards_file)
+    graph = read(path, cards_file, rels_file)
+    if graph is not None:
+        return graph
+    cards_data, cards_stat, cards_sha = read_source(cards_file)
+    rels_data, rels_stat, rels_sha = read_source(rels_file)
+    graph = CardGraph(unwrap(cards_data, 'cards'), unwrap(rels_data, 'relationships'))
+    save(graph, (cards_stat, rels_stat, cards_sha, rels_sha), path)
+    return graph
+
+
+def refresh(graph, cards_file, rels_file, path=None):
+    # Re-cache a graph that was just written to cards_file / rels_file
+    stamp = (file_stat(cards_file), file_stat(rels_file), file_hash(cards_file), file_hash(rels_file))
+    save(graph, stamp, path or cache_path(cards_file))
+
+
+if __name__ == "__main__":
+    path = cache_path(CARDS_FILE)
+    start = time.perf_counter()
+    graph = load(CARDS_FILE, RELS_FILE)
+    print(f"Loaded {len(graph.cards)} cards and {len(graph.edges)} relationships "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms ({os.path.getsize(path)} byte cache).")
@@ -0,0 +1,339 @@
+
+import json
+import math
+import threading
+import time
+
+import numpy as np
+
+from card_graph import CARDS_FILE, RELS_FILE, load_graph
+
+# Force-directed layout of the card graph, computed on the server.
+#
+# The forces are the ones card_manager.html's d3 simulation uses (links of
+# length LINK_DISTANCE, many-body charge STACK_CHARGE / CHARGE, collision
+# radius COLLIDE_RADIUS, a weak pull towards x/y anchors), with d3's
+# integration (velocity decay, alpha cooling over ITERATIONS ticks), started
+# from d3's phyllotaxis spiral spread out to one node per collision radius.
+# So the result is deterministic, and the browser's simulation starts out
+# settled instead of from scratch.
+#
+# Charge is approximated on a hierarchy of square grids: each node takes the
+# exact pull of the nodes in its own and the 8 neighbouring cells of the
+# finest grid, and further away the summed charge (at its centre) of cells
+# from coarser and coarser grids, as in Barnes-Hut. O(n log n) per tick.
+# Which cells and neighbours each node interacts with is worked out every
+# REGRID_EVERY ticks; the cells' charges and centres are updated every tick.
+#
+#   positions = layout(nodes, edges)                 nodes: [(id, type)]
+#   positions = layout(nodes, edges, pinned=prev)    only nodes not in prev move
+#   python graph_layout.py                           time the real graph
+
+LINK_DISTANCE = 500
+STACK_CHARGE = -6000
+CHARGE = -2000
+COLLIDE_RADIUS = 100
+ANCHOR_STRENGTH = 0.02
+# The anchors: unlinked cards drift to x=LOOSE_X, the rest to x=WIDTH*0.6
+WIDTH, HEIGHT = 1200, 800
+LOOSE_X = 100
+
+ITERATIONS = 300
+VELOCITY_DECAY = 0.4
+ALPHA_MIN = 0.001
+# Up to this many nodes the charge is summed exactly
+EXACT_LIMIT = 600
+# Nodes per finest grid cell, on average
+LEAF_SIZE = 4
+# Ticks between rebuilding the grid (nodes only drift so far meanwhile)
+REGRID_EVERY = 5
+
+
+def phyllotaxis(n, start=0, spacing=COLLIDE_RADIUS):
+    # d3's initial positions, a sunflower spiral around the origin (d3 uses
+    # spacing 10, which packs a large graph into a dense, slow first few ticks)
+    i = np.arange(start, start + n, dtype=float)
+    radius = spacing * np.sqrt(0.5 + i)
+    angle = i * math.pi * (3 - math.sqrt(5))
+    return np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+
+
+def _scatter(vel, index, delta):
+    # vel[index] += delta, summing repeated indices
+    for axis in (0, 1):
+        vel[:, axis] += np.bincount(index, weights=delta[:, axis], minlength=len(vel))
+
+
+def _pull(pos, targets, src_pos, src_charge, vel, alpha):
+    # vel[targets] += charge * alpha * (src - pos) / d^2, pairwise over the
+    # given (target, source) index arrays
+    d = src_pos - pos[targets]
+    d2 = np.maximum(np.einsum('ij,ij->i', d, d), 1.0)
+    _scatter(vel, targets, d * (src_charge * alpha / d2)[:, None])
+
+
+def _pull_rows(pos, targets, sx, sy, src_charge, vel, alpha):
+    # The same with one row of sources per target: sx, sy, src_charge are
+    # (targets, sources) arrays, zero charge for padding
+    dx = sx - pos[targets, 0][:, None]
+    dy = sy - pos[targets, 1][:, None]
+    w = src_charge * alpha / np.maximum(dx * dx + dy * dy, 1.0)
+    vel[targets, 0] += (dx * w).sum(axis=1)
+    vel[targets, 1] += (dy * w).sum(axis=1)
+
+
+def _cell_pairs(cx, cy, g, targets):
+    # (i, j) for every target i and node j in i's cell or one of the 8
+    # around it, i != j
+    key = cy * g + cx
+    order = np.argsort(key, kind='stable')
+    sorted_keys = key[order]
+    tx, ty = cx[targets], cy[targets]
+    pair_i, pair_j = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            nx, ny = tx + dx, ty + dy
+            inside = (nx >= 0) & (nx < g) & (ny >= 0) & (ny < g)
+            nkey = ny * g + nx
+            start = np.searchsorted(sorted_keys, nkey, 'left')
+            count = np.where(inside, np.searchsorted(sorted_keys, nkey, 'right') - start, 0)
+            total = int(count.sum())
+            if not total:
+                continue
+            i = np.repeat(targets, count)
+            within = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+            j = order[np.repeat(start, count) + within]
+            keep = i != j
+            pair_i.append(i[keep])
+            pair_j.append(j[keep])
+    if not pair_i:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+    return np.concatenate(pair_i), np.concatenate(pair_j)
+
+
+def _grid(pos, targets):
+    # Which cells each target takes the summed charge of, level by level,
+    # and the (i, j) pairs it takes exactly: [(key, cells, ok)], (i, j)
+    n = len(pos)
+    lo = pos.min(axis=0)
+    size = max(float((pos.max(axis=0) - lo).max()), 1.0) * (1 + 1e-9)
+    levels = max(2, int(math.ceil(math.log(n / LEAF_SIZE, 4))))
+    # Finest cells no smaller than a collision, so collisions stay local
+    levels = max(2, min(levels, int(math.log2(size / (2 * COLLIDE_RADIUS)))))
+    offsets = np.arange(6)
+    plan = []
+    for level in range(2, levels + 1):
+        g = 1 << level
+        cell = np.minimum(((pos - lo) / size * g).astype(np.intp), g - 1)
+        cx, cy = cell[:, 0], cell[:, 1]
+        # The children of the parent's neighbours that aren't our own
+        # neighbours: what this level adds over the coarser ones
+        tx, ty = cx[targets][:, None, None], cy[targets][:, None, None]
+        nx = (tx // 2) * 2 - 2 + offsets[None, :, None]
+        ny = (ty // 2) * 2 - 2 + offsets[None, None, :]
+        ok = (nx >= 0) & (nx < g) & (ny >= 0) & (ny < g) & ((np.abs(nx - tx) > 1) | (np.abs(ny - ty) > 1))
+        cells = np.where(ok, ny * g + nx, 0).reshape(len(targets), 36)
+        plan.append((cy * g + cx, g * g, cells, ok.reshape(len(targets), 36)))
+    return plan, _cell_pairs(cx, cy, g, targets)
+
+
+def _charge(pos, charge, vel, alpha, targets, grid):
+    if grid is None:
+        _pull_rows(pos, targets, pos[None, :, 0], pos[None, :, 1], charge[None, :], vel, alpha)
+        return
+    plan, (i, j) = grid
+    for key, ncells, cells, ok in plan:
+        mass = np.bincount(key, weights=charge, minlength=ncells)
+        safe = np.where(mass != 0, mass, 1.0)
+        mx = np.bincount(key, weights=charge * pos[:, 0], minlength=ncells) / safe
+        my = np.bincount(key, weights=charge * pos[:, 1], minlength=ncells) / safe
+        _pull_rows(pos, targets, mx[cells], my[cells], np.where(ok, mass[cells], 0.0), vel, alpha)
+    # Exact within the finest neighbourhood
+    _pull(pos, i, pos[j], charge[j], vel, alpha)
+
+
+def _collide(pos, vel, targets, grid):
+    # Overlapping nodes (predicted positions) pushed apart, half each
+    p = pos + vel
+    reach = 2 * COLLIDE_RADIUS
+    if grid is None:
+        dx = p[targets, 0][:, None] - p[None, :, 0]
+        dy = p[targets, 1][:, None] - p[None, :, 1]
+        dist = np.sqrt(dx * dx + dy * dy)
+        push = np.where(dist < reach, (reach - dist) / np.maximum(dist, 1e-6) * 0.5, 0.0)
+        push[np.arange(len(targets)), targets] = 0
+        vel[targets, 0] += (dx * push).sum(axis=1)
+        vel[targets, 1] += (dy * push).sum(axis=1)
+        return
+    i, j = grid[1]
+    d = p[i] - p[j]
+    dist = np.sqrt(np.einsum('ij,ij->i', d, d))
+    close = dist < reach
+    i, d, dist = i[close], d[close], np.maximum(dist[close], 1e-6)
+    _scatter(vel, i, d * ((reach - dist) / dist * 0.5)[:, None])
+
+
+def _links(pos, vel, src, tgt, strength, bias, alpha):
+    d = (pos[tgt] + vel[tgt]) - (pos[src] + vel[src])
+    dist = np.maximum(np.sqrt(np.einsum('ij,ij->i', d, d)), 1e-6)
+    d *= ((dist - LINK_DISTANCE) / dist * alpha * strength)[:, None]
+    n = len(pos)
+    for axis in (0, 1):
+        vel[:, axis] -= np.bincount(tgt, weights=d[:, axis] * bias, minlength=n)
+        vel[:, axis] += np.bincount(src, weights=d[:, axis] * (1 - bias), minlength=n)
+
+
+def layout(nodes, edges, pinned=None, iterations=ITERATIONS):
+    # nodes: [(id, type)], edges: [(source id, target id)]; edges to unknown
+    # ids are ignored. pinned: {id: (x, y)} kept where they are.
+    # Returns {id: (x, y)}.
+    pinned = pinned or {}
+    ids = [nid for nid, _ in nodes]
+    index = {nid: i for i, nid in enumerate(ids)}
+    n = len(ids)
+    if not n:
+        return {}
+    pairs = [(index[s], index[t]) for s, t in edges if s in index and t in index and s != t]
+    src = np.array([s for s, _ in pairs], dtype=np.intp)
+    tgt = np.array([t for _, t in pairs], dtype=np.intp)
+    degree = np.bincount(np.concatenate((src, tgt)), minlength=n).astype(float)
+    if len(pairs):
+        strength = 1 / np.minimum(degree[src], degree[tgt])
+        bias = degree[src] / (degree[src] + degree[tgt])
+    else:
+        strength = bias = np.zeros(0)
+    charge = np.array([STACK_CHARGE if ntype == 'stack' else CHARGE for _, ntype in nodes], dtype=float)
+    anchor = np.column_stack((np.where(degree == 0, LOOSE_X, WIDTH * 0.6), np.full(n, HEIGHT / 2)))
+
+    fixed = np.array([nid in pinned for nid in ids])
+    pos = phyllotaxis(n)
+    if fixed.any():
+        pos[fixed] = np.array([pinned[nid] for nid in ids if nid in pinned], dtype=float)
+        # New nodes start next to their placed neighbours
+        free = np.flatnonzero(~fixed)
+        if len(pairs):
+            weight = np.concatenate((fixed[src], fixed[tgt])).astype(float)
+            ends = np.concatenate((tgt, src))
+            others = np.concatenate((src, tgt))
+            count = np.bincount(ends, weights=weight, minlength=n)
+            mean = np.column_stack([np.bincount(ends, weights=weight * pos[others, a], minlength=n) for a in (0, 1)])
+            near = free[count[free] > 0]
+            pos[near] = mean[near] / count[near][:, None] + phyllotaxis(len(near), 1) * 0.5
+    targets = np.flatnonzero(~fixed)
+    if not len(targets):
+        return {nid: tuple(pos[i]) for i, nid in enumerate(ids)}
+
+    vel = np.zeros((n, 2))
+    alpha = 1.0
+    decay = 1 - ALPHA_MIN ** (1 / iterations)
+    grid = None
+    for tick in range(iterations):
+        alpha += (0 - alpha) * decay
+        if len(pairs):
+            _links(pos, vel, src, tgt, strength, bias, alpha)
+        if n > EXACT_LIMIT and tick % REGRID_EVERY == 0:
+            grid = _grid(pos, targets)
+        _charge(pos, charge, vel, alpha, targets, grid)
+        _collide(pos, vel, targets, grid)
+        vel += (anchor - pos) * ANCHOR_STRENGTH * alpha
+        vel[fixed] = 0
+        vel *= 1 - VELOCITY_DECAY
+        pos += vel
+    return {nid: (float(pos[i, 0]), float(pos[i, 1])) for i, nid in enumerate(ids)}
+
+
+def graph_nodes(graph):
+    # What card_manager.html draws: every card, linked by every relationship
+    nodes = [(cid, card.type) for cid, card in graph.cards.items()]
+    edges = [(e.source, e.target) for e in graph.edges]
+    return nodes, edges
+
+
+class LayoutCache:
+    # Positions for a CardStore's graph, computed by a background thread
+    # (start()) so requests never wait on a layout run: get() serves the
+    # last completed layout, and refresh() (after an edit) has the thread
+    # catch up with the store. After a change the nodes already placed are
+    # pinned and only new ones are settled. Without start(), get() computes
+    # in the calling thread.
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.done = threading.Condition(self.lock)
+        self.wake = threading.Event()
+        self.thread = None
+        self.positions = None
+        self.versions = None
+        self.body = None
+        self.modified = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='layout', daemon=True)
+        self.thread.start()
+        self.refresh()
+
+    def refresh(self):
+        self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            try:
+                self.update()
+            except Exception as e:
+                print(f"Layout failed: {e!r}")
+
+    def update(self):
+        # Brings the layout up to the store's current versions
+        with self.store.lock:
+            versions = (self.store.versions['cards'], self.store.versions['relationships'])
+            if versions == self.versions:
+                return
+            nodes, edges = graph_nodes(self.store.graph)
+        # Computed outside both locks; edits and requests carry on meanwhile
+        ids = {nid for nid, _ in nodes}
+        pinned = {nid: xy for nid, xy in (self.positions or {}).items() if nid in ids}
+        if len(pinned) < len(nodes) or self.positions is None:
+            positions = layout(nodes, edges, pinned)
+        else:
+            positions = pinned
+        body = self.encode(positions, versions)
+        with self.done:
+            self.positions, self.versions, self.body = positions, versions, body
+            self.modified = time.time()
+            self.done.notify_all()
+
+    def get(self):
+        # (JSON body, (cards version, relationships version), time computed)
+        # of the last completed layout; only the first request waits for one
+        if self.thread is None:
+            self.update()
+        else:
+            with self.store.lock:
+                stale = (self.store.versions['cards'], self.store.versions['relationships']) != self.versions
+            if stale:
+                self.refresh()
+        with self.done:
+            self.done.wait_for(lambda: self.body is not None)
+            return self.body, self.versions, self.modified
+
+    def encode(self, positions, versions):
+        return json.dumps({
+            "version": list(versions),
+            "width": WIDTH,
+            "height": HEIGHT,
+            "positions": {nid: [round(x, 1), round(y, 1)] for nid, (x, y) in positions.items()},
+        }, separators=(',', ':')).encode('utf-8')
+
+
+if __name__ == "__main__":
+    graph = load_graph(CARDS_FILE, RELS_FILE)
+    nodes, edges = graph_nodes(graph)
+    start = time.perf_counter()
+    positions = layout(nodes, edges)
+    xs = [x for x, _ in positions.values()]
+    ys = [y for _, y in positions.values()]
+    print(f"Laid out {len(nodes)} nodes and {len(edges)} links in {time.perf_counter() - start:.2f}s "
+          f"({max(xs) - min(xs):.0f} x {max(ys) - min(ys):.0f})")
@@ -0,0 +1,268 @@
+
+import array
+import threading
+import time
+from collections import deque
+
+from card_graph import CARDS_FILE, RELS_FILE, load_graph
+
+# Structural statistics of the card graph, per relationship type.
+#
+# Every id in the graph (the cards, then ids only found in relationships)
+# has a position, and each attribute is an array indexed by position:
+#   depth      hops from the nearest root (a node with no parent of that type)
+#   subtree    nodes in its subtree, counting each node under one parent only
+#              (the first to reach it breadth-first), so the subtrees of a
+#              node's children add up to its own minus one
+#   component  weakly connected component number
+#   in_degree, out_degree
+#   hub        HITS hub score: how much a node points at the nodes that are
+#              most pointed at. Computed per component and scaled so the
+#              biggest hub of each component is 1.0
+# A cycle nothing points into counts its first node as a root.
+#
+# Everything is linear in nodes + edges (HITS: HITS_ITERATIONS passes). After
+# edge changes only the components touching the changed nodes are
+# recomputed (update); adding or removing cards needs a rebuild.
+#
+#   stats = GraphStats(graph)
+#   stats.node('1101_access_control')    -> {rtype: {"depth": 2, ...}}
+#   stats.top('contains', 'subtree', 10) -> [(id, value), ...]
+#   stats.summary()
+#   python graph_stats.py
+
+ATTRS = ('depth', 'subtree', 'component', 'in_degree', 'out_degree', 'hub')
+HITS_ITERATIONS = 20
+TOP_HUBS = 10
+
+
+class TypeStats:
+    # One relationship type's attribute arrays
+    def __init__(self, n):
+        self.depth = array.array('i', [0]) * n
+        self.subtree = array.array('i', [1]) * n
+        self.component = array.array('i', [0]) * n
+        self.in_degree = array.array('i', [0]) * n
+        self.out_degree = array.array('i', [0]) * n
+        self.hub = array.array('d', [0.0]) * n
+        self.members = {}   # component -> positions, for components of 2+ nodes
+        self.next_component = 0
+
+
+class GraphStats:
+    def __init__(self, graph):
+        self.graph = graph
+        self.ids = list(graph.cards) + sorted(graph.missing_ids())
+        self.n_cards = len(graph.cards)
+        self.index = {cid: i for i, cid in enumerate(self.ids)}
+        self.types = {}
+        for rtype in graph.out:
+            self.types[rtype] = TypeStats(len(self.ids))
+            self._compute(rtype, range(len(self.ids)))
+
+    # --- Computation ---
+
+    def _adjacency(self, rtype):
+        index = self.index
+        out = {index[s]: [index[t] for t in ts] for s, ts in self.graph.out.get(rtype, {}).items() if ts}
+        inc = {index[t]: [index[s] for s in ss] for t, ss in self.graph.inc.get(rtype, {}).items() if ss}
+        return out, inc
+
+    def _compute(self, rtype, nodes):
+        # Recomputes every attribute of `nodes`, a union of whole components
+        ts = self.types[rtype]
+        out, inc = self._adjacency(rtype)
+        seen = set()
+        for start in nodes:
+            if start in seen:
+                continue
+            comp = [start]
+            seen.add(start)
+            for node in comp:
+                for nxt in out.get(node, ()):
+                    if nxt not in seen:
+                        seen.add(nxt)
+                        comp.append(nxt)
+                for nxt in inc.get(node, ()):
+                    if nxt not in seen:
+                        seen.add(nxt)
+                        comp.append(nxt)
+            comp.sort()
+
+            number = ts.next_component
+            ts.next_component += 1
+            for node in comp:
+                ts.component[node] = number
+                ts.in_degree[node] = len(inc.get(node, ()))
+                ts.out_degree[node] = len(out.get(node, ()))
+            if len(comp) > 1:
+                ts.members[number] = comp
+            self._tree(ts, comp, out)
+            self._hits(ts, comp, out, inc)
+
+    def _tree(self, ts, comp, out):
+        # Breadth-first from all roots at once (so depth is the distance to
+        # the nearest), then subtree sizes summed back up the BFS tree
+        parent = {}
+        order = []
+
+        def bfs(roots):
+            queue = deque(roots)
+            for root in roots:
+                parent[root] = -1
+                ts.depth[root] = 0
+            while queue:
+                node = queue.popleft()
+                order.append(node)
+                for child in out.get(node, ()):
+                    if child not in parent:
+                        parent[child] = node
+                        ts.depth[child] = ts.depth[node] + 1
+                        queue.append(child)
+
+        bfs([n for n in comp if not ts.in_degree[n]])
+        for node in comp:
+            if node not in parent:
+                # A cycle only reachable from itself
+                bfs([node])
+
+        for node in comp:
+            ts.subtree[node] = 1
+        for node in reversed(order):
+            if parent[node] >= 0:
+                ts.subtree[parent[node]] += ts.subtree[node]
+
+    def _hits(self, ts, comp, out, inc):
+        hub = {n: 1.0 for n in comp}
+        for _ in range(HITS_ITERATIONS):
+            auth = {n: sum(hub[s] for s in inc.get(n, ())) for n in comp}
+            hub = {n: sum(auth[t] for t in out.get(n, ())) for n in comp}
+            top = max(hub.values())
+            if top == 0:
+                break
+            hub = {n: v / top for n, v in hub.items()}
+        for n in comp:
+            ts.hub[n] = round(hub[n], 6)
+
+    def same_nodes(self, card_ids):
+        # False if any of these ids became or stopped being a card (or an
+        # edge now points at an id not seen before)
+        for cid in card_ids:
+            if (cid in self.graph.cards) != (self.index.get(cid, self.n_cards) < self.n_cards):
+                return False
+        return set(self.graph.out) <= set(self.types)
+
+    def linked(self, node_id):
+        graph = self.graph
+        return any(graph.out.get(t, {}).get(node_id) or graph.inc.get(t, {}).get(node_id) for t in graph.out)
+
+    def update(self, changed_ids):
+        # Recompute after edges from / to `changed_ids` were added or
+        # removed. Returns False if a rebuild is needed instead: an edge to
+        # an id not seen before, or an id only found in relationships that
+        # has lost its last edge (it is no longer a node at all).
+        index = self.index
+        pending = []
+        for rtype, ts in self.types.items():
+            out, inc = self.graph.out.get(rtype, {}), self.graph.inc.get(rtype, {})
+            affected = set()
+            for cid in changed_ids:
+                for other in [cid] + out.get(cid, []) + inc.get(cid, []):
+                    pos = index.get(other)
+                    if pos is None:
+                        return False
+                    affected.update(ts.members.get(ts.component[pos], [pos]))
+            if any(pos >= self.n_cards and not self.linked(self.ids[pos]) for pos in affected):
+                return False
+            pending.append((rtype, ts, affected))
+        for rtype, ts, affected in pending:
+            for pos in affected:
+                ts.members.pop(ts.component[pos], None)
+            if affected:
+                self._compute(rtype, sorted(affected))
+        return True
+
+    # --- Reads ---
+
+    def node(self, card_id):
+        pos = self.index.get(card_id)
+        if pos is None:
+            return None
+        return {rtype: {attr: getattr(ts, attr)[pos] for attr in ATTRS} for rtype, ts in self.types.items()}
+
+    def top(self, rtype, attr, limit=10):
+        values = getattr(self.types[rtype], attr)
+        ranked = sorted(range(len(self.ids)), key=lambda p: -values[p])[:limit]
+        return [(self.ids[p], values[p]) for p in ranked]
+
+    def type_summary(self, rtype):
+        ts = self.types[rtype]
+        linked = [p for p in range(len(self.ids)) if ts.in_degree[p] or ts.out_degree[p]]
+        return {
+            "edges": sum(ts.out_degree),
+            "linked": len(linked),
+            "roots": sum(1 for p in linked if not ts.in_degree[p]),
+            "leaves": sum(1 for p in linked if not ts.out_degree[p]),
+            "components": len(ts.members),
+            "largest_component": max((len(m) for m in ts.members.values()), default=0),
+            "max_depth": max((ts.depth[p] for p in linked), default=0),
+            "top_hubs": [{"id": cid, "hub": score} for cid, score in self.top(rtype, 'hub', TOP_HUBS) if score > 0],
+        }
+
+    def summary(self):
+        types = list(self.types.values())
+        unlinked = sum(1 for p in range(len(self.ids))
+                       if not any(ts.in_degree[p] or ts.out_degree[p] for ts in types))
+        return {
+            "nodes": len(self.ids),
+            "cards": self.n_cards,
+            "missing": len(self.ids) - self.n_cards,
+            "unlinked": unlinked,
+            "types": {rtype: self.type_summary(rtype) for rtype in self.types},
+        }
+
+
+class StatsCache:
+    # GraphStats for a CardStore, brought up to date on each read: edge
+    # changes are applied incrementally, card additions / removals rebuild.
+    # Hold .lock while reading the returned stats.
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.RLock()
+        self.stats = None
+        self.versions = None
+
+    def get(self):
+        store = self.store
+        with self.lock, store.lock:
+            versions = dict(store.versions)
+            if self.stats is not None and versions != self.versions:
+                cards = store.changed_cards(self.versions['cards'])
+                sources = store.changed_sources(self.versions['relationships'])
+                if cards is None or sources is None or not self.stats.same_nodes(cards) \
+                        or not self.stats.update(sources):
+                    self.stats = None
+            if self.stats is None:
+                self.stats = GraphStats(store.graph)
+            self.versions = versions
+            return self.stats
+
+    def version(self):
+        # The store versions the stats were last brought up to
+        return (self.versions['cards'], self.versions['relationships'])
+
+
+if __name__ == "__main__":
+    graph = load_graph(CARDS_FILE, RELS_FILE)
+    start = time.perf_counter()
+    stats = GraphStats(graph)
+    summary = stats.summary()
+    print(f"{summary['nodes']} nodes ({summary['missing']} missing cards), {summary['unlinked']} with no links; "
+          f"computed in {(time.perf_counter() - start) * 1000:.0f} ms")
+    for rtype, s in summary['types'].items():
+        print(f"\n{rtype}: {s['edges']} edges over {s['linked']} nodes, {s['roots']} roots, {s['leaves']} leaves")
+        print(f"  {s['components']} components (largest {s['largest_component']}), max depth {s['max_depth']}")
+        biggest = [f"{cid} ({n})" for cid, n in stats.top(rtype, 'subtree', 5)]
+        print(f"  largest subtrees: {', '.join(biggest)}")
+        if s['top_hubs']:
+            print(f"  top hubs: {', '.join(h['id'] for h in s['top_hubs'][:5])}")
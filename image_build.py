@@ -0,0 +1,264 @@
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+
+from PIL import Image
+
+import build_stage
+from build_stage import changed_sources, output_stem, output_url, run_pool
+from card_graph import BASE_DIR, CARDS_FILE, RELS_FILE, load_graph, load_json, save_json
+from card_store import CardStore, server_running
+from card_validation import is_local_path
+
+# Image build stage: thumbnails and resized WebP variants of every image the
+# cards reference (displayImages slots, card_image, image files in media).
+#
+# Images are processed in a process pool, and a rebuild only touches new or
+# changed images; outputs no source uses any more are deleted (the manifest
+# and output naming are shared with pdf_ingest.py, see build_stage.py). Cards whose thumbnail slot is empty (or an older generated one)
+# get the thumbnail of their front image. images/build/ is a local build
+# output (not in the repo); nuts_and_bolts.html falls back to the front
+# image where a thumbnail is missing.
+#
+# The card changes go to the running server (/api/batch), which journals
+# them and records the history version. --offline writes cards.json itself,
+# and refuses to while a server is up: the server would overwrite it.
+#
+#   python image_build.py                 build, and send the thumbnails to the server
+#   python image_build.py --sprite        also pack the small images into one sheet
+#   python image_build.py --dry-run       build, but only list the card changes
+#   python image_build.py --server http://host:8002    another server
+#   python image_build.py --offline       server stopped: write cards.json directly
+#
+# manifest.json: {source: {"sha256", "stamp", "width", "height", "thumbnail",
+# "variants": {"480": url, ..., "full": url}}}; sprite.json: {"file",
+# "images": {source: [x, y, w, h]}}.
+
+BUILD_DIR = os.path.join(BASE_DIR, 'images', 'build')
+MANIFEST_FILE = os.path.join(BUILD_DIR, 'manifest.json')
+SPRITE_FILE = os.path.join(BUILD_DIR, 'sprite.json')
+# Bounding box of a thumbnail: the grid views show card images 65px high,
+# so twice that for high-density screens
+THUMBNAIL_SIZE = 130
+# Widths of the resized variants (never upscaled); "full" is the original
+# size re-encoded
+WIDTHS = (480, 1200)
+QUALITY = 80
+# Sources no bigger than this either way count as icons for the sprite sheet
+SPRITE_MAX_SIDE = 256
+SPRITE_COLUMNS = 16
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp')
+SERVER_URL = 'http://localhost:8002'
+
+
+def is_image(path):
+    return isinstance(path, str) and path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def front_image(card):
+    # What the grid views draw on the front of a card
+    front = ((card.get('displayImages') or {}).get('front') or {})
+    return front.get('url') or card.get('card_image') or None
+
+
+def referenced_images(cards):
+    # {path: [card ids]} for every local image a card refers to
+    refs = {}
+    for card in cards:
+        paths = [card.get('card_image')]
+        images = card.get('displayImages')
+        if isinstance(images, dict):
+            paths += [slot.get('url') for name, slot in images.items()
+                      if name != 'thumbnail' and isinstance(slot, dict)]
+        media = card.get('media') or []
+        paths += [media] if isinstance(media, str) else media
+        for path in paths:
+            if is_image(path) and is_local_path(path):
+                refs.setdefault(path.replace('\\', '/'), []).append(card.get('id'))
+    return refs
+
+
+def output_name(source, sha, label):
+    return f"{output_stem(source, sha)}-{label}.webp"
+
+
+def build_url(name):
+    return output_url(BUILD_DIR, name)
+
+
+def _open(path):
+    image = Image.open(path)
+    image.load()
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _build_image(source, sha):
+    # Worker: every output for one source; returns its manifest entry
+    image = _open(os.path.join(BASE_DIR, source))
+    width, height = image.size
+    outputs = {}
+
+    thumb = image.copy()
+    thumb.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+    outputs['thumbnail'] = thumb
+    for target in WIDTHS:
+        if target < width:
+            outputs[str(target)] = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+    if not source.lower().endswith('.webp'):
+        outputs['full'] = image
+
+    entry = {"sha256": sha, "width": width, "height": height, "variants": {}}
+    for label, rendition in outputs.items():
+        name = output_name(source, sha, label)
+        path = os.path.join(BUILD_DIR, name)
+        if not os.path.exists(path):
+            rendition.save(path + '.tmp', 'WEBP', quality=QUALITY)
+            os.replace(path + '.tmp', path)
+        if label == 'thumbnail':
+            entry['thumbnail'] = build_url(name)
+        else:
+            entry['variants'][label] = build_url(name)
+    return entry
+
+
+def entry_outputs(entry):
+    return [entry['thumbnail']] + list(entry['variants'].values())
+
+
+def build(sources, manifest, workers=None):
+    # Brings manifest ({source: entry}) up to date for these sources.
+    # Returns (built, reused) counts.
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    pending, reused = changed_sources(manifest, sources, lambda source: os.path.join(BASE_DIR, source), entry_outputs)
+    run_pool(_build_image, pending, manifest, workers, errors=OSError)
+    return len(pending), reused
+
+
+def prune(manifest):
+    # Deletes build outputs no manifest entry points at
+    keep = [MANIFEST_FILE, SPRITE_FILE]
+    sprite = load_json(SPRITE_FILE) if os.path.exists(SPRITE_FILE) else {}
+    if sprite.get('file'):
+        keep.append(sprite['file'])
+    return build_stage.prune(BUILD_DIR, manifest, entry_outputs, keep)
+
+
+def pack_sprite(manifest):
+    # The thumbnails of the icon-sized sources on one sheet, in a grid of
+    # THUMBNAIL_SIZE cells. Writes the sheet (named by its content) and
+    # sprite.json; returns the number of images packed.
+    icons = sorted(s for s, e in manifest.items() if max(e['width'], e['height']) <= SPRITE_MAX_SIDE)
+    if not icons:
+        return 0
+    columns = min(SPRITE_COLUMNS, len(icons))
+    rows = -(-len(icons) // columns)
+    sheet = Image.new('RGBA', (columns * THUMBNAIL_SIZE, rows * THUMBNAIL_SIZE), (0, 0, 0, 0))
+    placed = {}
+    for i, source in enumerate(icons):
+        thumb = Image.open(os.path.join(BASE_DIR, manifest[source]['thumbnail'])).convert('RGBA')
+        x, y = (i % columns) * THUMBNAIL_SIZE, (i // columns) * THUMBNAIL_SIZE
+        sheet.paste(thumb, (x, y))
+        placed[source] = [x, y, thumb.width, thumb.height]
+    digest = hashlib.sha256(json.dumps([manifest[s]['sha256'] for s in icons]).encode()).hexdigest()
+    name = f"sprite-{digest[:12]}.webp"
+    if not os.path.exists(os.path.join(BUILD_DIR, name)):
+        sheet.save(os.path.join(BUILD_DIR, name), 'WEBP', quality=QUALITY)
+    save_json(SPRITE_FILE, {"file": build_url(name), "size": THUMBNAIL_SIZE, "images": placed})
+    return len(placed)
+
+
+def thumbnail_ops(cards, manifest):
+    # patch_card ops filling in thumbnail slots that are empty or hold an
+    # outdated generated thumbnail
+    generated = build_url('')
+    ops = []
+    for card in cards:
+        source = front_image(card)
+        entry = manifest.get(source.replace('\\', '/')) if source else None
+        if entry is None:
+            continue
+        images = card.get('displayImages')
+        images = dict(images) if isinstance(images, dict) else {}
+        current = (images.get('thumbnail') or {}).get('url') or ''
+        if current == entry['thumbnail'] or (current and not current.startswith(generated)):
+            continue
+        alt = (images.get('thumbnail') or {}).get('alt') or (images.get('front') or {}).get('alt', '')
+        images['thumbnail'] = {"url": entry['thumbnail'], "alt": alt}
+        ops.append({"op": "patch_card", "id": card['id'], "fields": {"displayImages": images}})
+    return ops
+
+
+def apply_server(ops, url):
+    request = urllib.request.Request(url.rstrip('/') + '/api/batch',
+                                     data=json.dumps({"ops": ops}).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build thumbnails and WebP variants of the card images")
+    parser.add_argument('--sprite', action='store_true', help='also pack the icon-sized images into a sprite sheet')
+    parser.add_argument('--dry-run', action='store_true', help='build the images but only list the card changes')
+    parser.add_argument('--server', metavar='URL', default=SERVER_URL, help=f'server to send the card changes to (default {SERVER_URL})')
+    parser.add_argument('--offline', action='store_true', help='write cards.json directly; only while no server is running')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    if args.offline and not args.dry_run and server_running():
+        print("The server is running; drop --offline to send the changes to it.")
+        return
+
+    # Only opened offline: a CardStore compacts the journal when it loads
+    store = CardStore(CARDS_FILE, RELS_FILE) if args.offline and not args.dry_run else None
+    graph = store.graph if store else load_graph(CARDS_FILE, RELS_FILE)
+    cards = [card.data for card in graph.cards.values()]
+    refs = referenced_images(cards)
+    sources = sorted(p for p in refs if os.path.exists(os.path.join(BASE_DIR, p)))
+    missing = len(refs) - len(sources)
+    if missing:
+        print(f"{missing} referenced images not found (python card_validation.py lists them)")
+
+    start = time.perf_counter()
+    manifest = load_json(MANIFEST_FILE) if os.path.exists(MANIFEST_FILE) else {}
+    manifest = {s: e for s, e in manifest.items() if s in sources}
+    built, reused = build(sources, manifest, args.workers)
+    save_json(MANIFEST_FILE, manifest)
+    packed = pack_sprite(manifest) if args.sprite else 0
+    removed = prune(manifest)
+    print(f"{len(sources)} images: {built} built, {reused} unchanged, {removed} stale outputs removed"
+          + (f", {packed} in the sprite sheet" if args.sprite else "") + f" ({time.perf_counter() - start:.1f}s)")
+
+    before = sum(os.path.getsize(os.path.join(BASE_DIR, s)) for s in manifest)
+    after = sum(os.path.getsize(os.path.join(BASE_DIR, e['thumbnail'])) for e in manifest.values())
+    print(f"Thumbnails: {after / 1024:.0f} KB against {before / 1024:.0f} KB of originals")
+
+    ops = thumbnail_ops(cards, manifest)
+    if not ops:
+        print("Card thumbnails are up to date.")
+        return
+    if args.dry_run:
+        for op in ops:
+            print(f"~ {op['id']}: thumbnail {op['fields']['displayImages']['thumbnail']['url']}")
+        print(f"Dry run: {len(ops)} cards not updated.")
+        return
+    if args.offline:
+        # The server records this as an outside change when it next starts
+        store.apply(ops)
+        store.compact()
+        print(f"Updated the thumbnail of {len(ops)} cards.")
+        return
+    try:
+        result = apply_server(ops, args.server)
+    except urllib.error.URLError as e:
+        print(f"Could not reach {args.server} ({e.reason}); with the server stopped, use --offline.")
+        return
+    print(f"Server updated {len(result.get('results', ops))} cards.")
+
+if __name__ == "__main__":
+    main()
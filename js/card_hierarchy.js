@@ -0,0 +1,31 @@
+// Hierarchies from server.py's /api/hierarchy (card_hierarchy.py), for the
+// radar and sunburst views.
+//
+// Both encodings come back as the nested { name, children } tree d3.hierarchy
+// takes. Every node carries size / leaves / weight over its whole subtree, so
+// branches cut off by ?depth= still size correctly with
+//   d3.hierarchy(root).sum(cardHierarchyValue)
+//
+//   renderSunburst('api/hierarchy?root=1101_access_control&depth=3&format=compact', 'chart')
+
+function isCardHierarchy(data) {
+    return !!data && ((Array.isArray(data.fields) && Array.isArray(data.nodes)) || 'leaves' in data);
+}
+
+// Compact ({ fields, nodes, children }) or nested -> nested, named
+function cardHierarchyRoot(data, rootName) {
+    let root = data;
+    if (Array.isArray(data.nodes)) {
+        const nodes = data.nodes.map(row => Object.fromEntries(data.fields.map((f, i) => [f, row[i]])));
+        data.children.forEach((kids, i) => {
+            if (kids.length) nodes[i].children = kids.map(k => nodes[k]);
+        });
+        root = nodes[0] || { id: null, name: null, children: [] };
+    }
+    if (root.name === null || root.name === undefined) root.name = rootName || "Cards";
+    return root;
+}
+
+function cardHierarchyValue(d) {
+    return d.children ? 0 : (d.leaves || 1);
+}
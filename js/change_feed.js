@@ -0,0 +1,85 @@
+// Live updates from server.py's /api/changes (Server-Sent Events).
+//
+// Each event is one history version and carries its delta (see
+// card_history.py): put / patch / remove / edges_add / edges_remove / order.
+// applyCardDelta() patches in-memory copies of cards.json and
+// relationships.json with it, so open pages stay current without
+// downloading the documents again.
+//
+//   const feed = new CardChangeFeed(version, {
+//       onDelta: (delta, version) => { ... },
+//       onReset: () => { ...reload both documents... }
+//   });
+//
+// `version` is the X-Change-Version header of the cards.json response the
+// page was built from. EventSource reconnects on its own and resumes from
+// the last event id; 'reset' means the server cannot replay from there.
+
+function cardEdgeKey(edge) {
+    const from = edge.from !== undefined ? edge.from : edge.source;
+    const to = edge.to !== undefined ? edge.to : edge.target;
+    return JSON.stringify([from, to, edge.type || 'contains']);
+}
+
+// Applies one delta to { cards, relationships } in place
+function applyCardDelta(data, delta, skip) {
+    // skip(id): cards with local unsaved edits, left as they are
+    skip = skip || (() => false);
+
+    if (delta.remove) {
+        const removed = new Set(delta.remove.filter(id => !skip(id)));
+        data.cards = data.cards.filter(c => !removed.has(c.id));
+    }
+    const index = new Map(data.cards.map((c, i) => [c.id, i]));
+    Object.entries(delta.put || {}).forEach(([id, card]) => {
+        if (skip(id)) return;
+        if (index.has(id)) data.cards[index.get(id)] = card;
+        else {
+            index.set(id, data.cards.length);
+            data.cards.push(card);
+        }
+    });
+    Object.entries(delta.patch || {}).forEach(([id, change]) => {
+        if (skip(id) || !index.has(id)) return;
+        const card = Object.assign({}, data.cards[index.get(id)], change.set || {});
+        (change.unset || []).forEach(field => delete card[field]);
+        data.cards[index.get(id)] = card;
+    });
+    if (delta.order) {
+        const byId = new Map(data.cards.map(c => [c.id, c]));
+        const ordered = delta.order.filter(id => byId.has(id)).map(id => byId.get(id));
+        const listed = new Set(delta.order);
+        data.cards = ordered.concat(data.cards.filter(c => !listed.has(c.id)));
+    }
+
+    if (delta.edges_remove || delta.edges_add) {
+        const removed = new Set((delta.edges_remove || []).map(k => JSON.stringify(k)));
+        (delta.edges_add || []).forEach(edge => removed.add(cardEdgeKey(edge)));
+        data.relationships = data.relationships.filter(r => !removed.has(cardEdgeKey(r)));
+        data.relationships.push(...(delta.edges_add || []));
+    }
+    return data;
+}
+
+class CardChangeFeed {
+    constructor(version, handlers, url) {
+        this.version = version;
+        this.handlers = handlers;
+        const base = url || 'api/changes';
+        this.source = new EventSource(version !== null && version !== undefined ? `${base}?since=${version}` : base);
+        this.source.addEventListener('delta', (e) => {
+            const event = JSON.parse(e.data);
+            this.version = event.version;
+            this.handlers.onDelta(event.delta, event.version);
+        });
+        this.source.addEventListener('reset', (e) => {
+            // Too far behind: start over from the server's documents
+            this.close();
+            this.handlers.onReset(JSON.parse(e.data).version);
+        });
+    }
+
+    close() {
+        this.source.close();
+    }
+}
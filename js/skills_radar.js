@@ -110,7 +110,7 @@ function renderRadar(dataSource, containerId) {
         : Promise.resolve(dataSource);
 
     dataPromise.then(data => {
-        const rootData = { name: "Waal Bridge", children: [] };
+        let rootData = { name: "Waal Bridge", children: [] };
 
         // Helper to flatten
         function processChildren(obj) {
@@ -135,11 +135,16 @@ function renderRadar(dataSource, containerId) {
             }
         }
 
-        rootData.children = Object.entries(data).map(([key, value]) => ({
-            name: key,
-            ...value,
-            children: processChildren(value)
-        }));
+        if (isCardHierarchy(data)) {
+            // Generated from the card graph (/api/hierarchy)
+            rootData = cardHierarchyRoot(data, rootData.name);
+        } else {
+            rootData.children = Object.entries(data).map(([key, value]) => ({
+                name: key,
+                ...value,
+                children: processChildren(value)
+            }));
+        }
 
         // Hierarchy & Layout
         const root = d3.hierarchy(rootData);
@@ -60,7 +60,7 @@ function renderSunburst(dataSource, containerId) {
 
     dataPromise.then(data => {
         // ... (data processing same as before)
-        const rootData = { name: "Waal Bridge", children: [] };
+        let rootData = { name: "Waal Bridge", children: [] };
 
         function processChildren(obj) {
             if (obj.children) {
@@ -84,14 +84,19 @@ function renderSunburst(dataSource, containerId) {
             }
         }
 
-        rootData.children = Object.entries(data).map(([key, value]) => ({
-            name: key,
-            ...value,
-            children: processChildren(value)
-        }));
+        if (isCardHierarchy(data)) {
+            // Generated from the card graph (/api/hierarchy)
+            rootData = cardHierarchyRoot(data, rootData.name);
+        } else {
+            rootData.children = Object.entries(data).map(([key, value]) => ({
+                name: key,
+                ...value,
+                children: processChildren(value)
+            }));
+        }
 
         const root = d3.hierarchy(rootData)
-            .sum(d => (d.children ? 0 : 1));
+            .sum(cardHierarchyValue);
 
         const partition = d3.partition()
             .size([2 * Math.PI, root.height + 1]);
@@ -1,101 +1,67 @@
-import json
-import difflib
 import os
 
-cards_path = 'c:/PythonApplications/AI_Skillsweb/cards.json'
-pdf_list = [
-    "Advanced_Applied_Ana.pdf",
-    "AI-Driven_Private_Do.pdf",
-    "Artificial_Intellige.pdf",
-    "Azure_Cloud_Infrastr.pdf",
-    "Backend_Application_.pdf",
-    "Computing_Foundation.pdf",
-    "Cost_Control_in_High.pdf",
-    "Dashboard_Architectu.pdf",
-    "Database_Platform_De.pdf",
-    "Database_Schema_Desi.pdf",
-    "Data_Warehouse_and_D.pdf",
-    "Delivery_Methodology.pdf",
-    "Document_Maintenance.pdf",
-    "GDPR_and_Data_Privac.pdf",
-    "Google_Cloud_Securit.pdf",
-    "GUI_Design_and_Rapid.pdf",
-    "High-Volatility_Data.pdf",
-    "Identity_Management_.pdf",
-    "Infrastructure_as_a_.pdf",
-    "Inventory_and_Operat.pdf",
-    "KPI_and_Metrics_Desi.pdf",
-    "Legacy_Codebase_Mode.pdf",
-    "Microservices_Archit.pdf",
-    "Microsoft_Security_E.pdf",
-    "Operational_Reportin.pdf",
-    "Orchestrating_Large-.pdf",
-    "Planning_and_Schedul.pdf",
-    "Platform_Security_Mo.pdf",
-    "Policy,_Compliance,_.pdf",
-    "Process_Improvement_.pdf",
-    "Project_Management_R.pdf",
-    "Requirements_Gatheri.pdf",
-    "Software_Delivery_Me.pdf",
-    "SQL_and_Relational_D.pdf",
-    "Straight-Through_Pro.pdf",
-    "Strategic_KPI_Defini.pdf",
-    "Structural_Integrity.pdf",
-    "System_Monitoring,_S.pdf",
-    "Technical_Authorship.pdf",
-    "Vector_Databases_AI.pdf"
-]
+from card_graph import BASE_DIR, CARDS_FILE, load_graph, load_json, save_json
+from fuzzy_match import NgramMatcher
+from pdf_ingest import MANIFEST_FILE
+
+PDF_DIR = os.path.join(BASE_DIR, 'pdf')
+MAPPING_FILE = os.path.join(BASE_DIR, 'pdf_mapping.json')
+
+THRESHOLD = 0.4
+ALTERNATES = 3
 
 try:
-    with open(cards_path, 'r', encoding='utf-8') as f:
-        cards_data = json.load(f)
+    graph = load_graph(CARDS_FILE, None)
 
-    cards = cards_data.get('cards', cards_data)
-    
     # Filter for all cards that are NOT stacks or headings
-    target_cards = [c for c in cards if 'stack' not in c.get('type', '') and 'heading' not in c.get('title', '').lower()]
-    
-    # Also include other potential matches if needed, but focus on 14xx first as requested
-    # If 14xx doesn't match, we might look at others.
-    
-    matches = []
-    
+    target_cards = [c for c in graph.cards.values()
+                    if 'stack' not in (c.type or '') and 'heading' not in (c.title or '').lower()]
+    matcher = NgramMatcher(c.title or '' for c in target_cards)
+
+    pdf_list = sorted(f for f in os.listdir(PDF_DIR) if f.lower().endswith('.pdf'))
+    # Titles read from the documents themselves (python pdf_ingest.py); the
+    # file names are often cut short
+    ingested = load_json(MANIFEST_FILE) if os.path.exists(MANIFEST_FILE) else {}
+
     print(f"{'PDF Filename':<35} | {'Match Score':<5} | {'Card Title'}")
     print("-" * 80)
 
-    cached_matches = {}
-
+    mapping = {}
+    matched = 0
     for pdf in pdf_list:
         # heuristic: clean pdf name
-        clean_name = pdf.replace('.pdf', '').replace('_', ' ').replace('-', ' ')
-        
-        best_ratio = 0
-        best_card = None
-        
-        for card in target_cards:
-            title = card.get('title', '')
-            # Simple fuzzy match
-            ratio = difflib.SequenceMatcher(None, clean_name.lower(), title.lower()).ratio()
-            
-            if ratio > best_ratio:
-                best_ratio = ratio
-                best_card = card
-        
-        if best_ratio > 0.4: # Threshold
-            matches.append({
-                "pdf": pdf,
-                "card_id": best_card['id'],
-                "card_title": best_card['title'],
-                "score": best_ratio
-            })
-            print(f"{pdf:<35} | {best_ratio:.2f}  | {best_card['title']}")
-            cached_matches[pdf] = best_card['id']
+        clean_name = os.path.splitext(pdf)[0].replace('_', ' ').replace('-', ' ')
+
+        ranked = matcher.top(clean_name)
+        matched_on = "filename"
+        title = (ingested.get(pdf) or {}).get('title')
+        if title:
+            by_title = matcher.top(title)
+            if by_title and (not ranked or by_title[0][0] > ranked[0][0]):
+                ranked, matched_on = by_title, "content"
+        alternates = [{"card_id": target_cards[i].id, "score": round(score, 3)}
+                      for score, i, _ in ranked[1:1 + ALTERNATES]]
+
+        if ranked and ranked[0][0] > THRESHOLD:
+            best_ratio, best, _ = ranked[0]
+            card = target_cards[best]
+            mapping[pdf] = {
+                "card_id": card.id,
+                "card_title": card.title,
+                "score": round(best_ratio, 3),
+                "matched_on": matched_on,
+                "alternates": alternates,
+            }
+            matched += 1
+            print(f"{pdf:<35} | {best_ratio:.2f}  | {card.title}")
         else:
+            best_ratio = ranked[0][0] if ranked else 0
+            mapping[pdf] = {"card_id": None, "score": round(best_ratio, 3), "alternates": alternates}
             print(f"{pdf:<35} | {best_ratio:.2f}  | ** NO GOOD MATCH **")
 
-    # Save mapping for next step
-    with open('c:/PythonApplications/AI_Skillsweb/pdf_mapping.json', 'w') as f:
-        json.dump(cached_matches, f, indent=2)
+    # Save mapping for next step (apply_pdf_links.py)
+    save_json(MAPPING_FILE, mapping)
+    print(f"\nMatched {matched} of {len(pdf_list)} PDFs. Mapping saved to {MAPPING_FILE}")
 
 except Exception as e:
     print(f"Error: {e}")
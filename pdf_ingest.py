@@ -0,0 +1,224 @@
+
+import argparse
+import copy
+import os
+import threading
+import time
+
+try:
+    import pymupdf
+except ImportError:   # only needed to ingest; reading the index works without it
+    pymupdf = None
+
+import build_stage
+from build_stage import changed_sources, output_stem, output_url, run_pool
+from card_graph import BASE_DIR, CARDS_FILE, load_graph, load_json, save_json
+from search_index import SearchIndex, file_stamp
+
+# Content ingestion for the pdf/ library.
+#
+# Each PDF's text, page count, title (document metadata, else the first line
+# of text) and a PNG preview of its first page are extracted in a process
+# pool into INGEST_DIR. Re-ingesting an unchanged library reads nothing, and
+# outputs of removed or changed PDFs are deleted (the manifest and output
+# naming are shared with image_build.py, see build_stage.py).
+#
+# PdfIndex puts the extracted text in a SearchIndex (BM25, phrases,
+# prefixes; see search_index.py), one document per PDF, and knows which
+# cards each PDF belongs to: a pdf/<name> entry in the card's media, or
+# pdf_mapping.json (map_pdfs.py). Searches can be limited to one card's PDFs.
+#
+#   python pdf_ingest.py                               extract new / changed PDFs
+#   python pdf_ingest.py --search "vector data*"       search the contents
+#   python pdf_ingest.py --search etl --card 1301_advanced_applied_analytics
+#
+# manifest.json: {pdf name: {"sha256", "stamp", "pages", "title", "chars",
+# "text": path, "preview": path}}
+
+PDF_DIR = os.path.join(BASE_DIR, 'pdf')
+INGEST_DIR = os.path.join(BASE_DIR, 'pdf_index')
+MANIFEST_FILE = os.path.join(INGEST_DIR, 'manifest.json')
+MAPPING_FILE = os.path.join(BASE_DIR, 'pdf_mapping.json')
+PREVIEW_WIDTH = 300
+MAX_TITLE = 200
+# Term-frequency weight per field of a PDF
+PDF_FIELDS = (('name', 3.0), ('title', 3.0), ('text', 1.0))
+
+
+def ingest_url(name):
+    return output_url(INGEST_DIR, name)
+
+
+def pdf_name_text(pdf):
+    # "Azure_Cloud_Infrastr.pdf" -> "Azure Cloud Infrastr"
+    return os.path.splitext(pdf)[0].replace('_', ' ').replace('-', ' ')
+
+
+def _extract(pdf, sha):
+    # Worker: text and preview of one PDF; returns its manifest entry
+    stem = output_stem(pdf, sha)
+    with pymupdf.open(os.path.join(PDF_DIR, pdf)) as doc:
+        text = '\n'.join(page.get_text() for page in doc)
+        title = (doc.metadata or {}).get('title') or ''
+        if not title.strip():
+            title = next((line.strip() for line in text.splitlines() if line.strip()), '')
+        entry = {"sha256": sha, "pages": doc.page_count, "title": title.strip()[:MAX_TITLE],
+                 "chars": len(text), "text": ingest_url(stem + '.txt'), "preview": None}
+        if doc.page_count:
+            page = doc[0]
+            scale = PREVIEW_WIDTH / max(page.rect.width, 1)
+            page.get_pixmap(matrix=pymupdf.Matrix(scale, scale)).save(os.path.join(INGEST_DIR, stem + '.png'))
+            entry['preview'] = ingest_url(stem + '.png')
+    with open(os.path.join(INGEST_DIR, stem + '.txt'), 'w', encoding='utf-8') as f:
+        f.write(text)
+    return entry
+
+
+def entry_outputs(entry):
+    return [path for path in (entry['text'], entry['preview']) if path]
+
+
+def ingest(manifest, workers=None):
+    # Brings manifest ({pdf name: entry}) up to date with PDF_DIR. Returns
+    # (extracted, unchanged, failed) counts.
+    if pymupdf is None:
+        raise ImportError("PDF ingestion needs PyMuPDF (pip install pymupdf)")
+    os.makedirs(INGEST_DIR, exist_ok=True)
+    pdfs = sorted(f for f in os.listdir(PDF_DIR) if f.lower().endswith('.pdf'))
+    for pdf in list(manifest):
+        if pdf not in pdfs:
+            del manifest[pdf]
+
+    pending, unchanged = changed_sources(manifest, pdfs, lambda pdf: os.path.join(PDF_DIR, pdf), entry_outputs)
+    # Damaged or encrypted files are reported, left out and retried next time
+    failed = run_pool(_extract, pending, manifest, workers)
+    return len(pending) - failed, unchanged, failed
+
+
+def prune(manifest):
+    # Deletes extracted files no manifest entry points at
+    return build_stage.prune(INGEST_DIR, manifest, entry_outputs, [MANIFEST_FILE])
+
+
+def pdf_links(graph, mapping=None):
+    # {pdf name: sorted card ids}, from the cards' media and pdf_mapping.json
+    links = {}
+    for card in graph.cards.values():
+        media = card.data.get('media') or []
+        for item in [media] if isinstance(media, str) else media:
+            item = str(item).replace('\\', '/')
+            if item.lower().endswith('.pdf'):
+                links.setdefault(os.path.basename(item), set()).add(card.id)
+    for pdf, match in (mapping or {}).items():
+        card_id = match.get('card_id') if isinstance(match, dict) else match
+        if card_id and card_id in graph.cards:
+            links.setdefault(pdf, set()).add(card_id)
+    return {pdf: sorted(ids) for pdf, ids in links.items()}
+
+
+def read_text(entry):
+    with open(os.path.join(BASE_DIR, entry['text']), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class PdfIndex:
+    def __init__(self, manifest, links=None):
+        self.manifest = manifest
+        self.links = links or {}
+        self.index = SearchIndex()
+        for pdf, entry in manifest.items():
+            fields = {'name': pdf_name_text(pdf), 'title': entry.get('title', ''), 'text': read_text(entry)}
+            self.index.add_document(pdf, [(fields[field], weight) for field, weight in PDF_FIELDS])
+
+    @classmethod
+    def load(cls, graph=None, manifest_file=MANIFEST_FILE, mapping_file=MAPPING_FILE):
+        manifest = load_json(manifest_file) if os.path.exists(manifest_file) else {}
+        mapping = load_json(mapping_file) if os.path.exists(mapping_file) else {}
+        return cls(manifest, pdf_links(graph, mapping) if graph is not None else {})
+
+    def with_links(self, links):
+        # The same text index with other card links, without re-tokenising
+        index = copy.copy(self)
+        index.links = links
+        return index
+
+    def describe(self, pdf, score=None):
+        entry = self.manifest[pdf]
+        result = {"pdf": pdf, "title": entry.get('title'), "pages": entry.get('pages'),
+                  "preview": entry.get('preview'), "cards": self.links.get(pdf, [])}
+        if score is not None:
+            result['score'] = round(score, 3)
+        return result
+
+    def card_pdfs(self, card_id):
+        return [pdf for pdf in self.manifest if card_id in self.links.get(pdf, ())]
+
+    def search(self, query, card_id=None, limit=20):
+        # [{pdf, title, pages, preview, cards, score}], best first; card_id
+        # limits it to that card's PDFs
+        if card_id is None:
+            ranked = self.index.search(query, limit)
+        else:
+            allowed = set(self.card_pdfs(card_id))
+            ranked = [(s, pdf) for s, pdf in self.index.search(query, len(self.manifest)) if pdf in allowed][:limit]
+        return [self.describe(pdf, score) for score, pdf in ranked]
+
+
+class PdfCache:
+    # A PdfIndex for server.py. The text index is rebuilt only when the
+    # manifest changes (a new ingest); pdf_mapping.json or card edits (their
+    # media links) just recompute the card links.
+    def __init__(self, store, manifest_file=MANIFEST_FILE, mapping_file=MAPPING_FILE):
+        self.store = store
+        self.manifest_file = manifest_file
+        self.mapping_file = mapping_file
+        self.lock = threading.Lock()
+        self.index = None
+        self.manifest_stamp = None
+        self.links_key = None
+
+    def get(self):
+        # (PdfIndex, key); key changes whenever the results can
+        with self.lock:
+            manifest_stamp = file_stamp(self.manifest_file)
+            links_key = (file_stamp(self.mapping_file), self.store.versions['cards'])
+            if self.index is None or manifest_stamp != self.manifest_stamp:
+                manifest = load_json(self.manifest_file) if manifest_stamp else {}
+                self.index, self.manifest_stamp, self.links_key = PdfIndex(manifest), manifest_stamp, None
+            if links_key != self.links_key:
+                mapping = load_json(self.mapping_file) if links_key[0] else {}
+                with self.store.lock:
+                    links = pdf_links(self.store.graph, mapping)
+                self.index, self.links_key = self.index.with_links(links), links_key
+            return self.index, (manifest_stamp,) + links_key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract and index the contents of the pdf/ library")
+    parser.add_argument('--search', metavar='QUERY', help='search the extracted text instead of ingesting')
+    parser.add_argument('--card', help='with --search: only that card\'s PDFs')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.search:
+        index = PdfIndex.load(load_graph(CARDS_FILE, None))
+        if not index.manifest:
+            print("Nothing ingested yet; run python pdf_ingest.py first.")
+            return
+        for hit in index.search(args.search, args.card, args.limit):
+            print(f"{hit['score']:6.2f}  {hit['pdf']:<32} {hit['title'][:50]:<50} {', '.join(hit['cards'])}")
+        return
+
+    start = time.perf_counter()
+    manifest = load_json(MANIFEST_FILE) if os.path.exists(MANIFEST_FILE) else {}
+    extracted, unchanged, failed = ingest(manifest, args.workers)
+    save_json(MANIFEST_FILE, manifest)
+    removed = prune(manifest)
+    pages = sum(e['pages'] for e in manifest.values())
+    print(f"{len(manifest)} PDFs ({pages} pages): {extracted} extracted, {unchanged} unchanged, "
+          f"{failed} failed, {removed} stale files removed ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+
+import html
+import json
+import threading
+
+# Raw Data Viewer page (raw_data.html), rendered on demand from the store
+# instead of being rewritten to disk on every save.
+#
+# The page is produced as a sequence of chunks so the server can stream it
+# while it is being rendered. The full page is kept per (cards version,
+# relationships version) and only re-rendered after one of them changes.
+
+CHUNK_SIZE = 64 * 1024
+
+PAGE_HEAD = """
+        <!DOCTYPE html>
+        <html lang="en">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Raw Data Viewer</title>
+            <style>
+                body { font-family: sans-serif; background-color: #0f172a; color: #f8fafc; padding: 20px; }
+                h2 { color: #60a5fa; }
+                textarea { width: 100%; height: 400px; background-color: #1e293b; color: #cbd5e1; border: 1px solid #334155; padding: 10px; font-family: monospace; }
+                .container { display: flex; gap: 20px; flex-direction: column; }
+                .note { color: #94a3b8; font-size: 0.9em; }
+                @media (min-width: 768px) { .container { flex-direction: row; } .box { flex: 1; } }
+            </style>
+        </head>
+        <body>
+            <h1>Raw Data Viewer</h1>
+            <div class="container">
+"""
+
+PAGE_TAIL = """
+            </div>
+        </body>
+        </html>
+        """
+
+
+def _box(name, text, note=''):
+    yield f"""                <div class="box">
+                    <h2>{name}</h2>{note}
+                    <textarea readonly>""".encode('utf-8')
+    for i in range(0, len(text), CHUNK_SIZE):
+        yield html.escape(text[i:i + CHUNK_SIZE]).encode('utf-8')
+    yield b"""</textarea>
+                </div>
+"""
+
+
+def _collapsed(body, key, limit):
+    # Show only the first `limit` items of the array, with a count of the rest
+    items = json.loads(body).get(key, [])
+    text = json.dumps({key: items[:limit]}, indent=2)
+    note = ''
+    if len(items) > limit:
+        note = f'\n                    <p class="note">Showing {limit} of {len(items)} {key} (<a href="?">show all</a>)</p>'
+    return text, note
+
+
+def render(store, limit=None):
+    # Generator of page chunks for the store's current data
+    cards_body = store.document('cards')[0]
+    rels_body = store.document('relationships')[0]
+
+    yield PAGE_HEAD.encode('utf-8')
+    for name, key, body in (('cards.json', 'cards', cards_body),
+                            ('relationships.json', 'relationships', rels_body)):
+        if limit is None:
+            yield from _box(name, body.decode('utf-8'))
+        else:
+            text, note = _collapsed(body, key, limit)
+            yield from _box(name, text, note)
+    yield PAGE_TAIL.encode('utf-8')
+
+
+class RawViewCache:
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.key = None
+        self.chunks = None
+
+    def version(self):
+        return (self.store.versions['cards'], self.store.versions['relationships'])
+
+    def chunks_for(self, key):
+        with self.lock:
+            return self.chunks if self.key == key else None
+
+    def stream(self):
+        # Yields chunks, from the cache if the data hasn't changed, otherwise
+        # rendering (and caching) while the caller writes them out
+        key = self.version()
+        cached = self.chunks_for(key)
+        if cached is not None:
+            yield from cached
+            return
+        rendered = []
+        for chunk in render(self.store):
+            rendered.append(chunk)
+            yield chunk
+        with self.lock:
+            self.key, self.chunks = key, rendered
@@ -0,0 +1,292 @@
+
+import bisect
+import json
+import math
+import os
+import re
+import sys
+import threading
+
+from card_graph import BASE_DIR, CARDS_FILE, load_graph
+
+# Inverted full-text index over the cards, with BM25 ranking.
+#
+# Indexed per card: title, description, id tokens (split on '_') and media
+# names (media, video, web and image file names). Postings keep term
+# positions so quoted phrases can be matched; a trailing '*' makes a term a
+# prefix match. All terms/phrases in a query must match.
+#
+#   index = SearchIndex.load_or_build(graph)
+#   index.search('azure sec*')            -> [(score, card_id), ...]
+#   index.search('"data warehouse" etl')
+#
+# The server keeps one instance in memory and updates it per saved card;
+# scripts load it from INDEX_FILE, which is rebuilt when cards.json changes.
+
+INDEX_FILE = os.path.join(BASE_DIR, 'search_index.json')
+
+# Term-frequency weight per field
+FIELD_WEIGHTS = (('title', 3.0), ('id', 2.0), ('media', 1.5), ('description', 1.0))
+# Position gap between fields so phrases never span two fields
+FIELD_GAP = 1000
+
+K1 = 1.2
+B = 0.75
+
+TOKEN_RE = re.compile(r"[a-z0-9#+]+")
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def media_names(card):
+    names = []
+    media = card.get('media') or []
+    if isinstance(media, str):
+        media = [media]
+    for value in list(media) + [card.get('video'), card.get('web')]:
+        if value:
+            names.append(os.path.basename(str(value).replace('\\', '/')))
+    images = card.get('displayImages') or {}
+    if isinstance(images, dict):
+        for slot in images.values():
+            if isinstance(slot, dict) and slot.get('url'):
+                names.append(os.path.basename(slot['url']))
+    return ' '.join(names)
+
+
+def card_fields(card):
+    return {
+        'title': card.get('title', ''),
+        'id': str(card.get('id', '')).replace('_', ' '),
+        'media': media_names(card),
+        'description': card.get('description', ''),
+    }
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {}   # term -> {card_id: [weighted tf, [positions]]}
+        self.doc_len = {}    # card_id -> weighted length
+        self.doc_terms = {}  # card_id -> set of terms (for removal)
+        self.total_len = 0.0
+        self._vocab = None   # sorted terms, rebuilt lazily for prefix lookups
+
+    @classmethod
+    def build(cls, graph):
+        index = cls()
+        for card in graph.cards.values():
+            index.add(card.data)
+        return index
+
+    # --- Updates ---
+
+    def add(self, card):
+        fields = card_fields(card)
+        self.add_document(card['id'], [(fields[field], weight) for field, weight in FIELD_WEIGHTS])
+
+    def add_document(self, card_id, fields):
+        # fields: [(text, weight)]; other documents than cards (pdf_ingest.py)
+        # are indexed the same way, under their own ids
+        if card_id in self.doc_len:
+            self.remove(card_id)
+
+        pos = 0
+        length = 0.0
+        terms = set()
+        for text, weight in fields:
+            for token in tokenize(text):
+                entry = self.postings.setdefault(token, {}).setdefault(card_id, [0.0, []])
+                entry[0] += weight
+                entry[1].append(pos)
+                length += weight
+                terms.add(token)
+                pos += 1
+            pos += FIELD_GAP
+
+        self.doc_len[card_id] = length
+        self.doc_terms[card_id] = terms
+        self.total_len += length
+        self._vocab = None
+
+    def remove(self, card_id):
+        if card_id not in self.doc_len:
+            return
+        for term in self.doc_terms.pop(card_id):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(card_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(card_id)
+        self._vocab = None
+
+    # --- Queries ---
+
+    def expand(self, term):
+        if not term.endswith('*'):
+            return [term] if term in self.postings else []
+        stem = term[:-1]
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        lo = bisect.bisect_left(self._vocab, stem)
+        hi = bisect.bisect_left(self._vocab, stem + '\uffff')
+        return self._vocab[lo:hi]
+
+    def _idf(self, term):
+        n = len(self.doc_len)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _bm25(self, term, card_id):
+        tf = self.postings[term][card_id][0]
+        avgdl = self.total_len / len(self.doc_len) if self.doc_len else 1.0
+        norm = K1 * (1 - B + B * self.doc_len[card_id] / avgdl)
+        return self._idf(term) * tf * (K1 + 1) / (tf + norm)
+
+    def _phrase_docs(self, words):
+        terms = [t for w in words for t in tokenize(w)]
+        if not terms or any(t not in self.postings for t in terms):
+            return {}, terms
+        docs = set(self.postings[terms[0]])
+        for t in terms[1:]:
+            docs &= set(self.postings[t])
+        matched = {}
+        for card_id in docs:
+            later = [set(self.postings[t][card_id][1]) for t in terms[1:]]
+            if any(all(p + i + 1 in later[i] for i in range(len(later)))
+                   for p in self.postings[terms[0]][card_id][1]):
+                matched[card_id] = True
+        return matched, terms
+
+    def search(self, query, limit=20, prefix=False):
+        clauses = []
+        for phrase, word in QUERY_RE.findall(query or ''):
+            if phrase:
+                clauses.append(('phrase', phrase.split()))
+            else:
+                for token in tokenize(word.rstrip('*')):
+                    star = word.endswith('*') or prefix
+                    clauses.append(('term', token + ('*' if star else '')))
+        if not clauses:
+            return []
+
+        scores = None
+        for kind, value in clauses:
+            clause_scores = {}
+            if kind == 'term':
+                for term in self.expand(value):
+                    for card_id in self.postings[term]:
+                        clause_scores[card_id] = clause_scores.get(card_id, 0.0) + self._bm25(term, card_id)
+            else:
+                matched, terms = self._phrase_docs(value)
+                for card_id in matched:
+                    clause_scores[card_id] = sum(self._bm25(t, card_id) for t in terms)
+            if scores is None:
+                scores = clause_scores
+            else:
+                scores = {cid: s + clause_scores[cid] for cid, s in scores.items() if cid in clause_scores}
+            if not scores:
+                return []
+
+        ranked = sorted(((s, cid) for cid, s in scores.items()), key=lambda x: (-x[0], x[1]))
+        return ranked[:limit]
+
+    # --- Persistence ---
+
+    def save(self, path=INDEX_FILE, stamp=None):
+        data = {
+            "stamp": stamp,
+            "doc_len": self.doc_len,
+            "postings": self.postings,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls()
+        index.postings = data['postings']
+        index.doc_len = data['doc_len']
+        index.total_len = sum(index.doc_len.values())
+        for term, docs in index.postings.items():
+            for card_id in docs:
+                index.doc_terms.setdefault(card_id, set()).add(term)
+        return index, data.get('stamp')
+
+    @classmethod
+    def load_or_build(cls, graph=None, cards_file=CARDS_FILE, path=INDEX_FILE):
+        # Reuse the saved index if cards.json hasn't changed since it was built
+        stamp = file_stamp(cards_file)
+        if stamp is not None and os.path.exists(path):
+            try:
+                index, saved = cls.load(path)
+                if saved == stamp:
+                    return index
+            except (ValueError, KeyError):
+                pass
+        if graph is None:
+            graph = load_graph(cards_file, None)
+        index = cls.build(graph)
+        try:
+            index.save(path, stamp)
+        except OSError as e:
+            print(f"Could not save search index: {e}")
+        return index
+
+
+class SearchCache:
+    # Keeps a SearchIndex in step with a CardStore. Before each search the
+    # cards changed since the index was last synced are re-indexed (or
+    # dropped); a whole-document save rebuilds it.
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        with store.lock:
+            self.index = SearchIndex.build(store.graph)
+            self.version = store.versions['cards']
+
+    def sync(self):
+        store = self.store
+        with store.lock:
+            current = store.versions['cards']
+            if current == self.version:
+                return
+            changed = store.changed_cards(self.version)
+            if changed is None:
+                self.index = SearchIndex.build(store.graph)
+            else:
+                for card_id in changed:
+                    card = store.graph.get(card_id)
+                    if card is None:
+                        self.index.remove(card_id)
+                    else:
+                        self.index.add(card.data)
+            self.version = current
+
+    def search(self, query, limit=20, prefix=False):
+        with self.lock:
+            self.sync()
+            return self.index.search(query, limit, prefix)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print('Usage: python search_index.py <query>   (e.g. azure sec*  or  "data warehouse")')
+    else:
+        graph = load_graph(CARDS_FILE, None)
+        index = SearchIndex.load_or_build(graph)
+        for score, card_id in index.search(' '.join(sys.argv[1:])):
+            print(f"{score:6.2f}  {card_id:<45} {graph.cards[card_id].title}")
@@ -1,22 +1,752 @@
+import contextlib
 import http.server
-import socketserver
 import json
 import os
 import datetime
+import email.utils
+import hashlib
+import signal
+import sys
+import threading
+import time
+import urllib.parse
 
-import html
+from card_graph import unwrap
+from card_hierarchy import HierarchyCache
+from change_feed import ChangeFeed
+from graph_layout import LayoutCache
+from graph_stats import ATTRS, StatsCache
+from card_history import History, ops_touched
+from card_merge import CARD_OPS, MergeConflict, merge_cards, merge_relationships, rebase_ops
+from card_query import MAX_LIMIT, CardIndex, parse_query, project
+from card_store import SERVER_PID_FILE, CardStore, StoreError
+from card_validation import ValidationFailed, errors, validate, validate_ops
+from pdf_ingest import PdfCache
+from raw_view import RawViewCache, render
+from search_index import SearchCache
+import server_metrics
+from server_metrics import Gauge
+from trails import TrailCache
 
 PORT = 8002
 
+# What to do when an edit or save breaks a validation rule (card_validation.py):
+#   'flag'   save it and list the issues in the response
+#   'reject' refuse it with 422 if any rule with severity 'error' fails
+VALIDATION = 'flag'
+
+# /debug/profile and /debug/tracemalloc are only served when this is on
+# (python server.py --profiling); /metrics is always on
+PROFILING = False
+
+# In-memory graph + change journal, loaded once at startup. All reads and
+# writes of cards.json / relationships.json go through it.
+STORE = None
+
+# raw_data.html, rendered on first request after the data changes
+RAW_VIEW = None
+
+# Pathfinder trail membership, recomputed only when it can have changed
+TRAILS = None
+
+# Full-text index over the cards, updated per edited card
+SEARCH = None
+
+# Depth / subtree / component / hub numbers per relationship type, updated
+# per changed component
+STATS = None
+
+# Server-computed node positions for card_manager.html's graph, kept up to
+# date by a background thread; after a change only the new nodes are placed
+LAYOUT = None
+
+# 'contains' hierarchies for the radar / sunburst views, per request, until
+# the data changes
+HIERARCHY = None
+
+# Search over the pdf/ library's text (python pdf_ingest.py extracts it),
+# reloaded after each ingest
+PDFS = None
+
+# Delta version history (history/), one version per edit batch or save
+HISTORY = None
+
+# Live feed of those versions for /api/changes
+FEED = None
+
+# Idle SSE streams get a comment line this often, so proxies and clients can
+# tell the connection is alive; long-polls wait at most MAX_POLL_WAIT
+KEEPALIVE_SECONDS = 15
+MAX_POLL_WAIT = 60
+
+Gauge('cardnexus_cards', 'Cards in the store', read=lambda: len(STORE.graph.cards) if STORE else None)
+Gauge('cardnexus_relationships', 'Relationships in the store', read=lambda: len(STORE.graph.edges) if STORE else None)
+Gauge('cardnexus_journal_pending_ops', 'Journalled ops not yet compacted into the files',
+      read=lambda: STORE.pending if STORE else None)
+
+# Distinguishes ETags across restarts (store versions restart at 0)
+BOOT_ID = format(int(time.time()), 'x')
+
+# Files the front-ends revalidate instead of cache-busting
+DATA_FILES = {'/cards.json', '/relationships.json', '/pathfinder_config.json'}
+STORE_FILES = {'/cards.json': 'cards', '/relationships.json': 'relationships'}
+
+# path -> (mtime_ns, size, etag, body)
+_file_cache = {}
+_file_cache_lock = threading.Lock()
+
+def record_version(note, touched=None):
+    # Call with STORE.lock held, right after the change
+    FEED.publish(HISTORY.record(STORE.graph, touched, note))
+    LAYOUT.refresh()
+
+def base_state(revision):
+    # The history State a client's edit was based on
+    try:
+        return HISTORY.state_at(int(revision))
+    except (KeyError, ValueError, TypeError):
+        raise StoreError(f"Unknown base revision: {revision}")
+
+def base_revision(value):
+    # X-Base-Revision of an edit: a history version the server has reached
+    try:
+        revision = int(value)
+    except (TypeError, ValueError):
+        raise StoreError(f"Invalid base revision: {value}")
+    if revision < 0 or revision > HISTORY.head:
+        raise StoreError(f"Unknown base revision: {value}")
+    return revision
+
+def check_edit(graph, ops, issues):
+    # Runs inside CardStore.apply: only the cards/edges in the batch are checked
+    issues.extend(validate_ops(graph, ops))
+    if VALIDATION == 'reject' and errors(issues):
+        raise ValidationFailed(issues)
+
+def validate_graph(graph):
+    # Full report for /api/validate (cached per data version)
+    issues = validate(graph.cards_document()['cards'], graph.relationships_document()['relationships'])
+    return {"errors": len(errors(issues)), "warnings": len(issues) - len(errors(issues)), "issues": issues}
+
+def read_versioned(filename):
+    # Returns (body, etag, mtime) for a file, re-reading it only when its
+    # mtime or size changes. The ETag is a content hash, so it is strong.
+    st = os.stat(filename)
+    with _file_cache_lock:
+        cached = _file_cache.get(filename)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[3], cached[2], st.st_mtime
+    with open(filename, 'rb') as f:
+        body = f.read()
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    with _file_cache_lock:
+        _file_cache[filename] = (st.st_mtime_ns, st.st_size, etag, body)
+    return body, etag, st.st_mtime
+
+class CountingWriter:
+    # Wraps the response stream to count the bytes written
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def write(self, data):
+        self.count += len(data)
+        return self.raw.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
 class CardHandler(http.server.SimpleHTTPRequestHandler):
+    # HTTP/1.1 so browsers can reuse the connection (every response must
+    # carry a Content-Length)
+    protocol_version = 'HTTP/1.1'
+
+    # --- Instrumentation ---
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+
+    def handle_one_request(self):
+        # Timed from the parsed request line, so the wait for the next
+        # request on a kept-alive connection isn't counted
+        self.request_start = None
+        self.status = None
+        self.wfile.count = 0
+        super().handle_one_request()
+        if self.request_start is not None:
+            self.record_request()
+
+    def parse_request(self):
+        self.request_start = time.perf_counter()
+        server_metrics.IN_FLIGHT.inc()
+        return super().parse_request()
+
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+
+    def record_request(self):
+        server_metrics.IN_FLIGHT.dec()
+        route = server_metrics.route_of(urllib.parse.urlsplit(getattr(self, 'path', '')).path, self.status)
+        method = server_metrics.method_of(self.command)
+        server_metrics.REQUESTS.labels(route=route, method=method).observe(time.perf_counter() - self.request_start)
+        server_metrics.RESPONSES.labels(route=route, method=method, status=self.status or 0).inc()
+        server_metrics.RESPONSE_BYTES.labels(route=route, method=method).inc(self.wfile.count)
+        headers = getattr(self, 'headers', None)
+        try:
+            received = int(headers.get('Content-Length') or 0) if headers else 0
+        except ValueError:
+            received = 0
+        server_metrics.REQUEST_BYTES.labels(route=route, method=method).inc(received)
+
+    # --- Reads ---
+
     def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path in STORE_FILES:
+            # Served from the store, so journalled edits are visible before
+            # the file on disk is compacted
+            with STORE.lock:
+                body, version, modified = STORE.document(STORE_FILES[path])
+                change_version = HISTORY.head
+            etag = f'"{STORE_FILES[path]}-{BOOT_ID}-{version}"'
+            # The /api/changes cursor this body corresponds to
+            self.send_versioned(body, etag, modified, {'X-Change-Version': str(change_version)})
+            return
+        if path in DATA_FILES:
+            self.send_data_file(path.lstrip('/'))
+            return
+        if path == '/raw_data.html':
+            self.send_raw_view()
+            return
+        if path == '/api/trails' or path.startswith('/api/trails/'):
+            self.send_trails(urllib.parse.unquote(path[len('/api/trails/'):]) if path != '/api/trails' else None)
+            return
+        if path == '/api/history' or path.startswith('/api/history/'):
+            self.send_history(path[len('/api/history/'):] if path != '/api/history' else None)
+            return
+        if path == '/api/validate':
+            self.send_json(STORE.derived('validation', validate_graph))
+            return
+        if path == '/api/search':
+            self.send_search()
+            return
+        if path == '/api/changes':
+            self.send_changes()
+            return
+        if path == '/api/stats':
+            self.send_stats()
+            return
+        if path == '/api/layout':
+            self.send_layout()
+            return
+        if path == '/api/hierarchy':
+            self.send_hierarchy()
+            return
+        if path == '/api/pdfs':
+            self.send_pdfs()
+            return
+        if path == '/metrics':
+            self.send_text(server_metrics.render().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+            return
+        if path.startswith('/debug/'):
+            self.send_debug(path[len('/debug/'):])
+            return
+        if path == '/api/cards':
+            self.send_card_query()
+            return
+        if path.startswith('/api/cards/'):
+            card = STORE.graph.get(urllib.parse.unquote(path[len('/api/cards/'):]))
+            if card is None:
+                self.send_error(404, "Card not found")
+            else:
+                self.send_json(card.data)
+            return
         super().do_GET()
 
+    def send_data_file(self, filename):
+        try:
+            body, etag, mtime = read_versioned(filename)
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        self.send_versioned(body, etag, mtime)
+
+    def send_card_query(self):
+        # /api/cards?type=&stack=&deep=&prefix=&q=&unconnected=&fields=&limit=&cursor=
+        try:
+            params = parse_query(urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query))
+        except ValueError:
+            self.send_error(400, "limit must be an integer")
+            return
+        index = STORE.derived('card_index', CardIndex)
+        self.send_json(index.query(**params))
+
+    def send_debug(self, what):
+        # /debug/profile?seconds=5       collapsed stacks of all other threads
+        # /debug/tracemalloc?diff=1      top allocation sites (first call starts tracing)
+        if not PROFILING or what not in ('profile', 'tracemalloc'):
+            self.send_error(404, "Not Found")
+            return
+        params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        try:
+            if what == 'profile':
+                seconds = max(0.1, min(float(params.get('seconds', ['5'])[0]), 60))
+                samples, stacks = server_metrics.profile(seconds)
+                body = f"# {samples} samples over {seconds:g}s\n{stacks}"
+            else:
+                limit = max(1, min(int(params.get('limit', ['25'])[0]), 500))
+                body = server_metrics.tracemalloc_report(limit, params.get('diff', [''])[0] in ('1', 'true'))
+        except ValueError:
+            self.send_error(400, "seconds and limit must be numbers")
+            return
+        self.send_text(body.encode('utf-8'), 'text/plain; charset=utf-8')
+
+    def send_text(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_changes(self):
+        # /api/changes?since=<version>
+        #   Accept: text/event-stream  Server-Sent Events, one 'delta' event per
+        #                              history version (id = version, so
+        #                              EventSource resumes via Last-Event-ID)
+        #   otherwise                  long-poll: waits up to ?wait= seconds
+        #                              for versions after `since`, as JSON
+        # 'reset' (or "reset": true) means the cursor can't be served from
+        # deltas and the client should reload cards.json / relationships.json.
+        params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        # An EventSource reconnects to the same URL with Last-Event-ID set
+        since = self.headers.get('Last-Event-ID') or params.get('since', [''])[0]
+        try:
+            since = int(since) if since else None
+            wait = max(0.0, min(float(params.get('wait', ['25'])[0]), MAX_POLL_WAIT))
+        except ValueError:
+            self.send_error(400, "since and wait must be numbers")
+            return
+        if since is not None and since < 0:
+            self.send_error(400, "since must not be negative")
+            return
+        if 'text/event-stream' in (self.headers.get('Accept') or ''):
+            self.stream_changes(since)
+            return
+
+        if since is None:
+            self.send_json({"version": FEED.head, "changes": []})
+            return
+        events = FEED.since(since)
+        if events == [] and wait:
+            FEED.wait(since, wait)
+            events = FEED.since(since)
+        if events is None:
+            self.send_json({"version": FEED.head, "changes": [], "reset": True})
+        else:
+            self.send_json({"version": events[-1][0] if events else since,
+                            "changes": [{"version": v, "delta": d} for v, d in events]})
+
+    def stream_changes(self, since):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        # Open-ended body: the connection ends with the stream
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        version = FEED.head if since is None else since
+        try:
+            self.wfile.write(b'retry: 3000\n\n')
+            self.write_event('hello', {"version": FEED.head}, None)
+            while True:
+                events = FEED.since(version)
+                if events is None:
+                    self.write_event('reset', {"version": FEED.head}, FEED.head)
+                    return
+                for v, delta in events:
+                    self.write_event('delta', {"version": v, "delta": delta}, v)
+                    version = v
+                if not events and FEED.wait(version, KEEPALIVE_SECONDS) == version:
+                    self.wfile.write(b': keepalive\n\n')
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            pass
+
+    def write_event(self, event, data, event_id):
+        lines = [f"event: {event}"]
+        if event_id is not None:
+            lines.append(f"id: {event_id}")
+        lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+        self.wfile.write(('\n'.join(lines) + '\n\n').encode('utf-8'))
+
+    def send_history(self, what):
+        # /api/history                    list of versions
+        # /api/history/<version>          cards and relationships at that version
+        # /api/history/diff?from=&to=     structural diff between two versions
+        try:
+            if not what:
+                self.send_json({"head": HISTORY.head, "versions": HISTORY.log()})
+            elif what == 'diff':
+                params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+                a = int(params.get('from', [0])[0])
+                b = int(params.get('to', [HISTORY.head])[0])
+                self.send_json(HISTORY.diff(a, b))
+            else:
+                cards, rels = HISTORY.checkout(int(what))
+                self.send_json({"version": int(what), "cards": cards, "relationships": rels})
+        except ValueError:
+            self.send_error(400, "Versions must be integers")
+        except KeyError as e:
+            self.send_error(404, str(e))
+
+    def send_search(self):
+        # /api/search?q=&limit=&prefix=&fields=
+        # q: words (all must match), "quoted phrases", word* for prefixes
+        params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        q = params.get('q', [''])[0]
+        try:
+            limit = max(1, min(int(params.get('limit', ['20'])[0]), MAX_LIMIT))
+        except ValueError:
+            self.send_error(400, "limit must be an integer")
+            return
+        prefix = params.get('prefix', [''])[0] in ('1', 'true')
+        fields = [f for f in params.get('fields', ['id,title,type'])[0].split(',') if f]
+        results = []
+        for score, card_id in SEARCH.search(q, limit, prefix):
+            card = STORE.graph.get(card_id)
+            if card is not None:
+                results.append(dict(project(card, fields), score=round(score, 3)))
+        self.send_json({"query": q, "results": results, "count": len(results)})
+
+    def send_stats(self):
+        # /api/stats                              summary per relationship type
+        # /api/stats?id=<card>                    that node's numbers per type
+        # /api/stats?type=contains&sort=subtree   nodes ranked by one attribute (&limit=)
+        params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        card_id = params.get('id', [''])[0]
+        rtype = params.get('type', [''])[0]
+        attr = params.get('sort', [''])[0]
+        try:
+            limit = max(1, min(int(params.get('limit', ['20'])[0]), MAX_LIMIT))
+        except ValueError:
+            self.send_error(400, "limit must be an integer")
+            return
+        with STATS.lock:
+            stats = STATS.get()
+            vc, vr = STATS.version()
+            if card_id:
+                node = stats.node(card_id)
+                if node is None:
+                    self.send_error(404, "Card not found")
+                    return
+                result = {"id": card_id, "types": node}
+            elif attr:
+                if rtype not in stats.types or attr not in ATTRS:
+                    self.send_error(400, f"type must be one of {', '.join(stats.types)}; sort one of {', '.join(ATTRS)}")
+                    return
+                result = {"type": rtype, "sort": attr,
+                          "results": [{"id": cid, attr: value} for cid, value in stats.top(rtype, attr, limit)]}
+            else:
+                result = stats.summary()
+        etag = f'"stats-{BOOT_ID}-{vc}-{vr}"'
+        self.send_versioned(json.dumps(result).encode(), etag, max(STORE.modified.values()))
+
+    def send_layout(self):
+        # {"version": [cards, relationships], "width", "height", "positions": {id: [x, y]}}
+        # The last completed layout; after an edit it can be a version behind
+        # until the background run finishes, and its ETag says which it is
+        body, (vc, vr), modified = LAYOUT.get()
+        etag = f'"layout-{BOOT_ID}-{vc}-{vr}"'
+        self.send_versioned(body, etag, modified)
+
+    def send_hierarchy(self):
+        # /api/hierarchy                          every top-level node's tree
+        # /api/hierarchy?root=<id>&root=<id>      from these cards
+        # /api/hierarchy?trail=<id>               a pathfinder trail's seeds, within its cards
+        # &depth=N cuts the tree off N levels down; &format=compact for child-index arrays
+        params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        roots = params.get('root') or None
+        trail_id = params.get('trail', [''])[0]
+        encoding = params.get('format', ['nested'])[0]
+        if encoding not in ('nested', 'compact'):
+            self.send_error(400, "format must be nested or compact")
+            return
+        try:
+            depth = int(params['depth'][0]) if 'depth' in params else None
+        except ValueError:
+            self.send_error(400, "depth must be an integer")
+            return
+        if depth is not None and depth < 0:
+            self.send_error(400, "depth must not be negative")
+            return
+
+        whitelist = None
+        stamp = None
+        if trail_id:
+            trail = TRAILS.get(trail_id)
+            if trail is None:
+                self.send_error(404, "Trail not found")
+                return
+            roots = trail.get('seeds', [])
+            if trail.get('cards'):
+                whitelist = set(trail['cards']) | set(roots)
+            stamp, _ = TRAILS.version()
+        elif roots:
+            unknown = [r for r in roots if STORE.graph.get(r) is None and r not in STORE.graph.out.get('contains', {})]
+            if unknown:
+                self.send_error(404, f"Card not found: {', '.join(unknown)}")
+                return
+        body, (vc, vr) = HIERARCHY.get(roots, depth, whitelist, encoding)
+        etag = f'"hierarchy-{BOOT_ID}-{vc}-{vr}-{stamp[0] if stamp else 0}"'
+        self.send_versioned(body, etag, max(STORE.modified.values()))
+
+    def send_pdfs(self):
+        # /api/pdfs                       every ingested PDF and the cards it belongs to
+        # /api/pdfs?q=vector+data*        full-text search (same syntax as /api/search)
+        # /api/pdfs?card=<id>             that card's PDFs, or with q= searched within them
+        params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        q = params.get('q', [''])[0].strip()
+        card_id = params.get('card', [''])[0] or None
+        try:
+            limit = max(1, min(int(params.get('limit', ['20'])[0]), MAX_LIMIT))
+        except ValueError:
+            self.send_error(400, "limit must be an integer")
+            return
+        if card_id is not None and STORE.graph.get(card_id) is None:
+            self.send_error(404, "Card not found")
+            return
+        index, (manifest, mapping, version) = PDFS.get()
+        if q:
+            results = index.search(q, card_id, limit)
+        else:
+            pdfs = index.card_pdfs(card_id) if card_id else list(index.manifest)
+            results = [index.describe(pdf) for pdf in pdfs]
+        result = {"query": q, "card": card_id, "results": results, "count": len(results)}
+        etag = f'"pdfs-{BOOT_ID}-{version}-{manifest[0] if manifest else 0}-{mapping[0] if mapping else 0}"'
+        self.send_versioned(json.dumps(result).encode(), etag, max(STORE.modified.values()))
+
+    def send_trails(self, trail_id):
+        if trail_id:
+            result = TRAILS.get(trail_id)
+            if result is None:
+                self.send_error(404, "Trail not found")
+                return
+        else:
+            result = {"trails": TRAILS.all()}
+        stamp, version = TRAILS.version()
+        etag = f'"trails-{BOOT_ID}-{stamp[0] if stamp else 0}-{version}"'
+        self.send_versioned(json.dumps(result).encode(), etag, STORE.modified['relationships'])
+
+    def send_raw_view(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        limit = query.get('limit', [None])[0]
+        if limit is not None:
+            # Collapsed view (first N items of each array); cheap, not cached
+            try:
+                chunks = render(STORE, max(int(limit), 0))
+            except ValueError:
+                self.send_error(400, "limit must be an integer")
+                return
+            self.send_chunked(chunks, 'text/html; charset=utf-8')
+            return
+
+        vc, vr = RAW_VIEW.version()
+        etag = f'"raw-{BOOT_ID}-{vc}-{vr}"'
+        if self.is_not_modified(etag, max(STORE.modified.values())):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        # A cache miss is rendered while it is sent, and timed
+        cached = RAW_VIEW.chunks_for((vc, vr)) is not None
+        with contextlib.nullcontext() if cached else server_metrics.RAW_VIEW_SECONDS.time():
+            self.send_chunked(RAW_VIEW.stream(), 'text/html; charset=utf-8', {'ETag': etag, 'Cache-Control': 'no-cache'})
+
+    def send_chunked(self, chunks, content_type, headers=None):
+        # Streams an iterable of byte chunks with chunked transfer encoding
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for chunk in chunks:
+            if chunk:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def send_versioned(self, body, etag, mtime, headers=None):
+        last_modified = email.utils.formatdate(mtime, usegmt=True)
+        if self.is_not_modified(etag, mtime):
+            self.send_response(304)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        # Always revalidate; unchanged files then cost a 304, not a re-download
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def is_not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(',')]
+            return etag in tags or '*' in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since.timestamp()
+        return False
+
+    def send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json_body(self):
+        content_length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(content_length) or b'null')
+
+    # --- Incremental edits ---
+    #
+    #   PUT    /api/cards/<id>       create or replace one card
+    #   PATCH  /api/cards/<id>       merge fields into one card
+    #   DELETE /api/cards/<id>       delete a card and its edges
+    #   POST   /api/relationships    add one edge
+    #   DELETE /api/relationships    remove one edge (edge in the body)
+    #   POST   /api/batch            {"ops": [...]} applied all-or-nothing
+
+    def do_PUT(self):
+        self.handle_edit()
+
+    def do_PATCH(self):
+        self.handle_edit()
+
+    def do_DELETE(self):
+        self.handle_edit()
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, PATCH, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match, X-Base-Revision')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def edit_ops(self, method, path, body):
+        # Every body except DELETE /api/cards/<id>'s (none) is a JSON object
+        if path.startswith('/api/cards/'):
+            card_id = urllib.parse.unquote(path[len('/api/cards/'):])
+            if method == 'DELETE':
+                return [{"op": "delete_card", "id": card_id}]
+            if method in ('PUT', 'PATCH') and not isinstance(body, dict):
+                raise StoreError("Expected a JSON object of card fields")
+            if method == 'PUT':
+                return [{"op": "put_card", "card": dict(body, id=card_id)}]
+            if method == 'PATCH':
+                return [{"op": "patch_card", "id": card_id, "fields": body}]
+        elif path == '/api/relationships':
+            if method in ('POST', 'DELETE') and not isinstance(body, dict):
+                raise StoreError("Expected a JSON object with the edge")
+            if method == 'POST':
+                return [{"op": "add_edge", "edge": body}]
+            if method == 'DELETE':
+                return [{"op": "remove_edge", "edge": body}]
+        elif path == '/api/batch' and method == 'POST':
+            if not isinstance(body, dict) or not isinstance(body.get('ops'), list):
+                raise StoreError('Expected a JSON object {"ops": [...]}')
+            return body['ops']
+        return None
+
+    def handle_edit(self):
+        path = urllib.parse.urlsplit(self.path).path
+        try:
+            body = self.read_json_body()
+        except ValueError as e:
+            self.send_error(400, f"Invalid JSON: {e}")
+            return
+
+        try:
+            ops = self.edit_ops(self.command, path, body)
+            if ops is None:
+                self.send_error(404, "Not Found")
+                return
+            issues = []
+            # The revision the client's copy was loaded at, for card edits
+            # that don't give their own "base"
+            base = self.headers.get('X-Base-Revision')
+            with STORE.lock:
+                if isinstance(ops, list):
+                    if base:
+                        base = base_revision(base)
+                        ops = [dict(op, base=op.get('base', base)) if isinstance(op, dict) and op.get('op') in CARD_OPS else op
+                               for op in ops]
+                    # Ops saved against an older revision are merged first
+                    ops = rebase_ops(ops, STORE.graph, base_state)
+                results = STORE.apply(ops, lambda graph, ops: check_edit(graph, ops, issues))
+                record_version(f"{self.command} {path}", ops_touched(ops))
+                revision = HISTORY.head
+        except ValidationFailed as e:
+            self.send_json({"status": "rejected", "issues": e.issues}, 422)
+            return
+        except MergeConflict as e:
+            self.send_conflict(e)
+            return
+        except (ValueError, TypeError) as e:
+            # StoreError (a ValueError) and bad shapes inside the ops
+            self.send_error(400, str(e))
+            return
+        except Exception as e:
+            self.send_error(500, str(e))
+            return
+
+        self.send_json({
+            "status": "success",
+            "applied": len(ops),
+            "results": results,
+            "issues": issues,
+            "versions": STORE.versions,
+            "revision": revision
+        })
+
+    def send_conflict(self, e):
+        # Nothing was applied; the client reloads and reapplies its edits
+        self.send_json({"status": "conflict", "revision": HISTORY.head, "conflicts": e.conflicts}, 409)
+
     def do_POST(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path.startswith('/api/'):
+            self.handle_edit()
+            return
+
         if self.path == '/save/cards':
             filename = 'cards.json'
+            key = 'cards'
         elif self.path == '/save/relationships':
             filename = 'relationships.json'
+            key = 'relationships'
         else:
             self.send_error(404, "Not Found")
             return
@@ -27,27 +757,52 @@ class CardHandler(http.server.SimpleHTTPRequestHandler):
         try:
             # Validate JSON before saving
             data = json.loads(post_data)
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            
-            # Regenerate raw view on save
-            generate_raw_view()
+
+            # Whole-document save: checked in full against the other document
+            start = time.perf_counter()
+            items = unwrap(data, key)
+            # The revision (X-Change-Version) the client's copy was loaded at;
+            # without it the save overwrites whatever is there
+            base = self.headers.get('X-Base-Revision')
+            with STORE.lock:
+                merged = bool(base) and base != str(HISTORY.head)
+                if merged and key == 'cards':
+                    items = merge_cards(base_state(base), STORE.graph, items)
+                elif merged:
+                    items = merge_relationships(base_state(base), STORE.graph, items)
+                if key == 'cards':
+                    issues = validate(items, STORE.graph.relationships_document()['relationships'])
+                else:
+                    issues = validate(STORE.graph.cards_document()['cards'], items)
+                if VALIDATION == 'reject' and errors(issues):
+                    self.send_json({"status": "rejected", "issues": issues}, 422)
+                    return
+
+                # Rebuild the in-memory indexes and journal the document; the
+                # file itself is rewritten (canonical form) in the background
+                STORE.replace(key, items)
+                record_version(f"save {filename}")
+                revision = HISTORY.head
+            server_metrics.SAVE_SECONDS.labels(kind=key).observe(time.perf_counter() - start)
 
             # Get details for feedback
             abs_path = os.path.abspath(filename)
             timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self.send_json({
                 "status": "success", 
                 "file": filename,
                 "path": abs_path,
-                "timestamp": timestamp
-            }).encode())
-            print(f"Saved {filename} at {timestamp}")
+                "timestamp": timestamp,
+                "issues": issues,
+                "revision": revision,
+                "merged": merged
+            })
+            print(f"Saved {filename} at {timestamp}" + (" (merged)" if merged else ""))
+        except MergeConflict as e:
+            self.send_conflict(e)
+        except StoreError as e:
+            self.send_error(400, str(e))
         except Exception as e:
             self.send_error(500, str(e))
 
@@ -55,61 +810,45 @@ class CardHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Origin', '*')
         super().end_headers()
 
-def generate_raw_view():
-    try:
-        try:
-            with open('cards.json', 'r', encoding='utf-8') as f:
-                cards_data = html.escape(f.read())
-        except Exception as e:
-            cards_data = f"Error reading cards.json: {e}"
+def stop_on_signal(signum, frame):
+    raise KeyboardInterrupt
+
 
+if __name__ == "__main__":
+    print(f"Starting Card Nexus Server...")
+    PROFILING = '--profiling' in sys.argv[1:]
+    STORE = CardStore('cards.json', 'relationships.json', 'changes.journal')
+    STORE.observer = server_metrics.observe_store
+    print(f"Loaded {len(STORE.graph.cards)} cards and {len(STORE.graph.edges)} relationships.")
+    RAW_VIEW = RawViewCache(STORE)
+    TRAILS = TrailCache(STORE, 'pathfinder_config.json')
+    SEARCH = SearchCache(STORE)
+    STATS = StatsCache(STORE)
+    LAYOUT = LayoutCache(STORE)
+    LAYOUT.start()
+    HIERARCHY = HierarchyCache(STORE)
+    PDFS = PdfCache(STORE)
+    HISTORY = History()
+    version = HISTORY.record(STORE.graph, note="server start")
+    FEED = ChangeFeed(HISTORY)
+    if version:
+        print(f"Recorded history version {version} (files changed outside the server).")
+    print(f"Open your browser to: http://localhost:{PORT}/card_manager.html")
+    print(f"Metrics: http://localhost:{PORT}/metrics" + (" (profiling endpoints under /debug/)" if PROFILING else ""))
+    print("Press Ctrl+C to stop.")
+
+    # One thread per connection so a slow client doesn't block everyone else
+    with http.server.ThreadingHTTPServer(("", PORT), CardHandler) as httpd:
+        # Tells scripts (bulk_link.py, image_build.py) to go through the API
+        with open(SERVER_PID_FILE, 'w', encoding='utf-8') as f:
+            f.write(str(os.getpid()))
+        # A plain kill stops it the same way as Ctrl+C
+        signal.signal(signal.SIGTERM, stop_on_signal)
         try:
-            with open('relationships.json', 'r', encoding='utf-8') as f:
-                relationships_data = html.escape(f.read())
-        except Exception as e:
-            relationships_data = f"Error reading relationships.json: {e}"
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Raw Data Viewer</title>
-            <style>
-                body {{ font-family: sans-serif; background-color: #0f172a; color: #f8fafc; padding: 20px; }}
-                h2 {{ color: #60a5fa; }}
-                textarea {{ width: 100%; height: 400px; background-color: #1e293b; color: #cbd5e1; border: 1px solid #334155; padding: 10px; font-family: monospace; }}
-                .container {{ display: flex; gap: 20px; flex-direction: column; }}
-                @media (min-width: 768px) {{ .container {{ flex-direction: row; }} .box {{ flex: 1; }} }}
-            </style>
-        </head>
-        <body>
-            <h1>Raw Data Viewer</h1>
-            <div class="container">
-                <div class="box">
-                    <h2>cards.json</h2>
-                    <textarea readonly>{cards_data}</textarea>
-                </div>
-                <div class="box">
-                    <h2>relationships.json</h2>
-                    <textarea readonly>{relationships_data}</textarea>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        with open('raw_data.html', 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        print("Generated raw_data.html")
-    except Exception as e:
-        print(f"Failed to generate raw_data.html: {e}")
-
-print(f"Starting Card Nexus Server...")
-generate_raw_view() # Generate on startup
-print(f"Open your browser to: http://localhost:{PORT}/card_manager.html")
-print("Press Ctrl+C to stop.")
-
-with socketserver.TCPServer(("", PORT), CardHandler) as httpd:
-    httpd.serve_forever()
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            # Saves are journalled already; this just brings the files up to date
+            STORE.compact()
+            print("Stopped.")
+        finally:
+            os.remove(SERVER_PID_FILE)
@@ -0,0 +1,337 @@
+
+import collections
+import linecache
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+# Instrumentation for server.py, exposed on /metrics in the Prometheus text
+# format, plus the opt-in /debug/profile and /debug/tracemalloc reports.
+#
+#   REQUESTS.labels(route='/api/cards', method='GET').observe(0.012)
+#   with SAVE_SECONDS.labels(kind='cards').time():
+#       ...
+#   render()  -> the /metrics body
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STARTED = time.time()
+
+METRICS = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.children = {}
+        METRICS.append(self)
+
+    def labels(self, **values):
+        key = tuple(str(values[n]) for n in self.labelnames)
+        with self.lock:
+            child = self.children.get(key)
+            if child is None:
+                child = self.children[key] = self._child()
+            return child
+
+    def _default(self):
+        # The unlabelled series
+        return self.labels()
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.children.items())
+        for key, child in items:
+            yield from child.samples(self.name, self.labelnames, key)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self.samples()
+
+
+class _Value:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+    def samples(self, name, labelnames, key):
+        yield f"{name}{_labels(labelnames, key)} {_number(self.value)}"
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), read=None):
+        # read: callable returning the current value, evaluated on scrape
+        super().__init__(name, help_text, labelnames)
+        self.read = read
+
+    def _child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def samples(self):
+        if self.read is not None:
+            value = self.read()
+            if value is not None:
+                yield f"{self.name} {_number(float(value))}"
+            return
+        yield from super().samples()
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        with self.lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self, name, labelnames, key):
+        with self.lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        running = 0
+        for bound, n in zip(self.buckets, counts):
+            running += n
+            yield f"{name}_bucket{_labels(labelnames, key, [('le', _number(float(bound)))])} {running}"
+        yield f"{name}_bucket{_labels(labelnames, key, [('le', '+Inf')])} {count}"
+        yield f"{name}_sum{_labels(labelnames, key)} {_number(total)}"
+        yield f"{name}_count{_labels(labelnames, key)} {count}"
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _child(self):
+        return _Histogram(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+def max_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def traced_memory():
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+
+# --- The server's metrics ---
+
+REQUESTS = Histogram('cardnexus_request_duration_seconds', 'Request latency by route',
+                     ('route', 'method'))
+RESPONSES = Counter('cardnexus_responses_total', 'Responses by route and status', ('route', 'method', 'status'))
+REQUEST_BYTES = Counter('cardnexus_request_bytes_total', 'Request body bytes received', ('route', 'method'))
+RESPONSE_BYTES = Counter('cardnexus_response_bytes_total', 'Response bytes sent, headers included',
+                         ('route', 'method'))
+IN_FLIGHT = Gauge('cardnexus_requests_in_flight', 'Requests being handled')
+IN_FLIGHT.set(0)
+STORE_SECONDS = Histogram('cardnexus_store_seconds',
+                          'CardStore work: compact (file writes) and serialize (JSON documents)',
+                          ('operation', 'kind'))
+SAVE_SECONDS = Histogram('cardnexus_save_seconds', 'Whole-document /save/* requests: validate, replace, record',
+                         ('kind',))
+RAW_VIEW_SECONDS = Histogram('cardnexus_raw_view_render_seconds', 'Full raw_data.html renders (cache misses)')
+Gauge('process_max_resident_memory_bytes', 'Peak resident set size', read=max_rss)
+Gauge('cardnexus_tracemalloc_traced_bytes', 'Memory traced by tracemalloc (while /debug/tracemalloc is on)',
+      read=traced_memory)
+Gauge('process_uptime_seconds', 'Seconds since the server started', read=lambda: round(time.time() - STARTED, 3))
+
+# Routes reported by name; anything else (404s included) is 'other', so
+# made-up paths can't add label sets. Everything outside /api/, /save/ and
+# /debug/ that is found is a static file.
+ROUTES = (
+    (re.compile(r'^/api/cards/.+'), '/api/cards/<id>'),
+    (re.compile(r'^/api/trails/.+'), '/api/trails/<id>'),
+    (re.compile(r'^/api/history/diff$'), '/api/history/diff'),
+    (re.compile(r'^/api/history/.+'), '/api/history/<version>'),
+)
+NAMED_ROUTES = frozenset((
+    '/api/cards', '/api/relationships', '/api/batch', '/api/search', '/api/stats', '/api/layout',
+    '/api/hierarchy', '/api/pdfs', '/api/changes', '/api/trails', '/api/history', '/api/validate',
+    '/save/cards', '/save/relationships', '/debug/profile', '/debug/tracemalloc', '/metrics',
+    '/cards.json', '/relationships.json', '/pathfinder_config.json', '/raw_data.html',
+))
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+
+def route_of(path, status=None):
+    if status == 404:
+        return 'other'
+    if path in NAMED_ROUTES:
+        return path
+    for pattern, name in ROUTES:
+        if pattern.match(path):
+            return name
+    if path.startswith(('/api/', '/save/', '/debug/')):
+        return 'other'
+    return 'static'
+
+
+def method_of(command):
+    return command if command in METHODS else 'other'
+
+
+def observe_store(operation, kind, seconds):
+    # CardStore.observer
+    STORE_SECONDS.labels(operation=operation, kind=kind).observe(seconds)
+
+
+def render():
+    lines = []
+    for metric in list(METRICS):
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- Profiling (opt-in) ---
+
+def profile(seconds, interval=0.005, skip=None):
+    # Sampling profiler: every `interval` the stacks of all other threads are
+    # read and counted. Returns collapsed stacks ("a;b;c count" per line,
+    # root first), the input format of flamegraph.pl / speedscope.
+    skip = skip if skip is not None else threading.get_ident()
+    stacks = collections.Counter()
+    deadline = time.perf_counter() + seconds
+    samples = 0
+    while time.perf_counter() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stacks[';'.join(reversed(names))] += 1
+        samples += 1
+        time.sleep(interval)
+    lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+    return samples, '\n'.join(lines) + '\n'
+
+
+_snapshot_lock = threading.Lock()
+_last_snapshot = None
+
+
+def tracemalloc_report(limit=25, diff=False):
+    # Starts tracing on first use; later calls list the biggest allocation
+    # sites, or with diff the growth since the previous call
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+        return "tracemalloc started; request again to see allocations.\n"
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, linecache.__file__),
+    ))
+    with _snapshot_lock:
+        previous, _last_snapshot = _last_snapshot, snapshot
+    if diff and previous is not None:
+        stats = snapshot.compare_to(previous, 'lineno')
+        title = f"Top {limit} allocation changes since the last snapshot"
+    else:
+        stats = snapshot.statistics('lineno')
+        title = f"Top {limit} allocation sites"
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [title, f"traced {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB", ""]
+    lines += [str(stat) for stat in stats[:limit]]
+    return '\n'.join(lines) + '\n'
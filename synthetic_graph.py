@@ -0,0 +1,151 @@
+
+import argparse
+import os
+import random
+import re
+from collections import deque
+
+from card_graph import save_json
+
+# Synthetic cards.json / relationships.json for benchmarks (benchmark.py).
+#
+# Cards look like the real catalogue: "<number>_<slug>" ids, short titles
+# drawn from the catalogue's vocabulary, descriptions, the displayImages /
+# web / video scaffolding and occasional media and PDF paths. Structure:
+#   - 'stack' roots, each with a 'contains' tree DEPTH levels deep whose
+#     nodes have 1 .. 2*FANOUT-1 children (FANOUT on average)
+#   - ORPHAN_RATIO of the cards with no parent at all
+#   - 'leads_to' cross links and 'show_media' links to media cards
+#   - LEGACY_RATIO of the edges written in the old source/target/value form,
+#     the rest as from/to/strength, plus a few exact duplicates
+#
+#   cards, rels = generate(10000)
+#   python synthetic_graph.py 10000 --out /tmp/synth
+
+WORDS = (
+    "aws cloud compute storage networking security identity analytics data "
+    "pipeline etl warehouse dashboard reporting kpi metrics governance compliance "
+    "gdpr iso risk audit strategy leadership management planning process change "
+    "stakeholder vendor procurement finance banking payment healthcare nhs patient "
+    "python sql plsql tsql java csharp api sdk git devops testing automation "
+    "machine learning ai agent model training deployment monitoring scaling "
+    "architecture diagram schema migration legacy modernisation integration "
+    "engineering project schedule critical path earned value oil gas"
+).split()
+
+TYPES = ('capability', 'capability', 'capability', 'generic', 'other')
+
+DEPTH = 4
+FANOUT = 6
+ORPHAN_RATIO = 0.05
+MEDIA_RATIO = 0.05
+CROSS_RATIO = 0.05
+LEGACY_RATIO = 0.2
+DUPLICATE_RATIO = 0.002
+
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+def make_card(rng, number, ctype):
+    words = rng.sample(WORDS, rng.randint(2, 5))
+    title = ' '.join(w.upper() if len(w) <= 3 else w.capitalize() for w in words)
+    card = {
+        "id": f"{number}_{slug(title)}",
+        "type": ctype,
+        "title": title,
+        "description": ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize() + '.',
+        "displayImages": {
+            "background": {"url": "", "alt": ""},
+            "front": {"url": "images/WaalBridgeIcon.png", "alt": "Cyber Icon"},
+            "thumbnail": {"url": "", "alt": ""},
+            "diagram": {"url": "", "alt": ""},
+        },
+        "assets": [],
+        "frontBackgroundColor": rng.choice(("lightblue", "slategray", "darkcyan", "darkgoldenrod")),
+        "web": "",
+        "video": "",
+    }
+    if ctype == 'media':
+        card["media"] = [f"images/{card['id']}.png"]
+    elif rng.random() < 0.1:
+        card["media"] = [f"pdf/{slug(title)}.pdf"]
+    return card
+
+
+def make_edge(rng, source, target, rtype, legacy_ratio):
+    if rng.random() < legacy_ratio:
+        return {"source": source, "target": target, "type": rtype, "value": 1}
+    return {"from": source, "to": target, "type": rtype, "strength": "1"}
+
+
+def generate(n_cards, depth=DEPTH, fanout=FANOUT, orphan_ratio=ORPHAN_RATIO, media_ratio=MEDIA_RATIO,
+             cross_ratio=CROSS_RATIO, legacy_ratio=LEGACY_RATIO, duplicate_ratio=DUPLICATE_RATIO, seed=0):
+    rng = random.Random(seed)
+    cards = []
+    rels = []
+
+    def new_card(ctype):
+        card = make_card(rng, 1000 + len(cards), ctype)
+        cards.append(card)
+        return card['id']
+
+    n_media = int(n_cards * media_ratio)
+    n_orphans = int(n_cards * orphan_ratio)
+    attached = n_cards - n_media - n_orphans
+
+    # Stacks with contains-trees until the attached cards run out
+    while len(cards) < attached:
+        queue = deque([(new_card('stack'), 0)])
+        while queue and len(cards) < attached:
+            node, level = queue.popleft()
+            if level >= depth:
+                continue
+            for _ in range(rng.randint(1, 2 * fanout - 1)):
+                if len(cards) >= attached:
+                    break
+                child = new_card(rng.choice(TYPES))
+                rels.append(make_edge(rng, node, child, 'contains', legacy_ratio))
+                queue.append((child, level + 1))
+
+    tree_ids = [c['id'] for c in cards]
+    for _ in range(n_media):
+        media = new_card('media')
+        rels.append(make_edge(rng, rng.choice(tree_ids), media, 'show_media', legacy_ratio))
+    for _ in range(n_orphans):
+        new_card(rng.choice(TYPES))
+
+    for _ in range(int(n_cards * cross_ratio)):
+        a, b = rng.sample(tree_ids, 2)
+        rels.append(make_edge(rng, a, b, 'leads_to', legacy_ratio))
+    for _ in range(int(len(rels) * duplicate_ratio)):
+        rels.append(dict(rng.choice(rels)))
+
+    return cards, rels
+
+
+def write(directory, cards, rels):
+    os.makedirs(directory, exist_ok=True)
+    cards_file = os.path.join(directory, 'cards.json')
+    rels_file = os.path.join(directory, 'relationships.json')
+    save_json(cards_file, {"cards": cards})
+    save_json(rels_file, {"relationships": rels})
+    return cards_file, rels_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic cards.json / relationships.json")
+    parser.add_argument('cards', type=int)
+    parser.add_argument('--out', required=True, help='directory to write into')
+    parser.add_argument('--depth', type=int, default=DEPTH)
+    parser.add_argument('--fanout', type=int, default=FANOUT)
+    parser.add_argument('--orphans', type=float, default=ORPHAN_RATIO, help='share of cards with no parent')
+    parser.add_argument('--legacy', type=float, default=LEGACY_RATIO, help='share of edges in source/target form')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cards, rels = generate(args.cards, args.depth, args.fanout, args.orphans,
+                           legacy_ratio=args.legacy, seed=args.seed)
+    paths = write(args.out, cards, rels)
+    print(f"Wrote {len(cards)} cards and {len(rels)} relationships to {', '.join(paths)}")
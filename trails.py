@@ -0,0 +1,104 @@
+
+import json
+import os
+import threading
+from collections import deque
+
+from card_graph import BASE_DIR, load_json
+
+# Pathfinder trail membership, computed on the server.
+#
+# Same rules as getNodesInTrail in nuts_and_bolts.html: breadth-first down
+# 'contains' from the trail's seeds, recording each node's depth. If the
+# trail has a non-empty 'cards' whitelist (seeds always included), nodes
+# outside it are neither returned nor traversed.
+#
+# Results are cached per trail. A trail is only recomputed when its own
+# definition in pathfinder_config.json changes, or when one of the nodes it
+# expanded has had its outgoing edges changed.
+
+CONFIG_FILE = os.path.join(BASE_DIR, 'pathfinder_config.json')
+
+
+def trail_nodes(graph, trail):
+    seeds = trail.get('seeds', [])
+    whitelist = None
+    if trail.get('cards'):
+        whitelist = set(trail['cards']) | set(seeds)
+
+    children = graph.out.get('contains', {})
+    visited = set()
+    queue = deque((sid, 0) for sid in seeds)
+    results = []
+    while queue:
+        node_id, depth = queue.popleft()
+        if node_id in visited:
+            continue
+        visited.add(node_id)
+        if whitelist is not None and node_id not in whitelist:
+            continue
+        results.append({"id": node_id, "depth": depth})
+        for child_id in children.get(node_id, []):
+            if child_id not in visited:
+                queue.append((child_id, depth + 1))
+    return results
+
+
+class TrailCache:
+    def __init__(self, store, config_file=CONFIG_FILE):
+        self.store = store
+        self.config_file = config_file
+        self.lock = threading.Lock()
+        self.config_stamp = None
+        self.trails = []
+        # trail id -> (definition, relationships version, expanded ids, nodes)
+        self.entries = {}
+
+    def _load_config(self):
+        try:
+            st = os.stat(self.config_file)
+        except OSError:
+            self.config_stamp, self.trails = None, []
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != self.config_stamp:
+            self.trails = load_json(self.config_file).get('trails', [])
+            self.config_stamp = stamp
+
+    def _nodes(self, trail):
+        store = self.store
+        version = store.versions['relationships']
+        definition = json.dumps(trail, sort_keys=True)
+        entry = self.entries.get(trail.get('id'))
+        if entry and entry[0] == definition:
+            if entry[1] == version:
+                return entry[3]
+            changed = store.changed_sources(entry[1])
+            if changed is not None and not (changed & entry[2]):
+                # None of the nodes this trail expanded changed; reuse it
+                self.entries[trail['id']] = (definition, version, entry[2], entry[3])
+                return entry[3]
+        with store.lock:
+            nodes = trail_nodes(store.graph, trail)
+        self.entries[trail.get('id')] = (definition, version, {n['id'] for n in nodes}, nodes)
+        return nodes
+
+    def version(self):
+        return (self.config_stamp, self.store.versions['relationships'])
+
+    def all(self):
+        with self.lock:
+            self._load_config()
+            known = {t.get('id') for t in self.trails}
+            for tid in list(self.entries):
+                if tid not in known:
+                    del self.entries[tid]
+            return [dict(t, nodes=self._nodes(t)) for t in self.trails]
+
+    def get(self, trail_id):
+        with self.lock:
+            self._load_config()
+            for t in self.trails:
+                if t.get('id') == trail_id:
+                    return dict(t, nodes=self._nodes(t))
+        return None
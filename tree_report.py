@@ -1,52 +1,255 @@
 
+import argparse
 import json
 import os
 
+from card_graph import load_graph
+
 # Define Paths
 CARDS_FILE = r'c:\PythonApplications\AI_Skillsweb\cards.json'
 RELS_FILE = r'c:\PythonApplications\AI_Skillsweb\relationships.json'
 OUTPUT_FILE = r'c:\PythonApplications\AI_Skillsweb\tree_view_report.txt'
 
-def load_json(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+FORMATS = {'text': '.txt', 'json': '.json', 'md': '.md'}
+
+# Writers buffer this much before each write to disk
+BUFFER_SIZE = 64 * 1024
+
+ENTER, EXIT = 'enter', 'exit'
+
+
+def walk(adj, root, max_depth=None):
+    # Depth-first walk of one tree with an explicit stack (no recursion, so
+    # depth is only limited by memory). Yields
+    #   (ENTER, node_id, depth, is_last, hidden, cycle)
+    #   (EXIT, node_id, depth)
+    # hidden: number of children not shown because of max_depth
+    # cycle:  node is already on the current path; it is not expanded
+    kids = adj.get(root, [])
+    hidden = len(kids) if max_depth == 0 else 0
+    yield ENTER, root, 0, True, hidden, False
+    stack = [[root, [] if hidden else kids, 0]]
+    path = {root}
+    while stack:
+        top = stack[-1]
+        node_id, children, i = top
+        if i == len(children):
+            stack.pop()
+            path.discard(node_id)
+            yield EXIT, node_id, len(stack)
+            continue
+        top[2] = i + 1
+        child = children[i]
+        depth = len(stack)
+        is_last = i == len(children) - 1
+        if child in path:
+            yield ENTER, child, depth, is_last, 0, True
+            yield EXIT, child, depth
+            continue
+        grand = adj.get(child, [])
+        hidden = len(grand) if max_depth is not None and depth >= max_depth else 0
+        yield ENTER, child, depth, is_last, hidden, False
+        stack.append([child, [] if hidden else grand, 0])
+        path.add(child)
+
+
+class BufferedOutput:
+    # Collects output pieces and writes them in large blocks
+    def __init__(self, path):
+        self.f = open(path, 'w', encoding='utf-8')
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.f.write(''.join(self.parts))
+        self.parts = []
+        self.size = 0
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+
+class TextWriter:
+    # The box-drawing report (tree_view_report.txt)
+    def __init__(self, out, cards_map):
+        self.out = out
+        self.cards_map = cards_map
+        self.lasts = []
+        self.sections = 0
+
+    def header(self, summary):
+        w = self.out.write
+        w("AI SKILLS WEB - TREE VIEW REPORT\n")
+        w("================================\n\n")
+        w(f"Total Unique IDs: {summary['total_ids']}\n")
+        w(f"Cards found in JSON: {summary['cards']}\n")
+        w(f"Missing Cards (in rels only): {summary['missing']}\n")
+        w(f"Hierarchy Roots: {summary['hierarchy_roots']}\n")
+        w(f"Orphan Roots (Cards with no parent and no children): {summary['orphan_roots']}\n\n")
+
+    def begin_section(self, section):
+        if self.sections:
+            self.out.write("\n")
+        self.sections += 1
+        self.section = section
+        self.out.write(f"{section['title']}\n{section['rule']}\n")
+        if not section['roots']:
+            self.out.write("(None)\n")
+
+    def enter(self, node_id, depth, is_last, hidden, cycle):
+        card = self.cards_map.get(node_id)
+        if card:
+            title = card.get('title', 'Unknown')
+            ctype = card.get('type', '?')
+            display_str = f"[{ctype}] {title} ({node_id})"
+        else:
+            display_str = f"[MISSING] {node_id}"
+        if hidden:
+            display_str += f" (+{hidden} hidden)"
+        if cycle:
+            display_str += " (cycle)"
+
+        # One "is last child" flag per ancestor decides each indent segment
+        del self.lasts[depth:]
+        prefix = ''.join("    " if last else "│   " for last in self.lasts)
+        connector = "└── " if is_last else "├── "
+        self.out.write(f"{prefix}{connector}{display_str}\n")
+        self.lasts.append(is_last)
+
+    def exit(self, node_id, depth):
+        pass
+
+    def end_root(self):
+        if self.section['gap']:
+            self.out.write("\n")
+
+    def end_section(self):
+        pass
+
+    def close(self):
+        self.out.close()
+
+
+class MarkdownWriter:
+    # Nested bullet lists, one per tree
+    def __init__(self, out, cards_map):
+        self.out = out
+        self.cards_map = cards_map
+
+    def header(self, summary):
+        w = self.out.write
+        w("# AI Skills Web - Tree View Report\n\n")
+        w(f"- Total unique IDs: {summary['total_ids']}\n")
+        w(f"- Cards found in JSON: {summary['cards']}\n")
+        w(f"- Missing cards (in rels only): {summary['missing']}\n")
+        w(f"- Hierarchy roots: {summary['hierarchy_roots']}\n")
+        w(f"- Orphan roots: {summary['orphan_roots']}\n\n")
+
+    def begin_section(self, section):
+        self.out.write(f"## {section['title'].capitalize()}\n\n")
+        if not section['roots']:
+            self.out.write("_(None)_\n\n")
+
+    def enter(self, node_id, depth, is_last, hidden, cycle):
+        card = self.cards_map.get(node_id)
+        if card:
+            text = f"**{card.get('title', 'Unknown')}** `{node_id}` _{card.get('type', '?')}_"
+        else:
+            text = f"`{node_id}` _(missing)_"
+        if hidden:
+            text += f" (+{hidden} hidden)"
+        if cycle:
+            text += " (cycle)"
+        self.out.write(f"{'  ' * depth}- {text}\n")
+
+    def exit(self, node_id, depth):
+        pass
+
+    def end_root(self):
+        self.out.write("\n")
 
-def generate_report():
+    def end_section(self):
+        pass
+
+    def close(self):
+        self.out.close()
+
+
+class JsonWriter:
+    # {"summary": {...}, "<section>": [node, ...], ...} where each node is
+    # {"id", "title", "type", ["missing"], ["hidden"], ["cycle"], "children": [...]},
+    # written as the walk goes rather than built in memory
+    def __init__(self, out, cards_map):
+        self.out = out
+        self.cards_map = cards_map
+        self.first = []
+
+    def header(self, summary):
+        self.out.write('{"summary": ' + json.dumps(summary))
+
+    def begin_section(self, section):
+        self.out.write(f', {json.dumps(section["key"])}: [')
+        self.first = [True]
+
+    def enter(self, node_id, depth, is_last, hidden, cycle):
+        if not self.first[-1]:
+            self.out.write(',')
+        self.first[-1] = False
+        self.first.append(True)
+
+        card = self.cards_map.get(node_id)
+        node = {"id": node_id}
+        if card:
+            node["title"] = card.get('title', 'Unknown')
+            node["type"] = card.get('type', '?')
+        else:
+            node["missing"] = True
+        if hidden:
+            node["hidden"] = hidden
+        if cycle:
+            node["cycle"] = True
+        self.out.write(json.dumps(node)[:-1] + ', "children": [')
+
+    def exit(self, node_id, depth):
+        self.first.pop()
+        self.out.write(']}')
+
+    def end_root(self):
+        pass
+
+    def end_section(self):
+        self.out.write(']')
+
+    def close(self):
+        self.out.write('}\n')
+        self.out.close()
+
+
+WRITERS = {'text': TextWriter, 'json': JsonWriter, 'md': MarkdownWriter}
+
+
+def generate_report(formats=('text',), max_depth=None, roots=None):
     print(f"Loading data from {CARDS_FILE} and {RELS_FILE}...")
-    
+
     try:
-        cards_data = load_json(CARDS_FILE)
-        rels_data = load_json(RELS_FILE)
+        graph = load_graph(CARDS_FILE, RELS_FILE)
     except Exception as e:
         print(f"Error loading files: {e}")
         return
 
-    # Handle potentially wrapped JSON structure
-    cards_list = cards_data.get('cards', cards_data) if isinstance(cards_data, dict) else cards_data
-    rels_list = rels_data.get('relationships', rels_data) if isinstance(rels_data, dict) else rels_data
-
-    # Map ID -> Card
-    cards_map = {c['id']: c for c in cards_list}
+    cards_map = graph.cards
     print(f"Loaded {len(cards_map)} cards from cards.json.")
 
-    # Build Adjacency Map (Parent -> Children) and Parent Tracking
-    adj = {}
-    has_parent = set()
-    all_involved_ids = set(cards_map.keys())
-
-    for r in rels_list:
-        if r.get('type') == 'contains':
-            src = r.get('source') or r.get('from')
-            tgt = r.get('target') or r.get('to')
-            
-            if src and tgt:
-                all_involved_ids.add(src)
-                all_involved_ids.add(tgt)
-                
-                if src not in adj:
-                    adj[src] = []
-                adj[src].append(tgt)
-                has_parent.add(tgt)
+    # Parent -> Children comes straight from the graph's 'contains' adjacency
+    adj = {pid: sorted(kids) for pid, kids in graph.out['contains'].items()}
+    all_involved_ids = graph.all_ids('contains')
 
     print(f"Total involved distinct IDs (Cards + Relationships): {len(all_involved_ids)}")
 
@@ -55,17 +258,17 @@ def generate_report():
     orphan_roots = []
 
     for cid in all_involved_ids:
-        if cid not in has_parent:
+        if not graph.has_parent(cid):
             # Determine if it's a "Stack" root or regular "Orphan" root
             # Heuristics:
             # 1. Type is 'stack'
             # 2. ID contains 'stack'
             # 3. Has children (a root with children is essentially a stack/tree root)
             # 4. ID starts with known prefixes like '00'
-            
+
             card = cards_map.get(cid)
             ctype = card.get('type', 'unknown').lower() if card else 'unknown'
-            
+
             is_stack_like = False
             if ctype == 'stack':
                 is_stack_like = True
@@ -74,7 +277,7 @@ def generate_report():
             elif cid in adj and len(adj[cid]) > 0:
                 # If it's a root and has children, treat it as a Hierarchy Root
                 is_stack_like = True
-            
+
             if is_stack_like:
                 hierarchy_roots.append(cid)
             else:
@@ -83,59 +286,64 @@ def generate_report():
     hierarchy_roots.sort()
     orphan_roots.sort()
 
-    # Sort children for consistent output
-    for pid in adj:
-        adj[pid].sort()
-
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        f.write("AI SKILLS WEB - TREE VIEW REPORT\n")
-        f.write("================================\n\n")
-
-        f.write(f"Total Unique IDs: {len(all_involved_ids)}\n")
-        f.write(f"Cards found in JSON: {len(cards_map)}\n")
-        f.write(f"Missing Cards (in rels only): {len(all_involved_ids) - len(cards_map)}\n")
-        f.write(f"Hierarchy Roots: {len(hierarchy_roots)}\n")
-        f.write(f"Orphan Roots (Cards with no parent and no children): {len(orphan_roots)}\n\n")
-
-        def print_tree(node_id, prefix="", is_last=True):
-            card = cards_map.get(node_id)
-            if card:
-                title = card.get('title', 'Unknown')
-                ctype = card.get('type', '?')
-                display_str = f"[{ctype}] {title} ({node_id})"
-            else:
-                display_str = f"[MISSING] {node_id}"
-            
-            connector = "└── " if is_last else "├── "
-            f.write(f"{prefix}{connector}{display_str}\n")
-            
-            children = adj.get(node_id, [])
-            count = len(children)
-            
-            new_prefix = prefix + ("    " if is_last else "│   ")
-            
-            for i, child_id in enumerate(children):
-                is_last_child = (i == count - 1)
-                print_tree(child_id, new_prefix, is_last_child)
-
-        f.write("HIERARCHY TREES (Roots with Children or declared Stacks)\n")
-        f.write("------------------------------------------------------\n")
-        if not hierarchy_roots:
-            f.write("(None)\n")
-        
-        for root in hierarchy_roots:
-            print_tree(root, "", True)
-            f.write("\n")
-
-        f.write("\nORPHANS (Isolated Cards)\n")
-        f.write("------------------------\n")
-        if not orphan_roots:
-            f.write("(None)\n")
-
-        for root in orphan_roots:
-            print_tree(root, "", True)
-
-    print(f"Report generated at: {OUTPUT_FILE}")
+    summary = {
+        "total_ids": len(all_involved_ids),
+        "cards": len(cards_map),
+        "missing": len(all_involved_ids) - len(cards_map),
+        "hierarchy_roots": len(hierarchy_roots),
+        "orphan_roots": len(orphan_roots),
+    }
+
+    if roots:
+        # Subtree selection: only the requested trees
+        sections = [{"key": "subtrees", "title": "SELECTED SUBTREES",
+                     "rule": "-----------------", "roots": list(roots), "gap": True}]
+    else:
+        sections = [
+            {"key": "hierarchy", "title": "HIERARCHY TREES (Roots with Children or declared Stacks)",
+             "rule": "------------------------------------------------------", "roots": hierarchy_roots, "gap": True},
+            {"key": "orphans", "title": "ORPHANS (Isolated Cards)",
+             "rule": "------------------------", "roots": orphan_roots, "gap": False},
+        ]
+
+    base = os.path.splitext(OUTPUT_FILE)[0]
+    paths = {fmt: base + FORMATS[fmt] for fmt in formats}
+    writers = [WRITERS[fmt](BufferedOutput(paths[fmt]), cards_map) for fmt in formats]
+
+    # One traversal feeds every writer
+    for writer in writers:
+        writer.header(summary)
+    for section in sections:
+        for writer in writers:
+            writer.begin_section(section)
+        for root in section['roots']:
+            for event in walk(adj, root, max_depth):
+                if event[0] == ENTER:
+                    for writer in writers:
+                        writer.enter(*event[1:])
+                else:
+                    for writer in writers:
+                        writer.exit(*event[1:])
+            for writer in writers:
+                writer.end_root()
+        for writer in writers:
+            writer.end_section()
+    for writer in writers:
+        writer.close()
+
+    for fmt in formats:
+        print(f"Report generated at: {paths[fmt]}")
+
 
 if __name__ == "__main__":
-    generate_report()
+    parser = argparse.ArgumentParser(description="Tree view report of the 'contains' hierarchy")
+    parser.add_argument('--format', action='append', choices=sorted(FORMATS) + ['all'],
+                        help='text (default), json, md or all; may be repeated')
+    parser.add_argument('--depth', type=int, default=None, help='only show this many levels below each root')
+    parser.add_argument('--root', action='append', help='report only the subtree under this id; may be repeated')
+    args = parser.parse_args()
+
+    formats = args.format or ['text']
+    if 'all' in formats:
+        formats = list(FORMATS)
+    generate_report(list(dict.fromkeys(formats)), args.depth, args.root)
@@ -1,7 +1,8 @@
 
 import json
 import os
-from collections import Counter
+
+from card_validation import validate
 
 cards_path = r'c:\PythonApplications\ai_skillsweb\cards.json'
 
@@ -20,25 +21,18 @@ try:
         cards = data['cards']
         print(f"Card count: {len(cards)}")
         
-        ids = [str(c.get('id', 'MISSING_ID')) for c in cards]
-        
-        # Check for duplicates
-        counts = Counter(ids)
-        dups = [id for id, count in counts.items() if count > 1]
+        # Duplicate ids and missing id/title/type, via the shared rules
+        issues = validate(cards, [], rules=('duplicate_card_id', 'required_fields'))
+        dups = sorted({i['target'] for i in issues if i['rule'] == 'duplicate_card_id'})
         
         if dups:
             print(f"ERROR: Duplicate IDs found: {dups}")
         else:
             print("No duplicate IDs found.")
             
-        # Check for missing titles or types
-        for i, c in enumerate(cards):
-            if 'id' not in c:
-                print(f"Card at index {i} missing 'id'")
-            if 'title' not in c:
-                print(f"Card {c.get('id')} missing 'title'")
-            if 'type' not in c:
-                print(f"Card {c.get('id')} missing 'type'")
+        for issue in issues:
+            if issue['rule'] == 'required_fields':
+                print(f"Card {issue['target']} {issue['message']}")
 
 except json.JSONDecodeError as e:
     print(f"JSON Syntax Error: {e}")
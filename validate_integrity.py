@@ -1,7 +1,7 @@
-
-import json
 import os
-from collections import Counter
+
+from card_graph import load_json, unwrap
+from card_validation import RULES, errors, print_report, validate
 
 cards_path = r'c:\PythonApplications\ai_skillsweb\cards.json'
 rels_path = r'c:\PythonApplications\ai_skillsweb\relationships.json'
@@ -9,36 +9,19 @@ rels_path = r'c:\PythonApplications\ai_skillsweb\relationships.json'
 print(f"Validating integrity between {cards_path} and {rels_path}...")
 
 try:
-    with open(cards_path, 'r', encoding='utf-8') as f:
-        cards_data = json.load(f)
-    with open(rels_path, 'r', encoding='utf-8') as f:
-        rels_data = json.load(f)
-
-    cards = cards_data.get('cards', [])
-    existing_ids = set(c['id'] for c in cards)
-    
-    rels = rels_data.get('relationships', [])
+    cards = unwrap(load_json(cards_path), 'cards')
+    rels = unwrap(load_json(rels_path), 'relationships')
     print(f"Loaded {len(cards)} cards and {len(rels)} relationships.")
     
-    missing_ids = set()
-    for i, r in enumerate(rels):
-        src = r.get('from')
-        dst = r.get('to')
-        
-        if src not in existing_ids:
-            missing_ids.add(src)
-            # print(f"Rel {i}: Source '{src}' not found in cards.")
-            
-        if dst not in existing_ids:
-            missing_ids.add(dst)
-            # print(f"Rel {i}: Target '{dst}' not found in cards.")
+    # Every rule in card_validation.py in one pass: both edge key styles,
+    # dangling endpoints, duplicates, schema fields, media paths, cycles
+    issues = validate(cards, rels, os.path.dirname(cards_path))
             
-    if missing_ids:
-        print(f"ERROR: {len(missing_ids)} IDs referenced in relationships are missing from cards.json:")
-        for mid in sorted(list(missing_ids)):
-            print(f" - {mid}")
+    if issues:
+        print_report(issues)
+        print(f"{len(errors(issues))} errors, {len(issues) - len(errors(issues))} warnings ({len(RULES)} rules).")
     else:
-        print("Integrity Check: OK. All relationship endpoints exist.")
+        print("Integrity Check: OK. All rules passed.")
 
 except Exception as e:
     print(f"Error: {e}")
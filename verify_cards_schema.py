@@ -3,6 +3,8 @@ import json
 import os
 import sys
 
+from card_validation import validate
+
 cards_file = r'c:\PythonApplications\AI_Skillsweb\cards.json'
 
 def verify_cards():
@@ -18,13 +20,8 @@ def verify_cards():
             print("Error: 'cards' key not found in JSON.")
             sys.exit(1)
 
-        missing_fields = []
-        for i, card in enumerate(data['cards']):
-            card_id = card.get('id', f'Index {i}')
-            if 'web' not in card:
-                missing_fields.append(f"Card {card_id} missing 'web'")
-            if 'video' not in card:
-                missing_fields.append(f"Card {card_id} missing 'video'")
+        issues = validate(data['cards'], [], rules=('link_fields',))
+        missing_fields = [f"Card {i['target']} {i['message']}" for i in issues]
         
         if missing_fields:
             print(f"FAILED: Found {len(missing_fields)} issues.")